@@ -0,0 +1,287 @@
+"""
+离线基准测试
+
+启动本地回放服务器（replay_server.py）代替www.ccdi.gov.cn，把爬虫的base_url改写为它，
+对每个后端和并发数运行一次完整的列表页+详情页爬取，统计：
+    - 列表页/秒、详情页/秒；
+    - 各阶段（HTTP列表页、浏览器列表页、详情页）耗时的p50/p95；
+    - 峰值RSS（本进程，以及已退出的子进程如浏览器中最大的一个）。
+结果写入JSON文件（附带当前git提交），可以在不同提交之间比较。
+每个场景在独立的子进程和临时工作目录中运行，Cookie缓存、归档等文件互不影响；
+速率控制器的请求间隔在基准测试中被置为0。
+
+后端:
+    http        只用HTTP后端抓取列表页和详情页并用lxml解析（不需要浏览器）
+    playwright  CCDIPlaywrightSpider（production配置），并发数即detail_concurrency
+    selenium    CCDISeleniumSpider（production配置），只支持并发数1
+
+用法:
+    python benchmark.py
+    python benchmark.py --backends http,playwright --concurrency 1,4,8 --pages 5 --output benchmark_results.json
+"""
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from replay_server import ReplaySite, start_in_thread
+
+BACKENDS = ('http', 'playwright', 'selenium')
+
+
+class _NoDelay:
+    """替换速率控制模块中的random，使请求间隔为0"""
+
+    @staticmethod
+    def uniform(a, b):
+        return 0
+
+
+class StageTimer:
+    """记录各阶段每次调用的耗时"""
+
+    def __init__(self):
+        self.samples = {}
+
+    def record(self, stage, seconds):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def wrap(self, obj, method_name, stage):
+        """包装实例方法，记录每次调用耗时"""
+        method = getattr(obj, method_name)
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+
+        setattr(obj, method_name, timed)
+
+    def summary(self):
+        return {stage: latency_summary(samples) for stage, samples in self.samples.items()}
+
+
+def percentile(sorted_samples, fraction):
+    """线性插值的分位数"""
+    if not sorted_samples:
+        return None
+    position = (len(sorted_samples) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_samples) - 1)
+    return sorted_samples[lower] + (sorted_samples[upper] - sorted_samples[lower]) * (position - lower)
+
+
+def latency_summary(samples):
+    """单个阶段的次数与p50/p95/最大耗时（毫秒）"""
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'p50_ms': round(percentile(ordered, 0.5) * 1000, 2),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 2),
+        'max_ms': round(ordered[-1] * 1000, 2),
+    }
+
+
+def _point_spider_at(spider, base_url):
+    """把爬虫的目标地址改写为回放服务器"""
+    from urllib.parse import urlparse
+    spider.base_url = base_url
+    spider.cookie_domain = urlparse(base_url).hostname
+    spider.url = spider.build_url(1)
+
+
+def _count_records(sink_path):
+    from result_sink import iter_records
+    records = list(iter_records(sink_path))
+    return len(records), sum(1 for record in records if record.get('正文'))
+
+
+def run_http(base_url, pages, concurrency, timer):
+    """只用HTTP后端：列表页与详情页都直接抓取并用lxml解析"""
+    from http_backend import CCDIHttpBackend
+    from c3vk_challenge import SharedCookieCache
+    from page_parser import parse_article_detail
+    from urllib.parse import urlencode
+
+    backend = CCDIHttpBackend(cookie_cache=SharedCookieCache(), pool_size=max(concurrency, 10))
+
+    def fetch_detail(link):
+        start = time.perf_counter()
+        detail = parse_article_detail(backend.fetch(link))
+        timer.record('detail', time.perf_counter() - start)
+        return detail
+
+    list_pages = details = with_content = 0
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for page_num in range(1, pages + 1):
+                url = f"{base_url}?{urlencode({'page': page_num})}"
+                start = time.perf_counter()
+                page_items, _ = backend.fetch_list_page(url, page_num, base_url)
+                timer.record('list_http', time.perf_counter() - start)
+                list_pages += 1
+
+                for detail in executor.map(fetch_detail, [item['链接'] for item in page_items or []]):
+                    details += 1
+                    with_content += bool(detail.get('正文'))
+    finally:
+        backend.close()
+    return list_pages, details, with_content
+
+
+def run_playwright(base_url, pages, concurrency, timer):
+    import playwright_spider
+    import rate_control
+    rate_control.random = _NoDelay
+
+    spider = playwright_spider.CCDIPlaywrightSpider(detail_concurrency=concurrency, sink_path='records.jsonl')
+    _point_spider_at(spider, base_url)
+    timer.wrap(spider, 'crawl_list_via_http', 'list_http')
+    timer.wrap(spider, 'crawl_list_via_browser', 'list_browser')
+    timer.wrap(spider, 'crawl_article_detail', 'detail')
+    timer.wrap(spider, 'crawl_details_concurrently', 'detail_batch')
+    try:
+        spider.setup_browser(profile='production')
+        spider.crawl_multiple_pages(max_pages=pages, with_details=True)
+        list_pages = spider.pages_crawled
+    finally:
+        spider.close()
+    return (list_pages,) + _count_records('records.jsonl')
+
+
+def run_selenium(base_url, pages, concurrency, timer):
+    import selenium_spider
+    import rate_control
+    rate_control.random = _NoDelay
+
+    spider = selenium_spider.CCDISeleniumSpider(sink_path='records.jsonl')
+    _point_spider_at(spider, base_url)
+    timer.wrap(spider, 'crawl_list_via_http', 'list_http')
+    timer.wrap(spider, 'crawl_list_via_browser', 'list_browser')
+    timer.wrap(spider, 'crawl_article_detail', 'detail')
+    try:
+        spider.setup_driver(profile='production')
+        spider.crawl_multiple_pages(max_pages=pages, with_details=True)
+        list_pages = spider.pages_crawled
+    finally:
+        spider.close()
+    return (list_pages,) + _count_records('records.jsonl')
+
+
+RUNNERS = {'http': run_http, 'playwright': run_playwright, 'selenium': run_selenium}
+
+
+def run_scenario(backend, base_url, pages, concurrency, repo_dir):
+    """在子进程中运行一个场景，返回结果字典"""
+    sys.path.insert(0, repo_dir)
+    workdir = tempfile.mkdtemp(prefix=f'ccdi_bench_{backend}_')
+    os.chdir(workdir)
+
+    timer = StageTimer()
+    result = {'backend': backend, 'concurrency': concurrency, 'pages_requested': pages, 'workdir': workdir}
+    start = time.perf_counter()
+    try:
+        list_pages, details, with_content = RUNNERS[backend](base_url, pages, concurrency, timer)
+        result.update({'list_pages': list_pages, 'details': details, 'details_with_content': with_content})
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+        list_pages = details = 0
+    elapsed = time.perf_counter() - start
+
+    # Linux下ru_maxrss单位为KB
+    result.update({
+        'wall_seconds': round(elapsed, 3),
+        'list_pages_per_sec': round(list_pages / elapsed, 3) if elapsed else None,
+        'details_per_sec': round(details / elapsed, 3) if elapsed else None,
+        'stages': timer.summary(),
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'peak_child_rss_mb': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    })
+    return result
+
+
+def git_commit():
+    """当前git提交（不在git仓库中时返回None）"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='使用本地回放服务器离线测试两个爬虫的吞吐量和延迟')
+    parser.add_argument('--backends', default='http,playwright,selenium', help=f"逗号分隔，可选 {', '.join(BACKENDS)}")
+    parser.add_argument('--concurrency', default='1,4', help='逗号分隔的并发数（selenium只运行1）')
+    parser.add_argument('--pages', type=int, default=3, help='每个场景爬取的列表页数')
+    parser.add_argument('--no-challenge', action='store_true', help='回放服务器不返回C3VK验证页')
+    parser.add_argument('--output', default='benchmark_results.json', help='结果JSON文件')
+    args = parser.parse_args(argv)
+
+    backends = [name.strip() for name in args.backends.split(',') if name.strip()]
+    for name in backends:
+        if name not in BACKENDS:
+            parser.error(f"未知的后端: {name}")
+    levels = [int(level) for level in args.concurrency.split(',')]
+
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    site = ReplaySite(
+        list_page_path=os.path.join(repo_dir, 'selenium_page_source.html'),
+        detail_folder=os.path.join(repo_dir, 'article_details'),
+        challenge_page_path=os.path.join(repo_dir, 'debug_page.html'),
+        challenge=not args.no_challenge
+    )
+    server, base_url = start_in_thread(site)
+    print(f"回放服务器: {base_url}")
+
+    context = multiprocessing.get_context('spawn')
+    scenarios = []
+    try:
+        for backend in backends:
+            for concurrency in (levels if backend != 'selenium' else [1]):
+                print(f"\n===== {backend} 并发 {concurrency} =====")
+                with context.Pool(1) as pool:
+                    result = pool.apply(run_scenario, (backend, base_url, args.pages, concurrency, repo_dir))
+                scenarios.append(result)
+
+                if 'error' in result:
+                    print(f"{backend} 并发 {concurrency} 运行失败: {result['error']}")
+                    continue
+                stages = '，'.join(f"{stage} p50 {s['p50_ms']}ms / p95 {s['p95_ms']}ms" for stage, s in result['stages'].items())
+                print(f"{backend} 并发 {concurrency}: 列表页 {result['list_pages_per_sec']}/秒，"
+                      f"详情页 {result['details_per_sec']}/秒，峰值RSS {result['peak_rss_mb']} MB；{stages}")
+    finally:
+        server.shutdown()
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'pages': args.pages,
+        'challenge': not args.no_challenge,
+        'server_requests': site.requests,
+        'challenges_served': site.challenges_served,
+        'scenarios': scenarios,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n基准测试结果已保存至 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+C3VK Cookie验证页处理
+
+网站有时不直接返回搜索结果，而是返回一段混淆脚本（见debug_page.html）：
+脚本写入 `C3VK=...; path=/; max-age=300;` Cookie，然后用window.open跳转回真实的搜索URL。
+本模块在进程内解析出这个Cookie，不需要浏览器执行脚本，并把它缓存到文件中，
+让同一次运行中的所有HTTP会话、Playwright上下文和Selenium驱动共用一次求解结果。
+
+离线自检：
+    python c3vk_challenge.py debug_page.html
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+COOKIE_NAME = 'C3VK'
+DEFAULT_MAX_AGE = 300
+DEFAULT_CACHE_PATH = '.c3vk_cookie.json'
+
+# 验证页只有一段脚本（不到1KB），远小于正常页面，浏览器中可先按文档长度粗筛
+CHALLENGE_PAGE_MAX_LENGTH = 8192
+
+# 脚本字符串中的 \xNN 与 \uNNNN 转义
+_JS_ESCAPE_RE = re.compile(r'\\x([0-9a-fA-F]{2})|\\u([0-9a-fA-F]{4})')
+# 字符串拼接，例如 "C3VK=" + "e9cf61"
+_JS_CONCAT_RE = re.compile(r'["\']\s*\+\s*["\']')
+_COOKIE_RE = re.compile(COOKIE_NAME + r'=([^;"\'\s]+)')
+_MAX_AGE_RE = re.compile(COOKIE_NAME + r'=[^"\']*?max-age=(\d+)', re.IGNORECASE)
+_PATH_RE = re.compile(COOKIE_NAME + r'=[^"\']*?path=([^;"\'\s]+)', re.IGNORECASE)
+_REDIRECT_RE = re.compile(r'window\.open\(\s*["\']([^"\']+)["\']')
+
+
+class ChallengeSolution:
+    """一次验证页求解的结果"""
+
+    def __init__(self, value, max_age=DEFAULT_MAX_AGE, path='/', redirect_url=None):
+        self.name = COOKIE_NAME
+        self.value = value
+        self.max_age = max_age
+        self.path = path
+        self.redirect_url = redirect_url
+
+    def __repr__(self):
+        return f"ChallengeSolution({self.name}={self.value}, max_age={self.max_age}, path={self.path})"
+
+
+def _decode_js_strings(script):
+    """还原脚本中的十六进制/Unicode转义并合并字符串拼接"""
+    def replace(match):
+        code = match.group(1) or match.group(2)
+        return chr(int(code, 16))
+
+    decoded = _JS_ESCAPE_RE.sub(replace, script)
+    return _JS_CONCAT_RE.sub('', decoded)
+
+
+def is_challenge_page(page_source):
+    """判断响应是否为C3VK验证页"""
+    if isinstance(page_source, bytes):
+        page_source = page_source.decode('utf-8', errors='ignore')
+
+    # 验证页只有一段脚本，正常的搜索结果页远大于此且包含结果列表
+    if 's_0603_list' in page_source or '<script' not in page_source:
+        return False
+    return COOKIE_NAME in _decode_js_strings(page_source)
+
+
+def solve_challenge(page_source):
+    """从验证页中解析出Cookie，无法解析时返回None"""
+    if isinstance(page_source, bytes):
+        page_source = page_source.decode('utf-8', errors='ignore')
+
+    script = _decode_js_strings(page_source)
+
+    cookie_match = _COOKIE_RE.search(script)
+    if not cookie_match:
+        return None
+
+    max_age_match = _MAX_AGE_RE.search(script)
+    path_match = _PATH_RE.search(script)
+    redirect_match = _REDIRECT_RE.search(script)
+
+    return ChallengeSolution(
+        value=cookie_match.group(1),
+        max_age=int(max_age_match.group(1)) if max_age_match else DEFAULT_MAX_AGE,
+        path=path_match.group(1) if path_match else '/',
+        redirect_url=redirect_match.group(1) if redirect_match else None,
+    )
+
+
+class SharedCookieCache:
+    """
+    基于文件的C3VK Cookie缓存
+
+    同一进程内的线程通过锁共享，多个进程通过缓存文件共享。
+    Cookie在max-age到期前safety_margin秒即视为失效，避免使用临界过期的值。
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, safety_margin=10):
+        self.path = path
+        self.safety_margin = safety_margin
+        self._lock = threading.Lock()
+        self._cookie = None
+        self._loaded_mtime = None
+
+    def _reload_if_changed(self):
+        """缓存文件被其他进程更新时重新读取"""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+
+        if mtime == self._loaded_mtime:
+            return
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._cookie = json.load(f)
+            self._loaded_mtime = mtime
+        except (OSError, ValueError):
+            # 其他进程正在写入或文件损坏，沿用内存中的值
+            pass
+
+    def get(self):
+        """返回仍然有效的Cookie字典，没有则返回None"""
+        with self._lock:
+            self._reload_if_changed()
+            cookie = self._cookie
+            if cookie and time.time() < cookie['expires_at'] - self.safety_margin:
+                return dict(cookie)
+            return None
+
+    def store(self, solution):
+        """保存新的求解结果并返回Cookie字典"""
+        now = time.time()
+        cookie = {
+            'name': solution.name,
+            'value': solution.value,
+            'path': solution.path,
+            'solved_at': now,
+            'expires_at': now + solution.max_age,
+        }
+
+        with self._lock:
+            # 先写临时文件再替换，保证其他进程读到的总是完整内容
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(cookie, f)
+            os.replace(tmp_path, self.path)
+            self._cookie = cookie
+            self._loaded_mtime = os.path.getmtime(self.path)
+
+        print(f"已求解{solution.name}验证Cookie，有效期 {solution.max_age} 秒")
+        return dict(cookie)
+
+
+def apply_cookie_to_session(cookie, session, domain):
+    """将Cookie写入requests会话"""
+    session.cookies.set(cookie['name'], cookie['value'], domain=domain, path=cookie['path'])
+
+
+def to_playwright_cookie(cookie, domain):
+    """转换为Playwright add_cookies所需的格式（同步与异步API通用）"""
+    return {
+        'name': cookie['name'],
+        'value': cookie['value'],
+        'domain': domain,
+        'path': cookie['path'],
+        'expires': cookie['expires_at'],
+    }
+
+
+def apply_cookie_to_playwright_context(cookie, context, domain):
+    """将Cookie写入Playwright浏览器上下文"""
+    context.add_cookies([to_playwright_cookie(cookie, domain)])
+
+
+def apply_cookie_to_selenium_driver(cookie, driver, domain):
+    """
+    将Cookie写入Selenium驱动
+
+    Chrome通过CDP直接设置，不要求当前页面位于目标域名；
+    其他浏览器只能在当前页面属于该域名时调用add_cookie。
+    """
+    if hasattr(driver, 'execute_cdp_cmd'):
+        driver.execute_cdp_cmd('Network.setCookie', {
+            'name': cookie['name'],
+            'value': cookie['value'],
+            'domain': domain,
+            'path': cookie['path'],
+            'expires': cookie['expires_at'],
+        })
+        return True
+
+    if domain in (driver.current_url or ''):
+        driver.add_cookie({
+            'name': cookie['name'],
+            'value': cookie['value'],
+            'path': cookie['path'],
+            'expiry': int(cookie['expires_at']),
+        })
+        return True
+
+    return False
+
+
+def main():
+    # 离线验证：解析保存下来的验证页
+    path = sys.argv[1] if len(sys.argv) > 1 else 'debug_page.html'
+    with open(path, 'r', encoding='utf-8') as f:
+        page_source = f.read()
+
+    if not is_challenge_page(page_source):
+        print(f"{path} 不是C3VK验证页")
+        sys.exit(1)
+
+    solution = solve_challenge(page_source)
+    if not solution:
+        print(f"无法从 {path} 中解析出Cookie")
+        sys.exit(1)
+
+    print(f"Cookie: {solution.name}={solution.value}")
+    print(f"max-age: {solution.max_age} 秒, path: {solution.path}")
+    print(f"跳转URL: {solution.redirect_url}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+统一的命令行入口 ccdi-crawl
+
+两个爬虫脚本在模块加载时就导入浏览器驱动库、HTTP会话等依赖（约1秒），只做离线解析或导出时
+也要付出这部分启动时间。本模块本身只导入标准库，选定子命令后才导入对应的模块：
+    ccdi-crawl crawl selenium|playwright [爬虫参数...]    参数与 selenium_spider.py / playwright_spider.py 相同
+    ccdi-crawl reparse [参数...]                           离线重新解析详情页归档，参数与 reparse.py 相同
+    ccdi-crawl export <JSONL结果文件> [--csv] [--json] [--parquet]
+每个子命令在标准错误中打印导入模块的耗时（-q 不打印）。reparse、export（不导出Parquet时）
+不导入浏览器库和pandas，冷启动在200毫秒以内。
+
+安装（pip install -e .）后直接运行 ccdi-crawl，也可以 python ccdi_crawl.py。
+"""
+import argparse
+import importlib
+import os
+import sys
+import time
+
+BACKENDS = {'selenium': 'selenium_spider', 'playwright': 'playwright_spider'}
+
+_quiet = False
+
+
+def import_timed(name):
+    """导入模块，并在标准错误中打印耗时（包括它导入的其他模块）"""
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    if not _quiet:
+        print(f"[启动] 导入 {name} 耗时 {(time.perf_counter() - start) * 1000:.0f} 毫秒", file=sys.stderr)
+    return module
+
+
+def run_crawl(args, rest):
+    return import_timed(BACKENDS[args.backend]).main(rest)
+
+
+def run_reparse(args, rest):
+    return import_timed('reparse').main(rest)
+
+
+def run_export(args, rest):
+    base = os.path.splitext(args.input)[0]
+    csv_path, json_path = args.csv, args.json
+    if not (csv_path or json_path or args.parquet):
+        # 没有指定格式时在结果文件旁边生成CSV和JSON，与爬虫结束时的输出相同
+        csv_path, json_path = f"{base}.csv", f"{base}.json"
+
+    result_sink = import_timed('result_sink')
+    if csv_path:
+        count = result_sink.export_csv(args.input, csv_path)
+        print(f"数据已保存至 {csv_path}，共{count}条记录")
+    if json_path:
+        count = result_sink.export_json(args.input, json_path)
+        print(f"数据已保存至 {json_path}，共{count}条记录")
+    if args.parquet:
+        count = import_timed('parquet_export').export_parquet(args.input, args.parquet)
+        print(f"数据已保存至 {args.parquet}，共{count}条记录")
+
+
+def main(argv=None):
+    global _quiet
+    parser = argparse.ArgumentParser(prog='ccdi-crawl', description='中央纪委国家监委网站公开通报的爬取、解析和导出')
+    parser.add_argument('-q', '--quiet', action='store_true', help='不打印导入耗时')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    # crawl、reparse的其余参数原样交给对应模块的main，--help 也由它处理
+    crawl_parser = subparsers.add_parser('crawl', help='爬取搜索结果和详情页（其余参数见 crawl <后端> --help）', add_help=False)
+    crawl_parser.add_argument('backend', choices=sorted(BACKENDS), help='浏览器后端')
+    crawl_parser.set_defaults(handler=run_crawl, passthrough=True)
+
+    reparse_parser = subparsers.add_parser('reparse', help='离线重新解析已保存的详情页（参数见 reparse --help）', add_help=False)
+    reparse_parser.set_defaults(handler=run_reparse, passthrough=True)
+
+    export_parser = subparsers.add_parser('export', help='由JSONL结果文件导出CSV、JSON或Parquet')
+    export_parser.add_argument('input', help='JSONL结果文件，如 ccdi_selenium_reports.jsonl')
+    export_parser.add_argument('--csv', help='输出的CSV文件')
+    export_parser.add_argument('--json', help='输出的JSON文件')
+    export_parser.add_argument('--parquet', help='输出的Parquet数据集目录（需要pyarrow）')
+    export_parser.set_defaults(handler=run_export, passthrough=False)
+
+    args, rest = parser.parse_known_args(argv)
+    if rest and not args.passthrough:
+        parser.error(f"无法识别的参数: {' '.join(rest)}")
+    _quiet = args.quiet
+    return args.handler(args, rest)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+爬取断点
+
+长时间爬取常因超时或浏览器崩溃中断。本模块在每个列表页解析完成、每篇详情写出后
+把进度原子地写入JSON文件，记录：
+    - 当前的查询参数params、max_pages、with_details；
+    - 已完成的列表页页码；
+    - 正在处理的列表页中尚未完成的详情链接、结果索引和列表页字段；
+    - 等待重试的详情页（重试队列中的条目，含列表页字段和已尝试次数）。
+已完成的记录由JSONL结果文件（result_sink）保存，断点中不重复保存正文，
+因此断点续爬必须与sink_path一起使用。
+"""
+import json
+import os
+import time
+
+DEFAULT_CHECKPOINT_PATH = 'ccdi_crawl_checkpoint.json'
+
+
+class CrawlCheckpoint:
+    def __init__(self, path=DEFAULT_CHECKPOINT_PATH):
+        self.path = path
+        self.state = None
+        self.resumed = False  # 是否从上次的断点恢复
+
+    def load(self):
+        """读取上次运行留下的断点，不存在或无法解析时返回False"""
+        if not os.path.exists(self.path):
+            return False
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.state = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"读取断点文件 {self.path} 失败: {e}")
+            self.state = None
+            return False
+
+        self.resumed = True
+        return True
+
+    def start(self, params, max_pages, with_details):
+        """开始一次新的爬取"""
+        self.state = {
+            'params': dict(params),
+            'max_pages': max_pages,
+            'with_details': with_details,
+            'completed_pages': [],
+            'results_count': 0,
+            'page': None,
+            'retries': [],
+        }
+        self.save()
+
+    def begin_page(self, page_num, params, results, article_links):
+        """列表页解析完成：记录本页待爬取详情的文章及其在结果中的索引"""
+        self.state['params'] = dict(params)
+        self.state['results_count'] = len(results)
+        self.state['page'] = {
+            'page_num': page_num,
+            'pending': [
+                {'index': idx, 'link': link, 'record': results[idx]}
+                for idx, link in article_links
+            ],
+        }
+        self.save()
+
+    def finish_detail(self, idx):
+        """一篇文章的记录已写出，从待完成列表和重试列表中移除"""
+        if not self.state:
+            return
+
+        page = self.state['page']
+        if page:
+            page['pending'] = [entry for entry in page['pending'] if entry['index'] != idx]
+        self.state['retries'] = [entry for entry in self.state.get('retries', []) if entry['index'] != idx]
+        self.save()
+
+    def save_retries(self, entries):
+        """记录重试队列中尚未完成的条目"""
+        if not self.state:
+            return
+
+        self.state['retries'] = entries
+        self.save()
+
+    def complete_page(self, page_num):
+        """一个列表页（含全部详情）处理完成"""
+        if page_num not in self.state['completed_pages']:
+            self.state['completed_pages'].append(page_num)
+        self.state['page'] = None
+        self.save()
+
+    def next_page(self):
+        """返回下一个需要爬取的页码"""
+        completed = self.state['completed_pages'] if self.state else []
+        return max(completed) + 1 if completed else 1
+
+    def save(self):
+        """先写临时文件再替换，避免中途崩溃留下损坏的断点"""
+        self.state['updated_at'] = time.time()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        """爬取正常结束后删除断点文件"""
+        self.state = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,286 @@
+"""
+爬取过程的分阶段计时与计数
+
+原先只有print输出，无法判断时间花在goto、wait_for_selector、选择器回退、
+page.content()序列化、HTML归档写入还是随机延时上。本模块提供：
+    - 各阶段耗时的直方图（固定桶，记录一次只需一次二分查找和几次加法）；
+    - 计数器：列表页、记录、详情结果、选择器回退、按阶段和异常类型统计的失败；
+    - 仪表：可升可降的当前值，如速率控制器的当前速率；
+    - Prometheus文本格式导出：写入textfile（供node_exporter的textfile collector采集），
+      或在后台线程中提供 /metrics 端点；
+    - 爬取结束时的JSON汇总（各阶段次数、p50/p95和计数器）。
+开销为每次记录一次perf_counter和一次加锁，可以在生产环境中常开。
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 直方图桶上限（秒），覆盖从本地解析到慢速页面加载的范围
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 计数器说明，导出为Prometheus的HELP行
+COUNTER_HELP = {
+    'pages_total': '已完成的列表页数',
+    'records_total': '已写出的记录数',
+    'details_total': '详情页结果（ok/empty/cached/failed/retry）',
+    'selector_fallbacks_total': '首选选择器未命中、由后续选择器命中的次数',
+    'selector_misses_total': '所有选择器都未命中的次数',
+    'failures_total': '按阶段和异常类型统计的失败次数',
+    'detail_tier_total': '各抓取层（http/browser/cache）得到的详情数',
+    'detail_escalations_total': 'HTTP层升级到浏览器的次数（按原因）',
+    'page_pool_created_total': '页面池创建的页面/标签页数',
+    'page_pool_checkouts_total': '从页面池取出页面的次数',
+    'page_pool_recycled_total': '页面池换新页面的次数（按原因）',
+    'detail_retries_total': '安排重试的详情页次数',
+    'detail_dead_letters_total': '多次重试仍失败、写入死信文件的详情页数',
+    'rate_limit_signals_total': '速率控制器收到的回退信号（按原因）',
+    'rate_limit_backoffs_total': '速率控制器实际降速的次数（按原因）',
+    'selector_drift_alerts_total': '选择器命中分布发生变化、可能网站改版的告警次数（按字段）',
+    'near_duplicates_total': '正文与已知文章近似重复的记录数',
+}
+
+# 仪表说明
+GAUGE_HELP = {
+    'rate_limit_requests_per_second': '速率控制器当前允许的请求速率（请求/秒）',
+    'rate_limit_concurrency': '速率控制器当前允许的并发数',
+}
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + '}'
+
+
+class CrawlMetrics:
+    """线程安全的直方图和计数器（异步详情页池在后台线程中记录）"""
+
+    def __init__(self, namespace='ccdi', buckets=DEFAULT_BUCKETS):
+        self.namespace = namespace
+        self.buckets = tuple(buckets)
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._stages = {}  # 阶段 -> [各桶计数（最后一个为+Inf）, 总耗时, 次数, 最大耗时]
+        self._counters = {}  # (名称, 标签) -> 计数
+        self._gauges = {}  # (名称, 标签) -> 当前值
+
+    @contextmanager
+    def stage(self, name):
+        """记录with块的耗时（抛出异常时也记录）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name, seconds):
+        """记录某个阶段的一次耗时（秒）"""
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._stages.get(name)
+            if histogram is None:
+                histogram = self._stages[name] = [[0] * (len(self.buckets) + 1), 0.0, 0, 0.0]
+            histogram[0][index] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+            if seconds > histogram[3]:
+                histogram[3] = seconds
+
+    def inc(self, name, amount=1, **labels):
+        """计数器加amount"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        """设置仪表的当前值"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._gauges[key] = value
+
+    def record_failure(self, stage, error):
+        """按阶段和异常类型记录一次失败"""
+        self.inc('failures_total', stage=stage, type=type(error).__name__)
+
+    def record_selector_matches(self, matched):
+        """
+        记录页内脚本返回的各字段命中的选择器序号
+
+        matched为 {字段: 命中的选择器序号或None}，序号大于0即发生了回退。
+        """
+        for field, index in matched.items():
+            if index is None:
+                self.inc('selector_misses_total', field=field)
+            elif index > 0:
+                self.inc('selector_fallbacks_total', field=field)
+
+    def counter(self, name, **labels):
+        """读取计数器的当前值"""
+        with self._lock:
+            return self._counters.get((name, _label_key(labels)), 0)
+
+    def _quantile(self, histogram, fraction):
+        """按直方图桶线性插值估计分位数（与Prometheus的histogram_quantile相同）"""
+        counts, _, total, maximum = histogram
+        rank = fraction * total
+        cumulative = 0
+        lower = 0.0
+        for index, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                if index == len(self.buckets):
+                    return maximum
+                upper = min(self.buckets[index], maximum)
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+            if index < len(self.buckets):
+                lower = self.buckets[index]
+        return maximum
+
+    def summary(self):
+        """返回各阶段耗时统计和计数器的字典"""
+        with self._lock:
+            stages = {name: (list(h[0]), h[1], h[2], h[3]) for name, h in self._stages.items()}
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+
+        stage_summary = {}
+        for name in sorted(stages):
+            histogram = stages[name]
+            _, total_seconds, count, maximum = histogram
+            stage_summary[name] = {
+                'count': count,
+                'total_seconds': round(total_seconds, 3),
+                'mean_ms': round(total_seconds / count * 1000, 2),
+                'p50_ms': round(self._quantile(histogram, 0.5) * 1000, 2),
+                'p95_ms': round(self._quantile(histogram, 0.95) * 1000, 2),
+                'max_ms': round(maximum * 1000, 2),
+            }
+
+        counter_summary = {}
+        for (name, label_key), value in sorted(counters.items()):
+            if label_key:
+                label = ','.join(f"{k}={v}" for k, v in label_key)
+                counter_summary.setdefault(name, {})[label] = value
+            else:
+                counter_summary[name] = value
+
+        gauge_summary = {}
+        for (name, label_key), value in sorted(gauges.items()):
+            if label_key:
+                label = ','.join(f"{k}={v}" for k, v in label_key)
+                gauge_summary.setdefault(name, {})[label] = value
+            else:
+                gauge_summary[name] = value
+
+        return {
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started_at)),
+            'elapsed_seconds': round(time.time() - self.started_at, 3),
+            'stages': stage_summary,
+            'counters': counter_summary,
+            'gauges': gauge_summary,
+        }
+
+    def to_prometheus(self):
+        """导出为Prometheus文本格式"""
+        with self._lock:
+            stages = {name: (list(h[0]), h[1], h[2]) for name, h in self._stages.items()}
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+
+        prefix = f"{self.namespace}_"
+        lines = [
+            f"# HELP {prefix}stage_seconds 各阶段耗时（秒）",
+            f"# TYPE {prefix}stage_seconds histogram",
+        ]
+        for name in sorted(stages):
+            counts, total_seconds, count = stages[name]
+            label_key = (('stage', name),)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{prefix}stage_seconds_bucket{_format_labels(label_key, [('le', repr(bound))])} {cumulative}")
+            lines.append(f"{prefix}stage_seconds_bucket{_format_labels(label_key, [('le', '+Inf')])} {count}")
+            lines.append(f"{prefix}stage_seconds_sum{_format_labels(label_key)} {total_seconds}")
+            lines.append(f"{prefix}stage_seconds_count{_format_labels(label_key)} {count}")
+
+        names = sorted({name for name, _ in counters})
+        for name in names:
+            if name in COUNTER_HELP:
+                lines.append(f"# HELP {prefix}{name} {COUNTER_HELP[name]}")
+            lines.append(f"# TYPE {prefix}{name} counter")
+            for (counter_name, label_key), value in sorted(counters.items()):
+                if counter_name == name:
+                    lines.append(f"{prefix}{name}{_format_labels(label_key)} {value}")
+
+        for name in sorted({name for name, _ in gauges}):
+            if name in GAUGE_HELP:
+                lines.append(f"# HELP {prefix}{name} {GAUGE_HELP[name]}")
+            lines.append(f"# TYPE {prefix}{name} gauge")
+            for (gauge_name, label_key), value in sorted(gauges.items()):
+                if gauge_name == name:
+                    lines.append(f"{prefix}{name}{_format_labels(label_key)} {value}")
+
+        lines.append(f"# TYPE {prefix}crawl_start_time_seconds gauge")
+        lines.append(f"{prefix}crawl_start_time_seconds {self.started_at}")
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path):
+        """原子地写入Prometheus textfile，采集端不会读到写了一半的文件"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def write_summary(self, path):
+        """把JSON汇总写入文件"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+
+    def print_summary(self):
+        """打印各阶段耗时，按总耗时从高到低排列"""
+        stages = self.summary()['stages']
+        if not stages:
+            return
+        print("[阶段耗时]")
+        for name, s in sorted(stages.items(), key=lambda item: -item[1]['total_seconds']):
+            print(f"  {name}: {s['count']} 次，共 {s['total_seconds']:.2f} 秒，"
+                  f"p50 {s['p50_ms']:.1f}ms / p95 {s['p95_ms']:.1f}ms / 最大 {s['max_ms']:.1f}ms")
+
+    def serve(self, port, host='0.0.0.0'):
+        """在后台线程中提供 /metrics 端点，返回HTTP服务器（调用shutdown停止）"""
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = metrics.to_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+        print(f"指标端点已启动: http://{host}:{server.server_address[1]}/metrics")
+        return server
@@ -0,0 +1,104 @@
+"""
+详情页缓存
+
+已发布的通报页面（如t20230418_259205.html）几乎不会再变化，重复运行时没有必要
+重新打开浏览器下载。本模块以HtmlArchive中已保存的页面作为缓存：
+    - 'trust'：直接用归档中的副本提取详情，不发起任何请求；
+    - 'revalidate'：带If-None-Match/If-Modified-Since发起条件请求，
+      304时使用归档副本，内容有变化时用新下载的页面更新归档并提取。
+ttl（秒）为副本的有效期：有效期内两种模式都直接使用副本；
+过期后trust模式视为未命中（重新用浏览器爬取），revalidate模式发起条件请求。
+ttl为None时trust模式永不过期，revalidate模式每次都重新验证。
+"""
+import time
+from email.utils import formatdate
+
+from page_parser import parse_article_detail
+
+TRUST_MODE = 'trust'
+REVALIDATE_MODE = 'revalidate'
+CACHE_MODES = (TRUST_MODE, REVALIDATE_MODE)
+
+
+class DetailCache:
+    def __init__(self, archive, mode=TRUST_MODE, ttl=None, http_backend=None):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"未知的缓存模式: {mode}")
+        if mode == REVALIDATE_MODE and http_backend is None:
+            raise ValueError("revalidate模式需要HTTP后端发起条件请求")
+
+        self.archive = archive
+        self.mode = mode
+        self.ttl = ttl
+        self.http_backend = http_backend
+
+        self.hits = 0  # 有效期内（或trust模式下）直接使用副本
+        self.revalidated = 0  # 条件请求返回304后使用副本
+        self.refreshed = 0  # 条件请求发现内容变化，已用新页面更新
+        self.misses = 0  # 没有可用副本，需要浏览器重新爬取
+
+    def lookup(self, url):
+        """返回可直接使用的详情数据，需要浏览器重新爬取时返回None"""
+        entry = self.archive.entry(url)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        age = time.time() - entry['saved_at']
+        fresh = age < self.ttl if self.ttl is not None else self.mode == TRUST_MODE
+
+        if fresh:
+            detail = self._extract(self.archive.get_bytes(entry['content_hash']))
+            if detail is not None:
+                self.hits += 1
+                return detail
+        elif self.mode == REVALIDATE_MODE:
+            detail = self._revalidate(url, entry)
+            if detail is not None:
+                return detail
+
+        self.misses += 1
+        return None
+
+    def _revalidate(self, url, entry):
+        """发起条件请求，未修改时使用副本，内容变化时更新归档"""
+        # 浏览器爬取的页面没有响应头，用保存时间作为If-Modified-Since
+        last_modified = entry['last_modified'] or formatdate(entry['saved_at'], usegmt=True)
+        try:
+            not_modified, page_source, etag, last_modified = self.http_backend.fetch_conditional(
+                url, entry['etag'], last_modified
+            )
+        except Exception as e:
+            print(f"条件请求失败，改用浏览器爬取: {url}: {e}")
+            return None
+
+        if not_modified:
+            detail = self._extract(self.archive.get_bytes(entry['content_hash']))
+            if detail is not None:
+                self.archive.touch(url)
+                self.revalidated += 1
+            return detail
+
+        detail = self._extract(page_source)
+        if detail is not None:
+            self.archive.put(url, page_source, etag, last_modified)
+            self.refreshed += 1
+        return detail
+
+    def _extract(self, page_source):
+        """用与浏览器相同的选择器顺序从HTML提取详情，没有正文（如验证页）时返回None"""
+        if not page_source:
+            return None
+
+        detail = parse_article_detail(page_source)
+        detail.pop('标题', None)  # 标题沿用列表页的
+        return detail if detail.get('正文') else None
+
+    def print_summary(self):
+        """打印缓存命中情况"""
+        total = self.hits + self.revalidated + self.refreshed + self.misses
+        if not total:
+            return
+        print(f"[详情缓存] {self.mode}模式：命中 {self.hits}，验证未修改 {self.revalidated}，"
+              f"已更新 {self.refreshed}，未命中 {self.misses}（共 {total} 篇，"
+              f"命中率 {(self.hits + self.revalidated) / total:.1%}）")
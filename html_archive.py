@@ -0,0 +1,304 @@
+"""
+压缩的详情页HTML归档
+
+原先每个详情页的完整HTML都作为一个未压缩的小文件写入article_details/，
+数量多时占用大量inode和磁盘空间，且无法识别的链接以时间戳命名，同一秒内保存的页面会互相覆盖。
+本模块把HTML追加写入压缩分段文件：
+    - 分段文件（segment_00000.bin ...）只追加，每个页面单独用zlib压缩，超过大小上限后换新分段；
+    - SQLite索引（index.sqlite）记录 文章键 -> 内容哈希 -> (分段, 偏移, 长度)，
+      文章键为文章ID（如t20230418_259205），无法识别时使用完整链接；
+    - 内容完全相同的页面只保存一份；
+    - 读取时用mmap映射分段文件，按偏移随机访问；页面按原始字节保存（原始响应模式下为服务器返回的
+      字节，不一定是UTF-8），get_bytes返回原始字节，get/get_by_hash按页面声明的字符集解码。
+写入在SQLite的写事务内完成，多个线程或进程（如分片爬取的工作进程）可以写同一个归档。
+
+用法:
+    python html_archive.py import article_details --archive article_archive
+    python html_archive.py cat t20230418_259205 --archive article_archive
+    python html_archive.py stats --archive article_archive
+"""
+import argparse
+import hashlib
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import zlib
+
+from page_parser import decode_html
+from seen_index import article_id_from_url
+
+DEFAULT_ARCHIVE_PATH = 'article_archive'
+DEFAULT_MAX_SEGMENT_BYTES = 256 * 1024 * 1024
+
+# 每个页面前的记录头：魔数 + 内容SHA-256 + 压缩后长度，便于校验和离线恢复
+_RECORD_MAGIC = b'CCDA'
+_RECORD_HEADER = struct.Struct('>4s32sI')
+
+
+def archive_key(url):
+    """归档中使用的文章键：优先使用链接中的文章ID，否则使用完整链接"""
+    return article_id_from_url(url) or url
+
+
+def content_hash(data):
+    """页面内容的SHA-256十六进制摘要"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class HtmlArchive:
+    def __init__(self, path=DEFAULT_ARCHIVE_PATH, max_segment_bytes=DEFAULT_MAX_SEGMENT_BYTES, compress_level=6):
+        self.path = path
+        self.max_segment_bytes = max_segment_bytes
+        self.compress_level = compress_level
+        os.makedirs(path, exist_ok=True)
+
+        self._lock = threading.Lock()  # 同一进程内多个线程共用一个连接
+        self._writers = {}  # 分段编号 -> 追加写入的文件
+        self._maps = {}  # 分段编号 -> (文件, mmap)
+
+        self.conn = sqlite3.connect(os.path.join(path, 'index.sqlite'), timeout=60, check_same_thread=False)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS pages ('
+            'content_hash TEXT PRIMARY KEY, '
+            'segment INTEGER, '
+            'offset INTEGER, '
+            'length INTEGER, '
+            'raw_length INTEGER)'
+        )
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS articles ('
+            'key TEXT PRIMARY KEY, '
+            'url TEXT, '
+            'content_hash TEXT, '
+            'saved_at REAL, '
+            'etag TEXT, '
+            'last_modified TEXT)'
+        )
+        # 早期版本的索引没有HTTP验证字段
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(articles)')}
+        for column in ('etag', 'last_modified'):
+            if column not in columns:
+                self.conn.execute(f'ALTER TABLE articles ADD COLUMN {column} TEXT')
+        self.conn.commit()
+
+    def segment_path(self, segment):
+        """分段文件路径"""
+        return os.path.join(self.path, f"segment_{segment:05d}.bin")
+
+    def put(self, url, page_source, etag=None, last_modified=None):
+        """
+        保存一个详情页，返回 (文章键, 内容哈希)
+
+        同一文章再次保存时索引指向最新内容；内容已存在时只更新索引，不重复写入。
+        etag/last_modified为响应头中的验证信息（如有），供条件请求使用。
+        """
+        data = page_source.encode('utf-8') if isinstance(page_source, str) else page_source
+        digest = content_hash(data)
+        key = archive_key(url)
+
+        with self._lock:
+            # BEGIN IMMEDIATE 取得写锁，多个进程的追加写入和索引更新依次进行
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                exists = self.conn.execute('SELECT 1 FROM pages WHERE content_hash = ?', (digest,)).fetchone()
+                if not exists:
+                    self._append(digest, data)
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO articles (key, url, content_hash, saved_at, etag, last_modified) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (key, url, digest, time.time(), etag, last_modified)
+                )
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                raise
+
+        return key, digest
+
+    def _append(self, digest, data):
+        """压缩后追加到当前分段，并在索引中登记位置（调用方持有写锁）"""
+        compressed = zlib.compress(data, self.compress_level)
+
+        segment = self.conn.execute('SELECT MAX(segment) FROM pages').fetchone()[0] or 0
+        writer = self._writer(segment)
+        writer.seek(0, os.SEEK_END)
+        if writer.tell() >= self.max_segment_bytes:
+            segment += 1
+            writer = self._writer(segment)
+            writer.seek(0, os.SEEK_END)
+
+        offset = writer.tell() + _RECORD_HEADER.size
+        writer.write(_RECORD_HEADER.pack(_RECORD_MAGIC, bytes.fromhex(digest), len(compressed)))
+        writer.write(compressed)
+        writer.flush()
+
+        self.conn.execute(
+            'INSERT INTO pages (content_hash, segment, offset, length, raw_length) VALUES (?, ?, ?, ?, ?)',
+            (digest, segment, offset, len(compressed), len(data))
+        )
+
+    def _writer(self, segment):
+        writer = self._writers.get(segment)
+        if writer is None:
+            writer = open(self.segment_path(segment), 'ab')
+            self._writers[segment] = writer
+        return writer
+
+    def _read(self, segment, offset, length):
+        """通过mmap读取分段中的一段数据，分段在映射后又被追加时重新映射"""
+        mapped = self._maps.get(segment)
+        if mapped is None or offset + length > len(mapped[1]):
+            if mapped:
+                mapped[1].close()
+                mapped[0].close()
+            f = open(self.segment_path(segment), 'rb')
+            mapped = (f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            self._maps[segment] = mapped
+        return mapped[1][offset:offset + length]
+
+    def get_bytes(self, digest):
+        """按内容哈希读取页面保存时的原始字节，不存在时返回None"""
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT segment, offset, length FROM pages WHERE content_hash = ?', (digest,)
+            ).fetchone()
+            if not row:
+                return None
+            compressed = self._read(*row)
+        return zlib.decompress(compressed)
+
+    def get_by_hash(self, digest):
+        """按内容哈希读取页面HTML（按页面的字符集解码），不存在时返回None"""
+        data = self.get_bytes(digest)
+        return decode_html(data) if data is not None else None
+
+    def has_content(self, digest):
+        """归档中是否已有该内容哈希的页面"""
+        with self._lock:
+            return self.conn.execute('SELECT 1 FROM pages WHERE content_hash = ?', (digest,)).fetchone() is not None
+
+    def get(self, key_or_url):
+        """按文章ID或链接读取页面HTML，不存在时返回None"""
+        digest = self.lookup(key_or_url)
+        return self.get_by_hash(digest) if digest else None
+
+    def lookup(self, key_or_url):
+        """返回文章当前对应的内容哈希"""
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT content_hash FROM articles WHERE key = ?', (archive_key(key_or_url),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def entry(self, key_or_url):
+        """返回文章的索引信息（链接、内容哈希、保存时间和验证信息），不存在时返回None"""
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT url, content_hash, saved_at, etag, last_modified FROM articles WHERE key = ?',
+                (archive_key(key_or_url),)
+            ).fetchone()
+        if not row:
+            return None
+        return dict(zip(('url', 'content_hash', 'saved_at', 'etag', 'last_modified'), row))
+
+    def touch(self, key_or_url):
+        """条件请求确认内容未变化后，刷新文章的保存时间"""
+        with self._lock:
+            self.conn.execute('UPDATE articles SET saved_at = ? WHERE key = ?', (time.time(), archive_key(key_or_url)))
+            self.conn.commit()
+
+    def __contains__(self, key_or_url):
+        return self.lookup(key_or_url) is not None
+
+    def articles(self):
+        """返回所有 (文章键, 链接, 内容哈希)，按文章键排序"""
+        with self._lock:
+            return self.conn.execute('SELECT key, url, content_hash FROM articles ORDER BY key').fetchall()
+
+    def stats(self):
+        """返回文章数、不重复页面数、原始字节数和压缩后字节数"""
+        with self._lock:
+            articles = self.conn.execute('SELECT COUNT(*) FROM articles').fetchone()[0]
+            pages, raw_bytes, stored_bytes = self.conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(raw_length), 0), COALESCE(SUM(length), 0) FROM pages'
+            ).fetchone()
+        return {'articles': articles, 'pages': pages, 'raw_bytes': raw_bytes, 'stored_bytes': stored_bytes}
+
+    def close(self):
+        """关闭索引、分段文件和内存映射"""
+        with self._lock:
+            for writer in self._writers.values():
+                writer.close()
+            for f, mapped in self._maps.values():
+                mapped.close()
+                f.close()
+            self._writers.clear()
+            self._maps.clear()
+            self.conn.close()
+
+
+def migrate_directory(folder, archive):
+    """把按文章保存的HTML目录导入归档，返回 (导入文件数, 其中内容重复的文件数)"""
+    imported = 0
+    duplicates = 0
+    for name in sorted(os.listdir(folder)):
+        if not name.endswith('.html'):
+            continue
+
+        with open(os.path.join(folder, name), 'rb') as f:
+            data = f.read()
+
+        # 按原始字节导入，不假定旧文件是UTF-8；旧文件名就是链接的最后一段，文章ID与爬取时一致
+        exists_before = archive.has_content(content_hash(data))
+        archive.put(name, data)
+        imported += 1
+        duplicates += exists_before
+    return imported, duplicates
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='详情页HTML归档工具')
+    parser.add_argument('--archive', default=DEFAULT_ARCHIVE_PATH, help='归档目录')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='导入按文章保存的HTML目录')
+    import_parser.add_argument('folders', nargs='+', help='如 article_details article_details_playwright')
+
+    cat_parser = subparsers.add_parser('cat', help='输出一篇文章的HTML')
+    cat_parser.add_argument('key', help='文章ID或链接')
+
+    subparsers.add_parser('stats', help='显示归档统计')
+    args = parser.parse_args(argv)
+
+    archive = HtmlArchive(args.archive)
+    try:
+        if args.command == 'import':
+            for folder in args.folders:
+                start = time.perf_counter()
+                imported, duplicates = migrate_directory(folder, archive)
+                print(f"已从 {folder} 导入 {imported} 个文件（内容重复 {duplicates} 个），耗时 {time.perf_counter() - start:.2f} 秒")
+
+        elif args.command == 'cat':
+            digest = archive.lookup(args.key)
+            data = archive.get_bytes(digest) if digest else None
+            if data is None:
+                print(f"归档中没有 {args.key}", file=sys.stderr)
+                return 1
+            # 原样输出保存的字节，不经过解码
+            sys.stdout.buffer.write(data)
+            return 0
+
+        stats = archive.stats()
+        ratio = stats['stored_bytes'] / stats['raw_bytes'] if stats['raw_bytes'] else 0
+        print(f"归档 {args.archive}: {stats['articles']} 篇文章，{stats['pages']} 个不重复页面，"
+              f"原始 {stats['raw_bytes'] / 1024 / 1024:.1f} MB，压缩后 {stats['stored_bytes'] / 1024 / 1024:.1f} MB（{ratio:.1%}）")
+    finally:
+        archive.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+CCDI HTTP抓取后端
+
+列表页（was5/web/search）是服务端渲染的静态HTML，不需要浏览器执行脚本。
+本模块使用带连接池的requests会话直接抓取，并用lxml解析列表项；
+只有当这条路径失败时，爬虫才回退到浏览器。
+"""
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from c3vk_challenge import is_challenge_page, solve_challenge, apply_cookie_to_session
+from page_parser import parse_list_page
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36'
+
+
+class CCDIHttpBackend:
+    def __init__(self, user_agent=DEFAULT_USER_AGENT, timeout=10, pool_size=10, max_retries=2, cookie_cache=None):
+        self.timeout = timeout
+        self.cookie_cache = cookie_cache  # 共享的C3VK Cookie缓存，可为None
+
+        # 复用同一个会话，保持keep-alive连接
+        self.session = requests.Session()
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=0.5,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=('GET', 'HEAD'),
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'User-Agent': user_agent,
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+            'Connection': 'keep-alive',
+        })
+
+    def fetch(self, url):
+        """抓取URL并返回解码后的HTML文本，遇到C3VK验证页时在进程内求解后重试一次"""
+        page_source = self._get(url)
+
+        if self.cookie_cache and is_challenge_page(page_source):
+            solution = solve_challenge(page_source)
+            if solution:
+                cookie = self.cookie_cache.store(solution)
+                apply_cookie_to_session(cookie, self.session, urlparse(url).hostname)
+                page_source = self._get(url)
+
+        return page_source
+
+    def fetch_conditional(self, url, etag=None, last_modified=None):
+        """
+        带If-None-Match/If-Modified-Since的条件请求
+
+        返回 (是否未修改, 页面源码, ETag, Last-Modified)；未修改（304）时页面源码为None，
+        验证信息沿用传入的值。
+        """
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+        response = self._request(url, headers)
+        if response.status_code == 200 and self.cookie_cache and is_challenge_page(response.text):
+            solution = solve_challenge(response.text)
+            if solution:
+                cookie = self.cookie_cache.store(solution)
+                apply_cookie_to_session(cookie, self.session, urlparse(url).hostname)
+                response = self._request(url, headers)
+
+        if response.status_code == 304:
+            return True, None, etag, last_modified
+        return False, response.text, response.headers.get('ETag'), response.headers.get('Last-Modified')
+
+    def _get(self, url):
+        """发送GET请求并返回解码后的文本"""
+        return self._request(url).text
+
+    def _request(self, url, headers=None):
+        """发送GET请求，请求前带上共享缓存中仍有效的Cookie"""
+        if self.cookie_cache:
+            cookie = self.cookie_cache.get()
+            if cookie:
+                apply_cookie_to_session(cookie, self.session, urlparse(url).hostname)
+
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        response.raise_for_status()
+
+        # 响应头未声明编码时，按网站实际使用的UTF-8解码
+        if 'charset' not in response.headers.get('Content-Type', '').lower():
+            response.encoding = 'utf-8'
+        return response
+
+    def fetch_list_page(self, url, page_num, base_url):
+        """
+        抓取并解析列表页
+
+        返回 (文章列表, 页面源码)；页面中没有结果列表时文章列表为None，
+        调用方应回退到浏览器。
+        """
+        start = time.perf_counter()
+        page_source = self.fetch(url)
+        page_items = parse_list_page(page_source, page_num, base_url)
+        elapsed = time.perf_counter() - start
+
+        if page_items is not None:
+            print(f"HTTP后端解析第{page_num}页完成，耗时 {elapsed * 1000:.0f} 毫秒")
+        return page_items, page_source
+
+    def close(self):
+        """关闭HTTP会话和连接池"""
+        self.session.close()
@@ -0,0 +1,165 @@
+"""
+页面加载配置（生产模式）
+
+默认配置沿用调试时的行为：有界面浏览器、slow_mo、等待networkidle，并加载全部资源。
+生产模式（profile='production'）则：
+    - 使用无头浏览器；
+    - 拦截文档以外的资源请求（图片、字体、样式、第三方脚本等），允许的资源类型可配置；
+    - 以domcontentloaded加目标选择器（列表页ul.s_0603_list、详情页正文容器）作为就绪条件；
+    - Selenium使用eager页面加载策略。
+LoadStats统计每个页面实际加载的请求数与字节数，以及被拦截的请求数；被拦截的请求没有发出，
+节省的字节数只能按资源类型的典型大小估算，输出和汇总中都标明是估计值。
+"""
+import threading
+from collections import Counter
+
+from page_parser import LIST_CONTAINER_SELECTOR, CONTENT_SELECTORS
+
+PRODUCTION_PROFILE = 'production'
+
+# 生产模式下允许加载的资源类型（Playwright的resource_type取值）
+DEFAULT_ALLOWED_RESOURCE_TYPES = ('document',)
+
+# 就绪条件：目标选择器出现即可开始提取，不再等待网络空闲
+LIST_READY_SELECTOR = LIST_CONTAINER_SELECTOR
+DETAIL_READY_SELECTOR = ', '.join(CONTENT_SELECTORS)
+
+# Selenium（Chrome CDP）只能按URL模式拦截，按资源类型映射到对应的扩展名
+RESOURCE_URL_PATTERNS = {
+    'image': ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico', '*.bmp'],
+    'stylesheet': ['*.css'],
+    'font': ['*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot'],
+    'media': ['*.mp4', '*.mp3', '*.webm', '*.flv', '*.m3u8'],
+    'script': ['*.js'],
+}
+
+# 被拦截的请求无法得知真实大小，按资源类型的典型大小估算节省的字节数
+ESTIMATED_RESOURCE_BYTES = {
+    'image': 30 * 1024,
+    'stylesheet': 20 * 1024,
+    'font': 60 * 1024,
+    'media': 200 * 1024,
+    'script': 40 * 1024,
+}
+DEFAULT_ESTIMATED_BYTES = 5 * 1024
+
+# 通过Performance API统计页面实际加载的请求数与传输字节数
+PAGE_TRANSFER_JS = """
+() => {
+    const entries = performance.getEntriesByType('navigation').concat(performance.getEntriesByType('resource'));
+    return {
+        requests: entries.length,
+        bytes: entries.reduce((total, entry) => total + (entry.transferSize || 0), 0)
+    };
+}
+"""
+
+
+def blocked_url_patterns(allowed_resource_types=DEFAULT_ALLOWED_RESOURCE_TYPES):
+    """返回不在允许列表中的资源类型对应的URL拦截模式"""
+    patterns = []
+    for resource_type, type_patterns in RESOURCE_URL_PATTERNS.items():
+        if resource_type not in allowed_resource_types:
+            patterns.extend(type_patterns)
+    return patterns
+
+
+class LoadStats:
+    """
+    统计生产模式下每个页面的请求拦截与加载情况（线程安全）
+
+    Playwright在路由处理函数中按资源类型拦截并计数（should_block）；Selenium通过CDP按URL模式拦截，
+    爬虫从性能日志的Network.loadingFailed事件（带blockedReason）中读出被拦截的请求，调用record_blocked计数。
+    track_blocked为False时（如无法读取性能日志的Firefox）只统计实际加载的请求与字节数。
+    """
+
+    def __init__(self, allowed_resource_types=DEFAULT_ALLOWED_RESOURCE_TYPES, track_blocked=True):
+        self.allowed_resource_types = set(allowed_resource_types)
+        self.track_blocked = track_blocked
+        self._lock = threading.Lock()
+        self._page_blocked = Counter()
+        self.pages = 0
+        self.blocked_by_type = Counter()
+        self.requests_loaded = 0
+        self.bytes_loaded = 0
+        self.estimated_bytes_saved = 0  # 按ESTIMATED_RESOURCE_BYTES估算，不是实测值
+
+    def should_block(self, resource_type):
+        """判断是否拦截该类型的请求，拦截时计数"""
+        if resource_type in self.allowed_resource_types:
+            return False
+        self.record_blocked(resource_type)
+        return True
+
+    def record_blocked(self, resource_type):
+        """记录一个被拦截的请求（资源类型同Playwright的resource_type，如image、script）"""
+        with self._lock:
+            self._page_blocked[resource_type] += 1
+
+    def playwright_route_handler(self, route):
+        """Playwright同步API的路由处理函数"""
+        if self.should_block(route.request.resource_type):
+            route.abort()
+        else:
+            route.continue_()
+
+    async def async_playwright_route_handler(self, route):
+        """Playwright异步API的路由处理函数"""
+        if self.should_block(route.request.resource_type):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    def record_page(self, url, transfer=None, pages=1):
+        """
+        记录一个页面的加载情况并打印本页节省的请求与字节数
+
+        并发模式下多个页面的拦截计数无法区分，按批记录，pages为该批的页面数。
+        """
+        with self._lock:
+            page_blocked, self._page_blocked = self._page_blocked, Counter()
+            saved = sum(
+                ESTIMATED_RESOURCE_BYTES.get(resource_type, DEFAULT_ESTIMATED_BYTES) * count
+                for resource_type, count in page_blocked.items()
+            )
+            self.pages += pages
+            self.blocked_by_type.update(page_blocked)
+            self.estimated_bytes_saved += saved
+            if transfer:
+                self.requests_loaded += transfer['requests']
+                self.bytes_loaded += transfer['bytes']
+
+        parts = []
+        if transfer:
+            parts.append(f"加载 {transfer['requests']} 个请求 / {transfer['bytes'] / 1024:.1f} KB")
+        if self.track_blocked:
+            blocked_detail = '、'.join(f"{t} {c}" for t, c in page_blocked.most_common())
+            parts.append(f"拦截 {sum(page_blocked.values())} 个请求"
+                         f"{f'（{blocked_detail}）' if blocked_detail else ''}，按典型大小估计节省 {saved / 1024:.1f} KB")
+        print(f"[生产模式] {url} {'，'.join(parts)}")
+
+    def summary(self):
+        """返回整次运行的汇总字典（被拦截请求的字节数为估计值，键名带estimated）"""
+        with self._lock:
+            summary = {
+                'pages': self.pages,
+                'requests_loaded': self.requests_loaded,
+                'bytes_loaded': self.bytes_loaded,
+            }
+            if self.track_blocked:
+                summary['requests_blocked'] = sum(self.blocked_by_type.values())
+                summary['requests_blocked_by_type'] = dict(self.blocked_by_type)
+                summary['estimated_bytes_saved'] = self.estimated_bytes_saved
+        return summary
+
+    def print_summary(self):
+        """打印整次运行的汇总"""
+        summary = self.summary()
+        pages = summary['pages']
+        if not pages:
+            return
+        text = f"[生产模式] 共 {pages} 个页面，平均每页实际加载 {summary['bytes_loaded'] / pages / 1024:.1f} KB"
+        if self.track_blocked:
+            text += (f"，平均每页拦截 {summary['requests_blocked'] / pages:.1f} 个请求、"
+                     f"按典型大小估计节省 {summary['estimated_bytes_saved'] / pages / 1024:.1f} KB（估计值）")
+        print(text)
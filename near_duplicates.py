@@ -0,0 +1,253 @@
+"""
+近似重复文章检测
+
+同一篇通报常以不同的链接在多个栏目转载，关键词搜索的结果相互重叠，爬虫会重复抓取、保存和索引同样的正文。
+本模块为每篇文章的正文计算MinHash签名，用LSH（局部敏感哈希）在磁盘上（SQLite，默认
+ccdi_near_duplicates.db）查找近似重复的文章，并把它们记为同一个簇：
+    - 签名：正文NFKC规范化并去掉空白后切成5字的片段（shingle），片段哈希后用NUM_PERM个
+      乘移哈希函数分别取最小值，两篇文章签名中相同位置相等的比例即片段集合Jaccard相似度的估计；
+    - LSH：签名分成BANDS段，每段哈希为一个桶号，只有至少一段落入同一个桶的文章才是候选
+      （每篇只需BANDS次索引查询，与已有文章数无关），候选的估计相似度不低于threshold（默认0.8）才算重复；
+    - 簇：第一次出现的文章是簇的代表，后来的近似重复文章记入代表所在的簇；
+    - 摘要：列表页的摘要也计算签名，没有正文的记录按摘要匹配。爬虫可以在爬取详情页之前用摘要查找，
+      与已知文章近似重复时跳过详情页（skip_duplicate_summaries / --skip-duplicate-summaries）。
+爬虫写出每条记录时加入检测（near_duplicates_path / --near-duplicates），近似重复的记录带有
+'重复于' 字段（簇代表的文章ID），不再加入全文索引。也可以从结果文件或HTML归档批量构建。
+
+用法:
+    python near_duplicates.py build ccdi_selenium_reports.jsonl article_archive
+    python near_duplicates.py clusters --min-size 2
+    python near_duplicates.py stats
+"""
+import argparse
+import json
+import re
+import sqlite3
+import sys
+import time
+import unicodedata
+
+import numpy as np
+
+from search_index import PLACEHOLDER_TEXTS, article_key, iter_source_records
+
+DEFAULT_NEAR_DUPLICATES_PATH = 'ccdi_near_duplicates.db'
+DEFAULT_THRESHOLD = 0.8
+DUPLICATE_FIELD = '重复于'
+
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+BANDS = 16  # 每段 NUM_PERM // BANDS = 8 个值，相似度约0.7以上的文章大概率成为候选
+MIN_TEXT_LENGTH = 50  # 更短的正文或摘要（如截断的摘要、错误页）不参与检测
+
+BODY = 'body'
+SUMMARY = 'summary'
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_rng = np.random.default_rng(20240101)  # 固定种子，签名在不同进程之间可以比较
+_PERM_MULTIPLIERS = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_PERM_OFFSETS = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+_BAND_MULTIPLIERS = _rng.integers(1, 2 ** 63, NUM_PERM // BANDS, dtype=np.uint64) | np.uint64(1)
+
+
+def _shingle_hashes(text):
+    """返回文本中不重复的片段哈希（uint64数组）"""
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    count = max(len(codes) - SHINGLE_SIZE + 1, 1)
+    hashes = np.zeros(count, dtype=np.uint64)
+    for offset in range(min(SHINGLE_SIZE, len(codes))):
+        hashes = hashes * np.uint64(0x100000001B3) + codes[offset:offset + count]
+    # 混合高低位，使乘移哈希的高32位分布均匀
+    hashes ^= hashes >> np.uint64(33)
+    hashes *= np.uint64(0xFF51AFD7ED558CCD)
+    hashes ^= hashes >> np.uint64(33)
+    return np.unique(hashes)
+
+
+def minhash(text):
+    """计算文本的MinHash签名（NUM_PERM个uint32），正文过短或为占位文本时返回None"""
+    if not text or text in PLACEHOLDER_TEXTS:
+        return None
+    text = _WHITESPACE_RE.sub('', unicodedata.normalize('NFKC', text)).rstrip('.…')
+    if len(text) < MIN_TEXT_LENGTH:
+        return None
+
+    hashes = _shingle_hashes(text)
+    values = (_PERM_MULTIPLIERS[:, None] * hashes[None, :] + _PERM_OFFSETS[:, None]) >> np.uint64(32)
+    return values.min(axis=1).astype(np.uint32)
+
+
+def band_buckets(signature):
+    """签名每一段的桶号（int64，可以直接存入SQLite）"""
+    bands = signature.astype(np.uint64).reshape(BANDS, -1)
+    return (bands * _BAND_MULTIPLIERS).sum(axis=1).view(np.int64)
+
+
+def similarity(signature, other):
+    """由两个签名估计的Jaccard相似度"""
+    return float(np.count_nonzero(signature == other)) / NUM_PERM
+
+
+class NearDuplicateIndex:
+    def __init__(self, path=DEFAULT_NEAR_DUPLICATES_PATH, threshold=DEFAULT_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(
+            'CREATE TABLE IF NOT EXISTS articles ('
+            'article_key TEXT PRIMARY KEY, link TEXT, title TEXT, cluster TEXT, similarity REAL, '
+            'body_signature BLOB, summary_signature BLOB);'
+            'CREATE INDEX IF NOT EXISTS articles_cluster ON articles (cluster);'
+            'CREATE TABLE IF NOT EXISTS buckets ('
+            'field TEXT, band INTEGER, bucket INTEGER, article_key TEXT, '
+            'PRIMARY KEY (field, band, bucket, article_key)) WITHOUT ROWID;'
+        )
+        self.conn.commit()
+
+    def _best_match(self, field, signature):
+        """在LSH桶中查找与签名最相似的文章，返回 (文章键, 簇, 相似度)，没有达到阈值的返回None"""
+        candidates = set()
+        for band, bucket in enumerate(band_buckets(signature).tolist()):
+            candidates.update(key for (key,) in self.conn.execute(
+                'SELECT article_key FROM buckets WHERE field = ? AND band = ? AND bucket = ?', (field, band, bucket)
+            ))
+        if not candidates:
+            return None
+
+        column = 'body_signature' if field == BODY else 'summary_signature'
+        placeholders = ','.join('?' * len(candidates))
+        best = None
+        for key, cluster, blob in self.conn.execute(
+            f'SELECT article_key, cluster, {column} FROM articles WHERE article_key IN ({placeholders})', list(candidates)
+        ):
+            score = similarity(signature, np.frombuffer(blob, dtype=np.uint32))
+            if score >= self.threshold and (best is None or score > best[2]):
+                best = (key, cluster, score)
+        return best
+
+    def match_summary(self, summary):
+        """列表页摘要与已知文章的摘要近似重复时返回该文章所在的簇，否则返回None"""
+        signature = minhash(summary)
+        if signature is None:
+            return None
+        match = self._best_match(SUMMARY, signature)
+        return match[1] if match else None
+
+    def add(self, record, commit=True):
+        """
+        加入一篇文章，返回它所属簇的代表文章键（不是近似重复时返回None）
+
+        有正文时按正文匹配，没有正文时（如按摘要跳过了详情页）按摘要匹配。已经加入过的文章不会重复加入。
+        """
+        key = article_key(record)
+        if not key:
+            return None
+        row = self.conn.execute('SELECT cluster FROM articles WHERE article_key = ?', (key,)).fetchone()
+        if row:
+            return row[0] if row[0] != key else None
+
+        body = minhash(record.get('正文'))
+        summary = minhash(record.get('摘要'))
+        match = None
+        if body is not None:
+            match = self._best_match(BODY, body)
+        elif summary is not None:
+            match = self._best_match(SUMMARY, summary)
+        cluster, score = (match[1], match[2]) if match else (key, None)
+
+        self.conn.execute(
+            'INSERT INTO articles (article_key, link, title, cluster, similarity, body_signature, summary_signature) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (key, record.get('链接') or '', record.get('标题') or '', cluster, score,
+             body.tobytes() if body is not None else None, summary.tobytes() if summary is not None else None)
+        )
+        # 只有簇的代表写入LSH桶：近似重复的文章与代表足够相似，大量转载时候选数也只与簇数有关
+        for field, signature in ((BODY, body), (SUMMARY, summary)):
+            if signature is not None and not match:
+                self.conn.executemany(
+                    'INSERT OR IGNORE INTO buckets (field, band, bucket, article_key) VALUES (?, ?, ?, ?)',
+                    [(field, band, bucket, key) for band, bucket in enumerate(band_buckets(signature).tolist())]
+                )
+        if commit:
+            self.conn.commit()
+        return cluster if match else None
+
+    def mark(self, record):
+        """加入一篇文章，近似重复时在记录中写入 '重复于' 字段（簇代表的文章ID）并返回True"""
+        cluster = self.add(record)
+        if cluster is None:
+            return False
+        record[DUPLICATE_FIELD] = cluster
+        return True
+
+    def add_many(self, records):
+        """在一个事务中加入多篇文章，返回其中近似重复的篇数"""
+        with self.conn:
+            return sum(self.add(record, commit=False) is not None for record in records)
+
+    def clusters(self, min_size=2):
+        """返回至少有min_size篇文章的簇：[{'簇', '文章': [{'文章ID', '标题', '链接', '相似度'}]}]，按篇数从多到少"""
+        rows = self.conn.execute(
+            'SELECT a.cluster, a.article_key, a.title, a.link, a.similarity FROM articles a '
+            'JOIN (SELECT cluster, COUNT(*) AS size FROM articles GROUP BY cluster HAVING size >= ?) c '
+            'ON c.cluster = a.cluster ORDER BY c.size DESC, a.cluster, a.rowid', (min_size,)
+        )
+        clusters = {}
+        for cluster, key, title, link, score in rows:
+            clusters.setdefault(cluster, []).append({'文章ID': key, '标题': title, '链接': link, '相似度': score})
+        return [{'簇': cluster, '文章': articles} for cluster, articles in clusters.items()]
+
+    def stats(self):
+        """返回文章数、簇数和近似重复的文章数"""
+        articles, clusters = self.conn.execute('SELECT COUNT(*), COUNT(DISTINCT cluster) FROM articles').fetchone()
+        return {'articles': articles, 'clusters': clusters, 'duplicates': articles - clusters}
+
+    def close(self):
+        """提交并关闭数据库连接"""
+        self.conn.commit()
+        self.conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='按正文MinHash签名检测近似重复的文章')
+    parser.add_argument('--index', default=DEFAULT_NEAR_DUPLICATES_PATH, help='签名索引文件')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='估计相似度不低于该值即为近似重复')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='从结果文件、HTML归档或HTML目录加入文章（已加入的文章跳过）')
+    build_parser.add_argument('sources', nargs='+', help='如 ccdi_selenium_reports.jsonl article_archive')
+
+    clusters_parser = subparsers.add_parser('clusters', help='列出近似重复的文章簇')
+    clusters_parser.add_argument('--min-size', type=int, default=2, help='只列出至少有这么多篇文章的簇')
+    clusters_parser.add_argument('--json', action='store_true', help='以JSON输出结果')
+
+    subparsers.add_parser('stats', help='显示索引统计')
+    args = parser.parse_args(argv)
+
+    index = NearDuplicateIndex(args.index, args.threshold)
+    try:
+        if args.command == 'build':
+            for source in args.sources:
+                start = time.perf_counter()
+                duplicates = index.add_many(iter_source_records(source))
+                print(f"已从 {source} 加入文章，其中近似重复 {duplicates} 篇，耗时 {time.perf_counter() - start:.2f} 秒")
+
+        elif args.command == 'clusters':
+            clusters = index.clusters(args.min_size)
+            if args.json:
+                print(json.dumps(clusters, ensure_ascii=False, indent=2))
+                return 0
+            for cluster in clusters:
+                print(f"{cluster['簇']}（{len(cluster['文章'])} 篇）")
+                for article in cluster['文章']:
+                    score = f"{article['相似度']:.2f}" if article['相似度'] is not None else '代表'
+                    print(f"    {article['文章ID']}  {score}  {article['标题']}  {article['链接']}")
+
+        stats = index.stats()
+        print(f"索引 {args.index}: {stats['articles']} 篇文章，{stats['clusters']} 个簇，近似重复 {stats['duplicates']} 篇")
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,333 @@
+"""
+CCDI页面解析工具
+
+基于lxml的静态HTML解析函数，供不启动浏览器的抓取路径使用。
+选择器顺序与两个浏览器版本爬虫中的保持一致。
+"""
+import codecs
+import re
+from urllib.parse import urljoin, urlparse
+
+from lxml import html as lxml_html
+from lxml.cssselect import CSSSelector
+
+# 输出记录的字段顺序，与save_to_csv/save_to_json保持一致（获取方式：详情由http/browser/cache哪一层得到）
+RECORD_FIELDS = ['标题', '链接', '日期', '摘要', '正文', '发布来源', '发布时间', '爬取页码', '获取方式']
+
+# 列表页选择器
+LIST_CONTAINER_SELECTOR = 'ul.s_0603_list'
+LIST_ITEM_SELECTOR = 'ul.s_0603_list li'
+ALTERNATIVE_LIST_ITEM_SELECTOR = '.s_0603_list li, .center_box0 li, .other_center_22 li'
+
+TITLE_SELECTORS = [
+    'em.emtitle b.title a',
+    'b.title a',
+    'a',
+    'em a',
+    '.title a'
+]
+
+DATE_SELECTORS = [
+    'span.time',
+    '.time, .date'
+]
+
+SUMMARY_SELECTORS = [
+    'em.emabstr i.abstract',
+    '.abstract, .summary, .description'
+]
+
+# 分页区域：隐藏的总页数输入框、尾页链接和页码链接
+TOTAL_PAGES_INPUT_SELECTOR = '.page input#pagenum'
+LAST_PAGE_LINK_SELECTOR = '.page a.last-page'
+PAGE_LINK_SELECTOR = '.page a'
+
+# 详情页选择器
+CONTENT_SELECTORS = [
+    '.TRS_Editor',  # 常见的正文容器
+    '.article-content',
+    '.content',
+    '#content',
+    '.detail-content',
+    '.w1100'  # 中央纪委网站常用的内容容器
+]
+
+SOURCE_SELECTORS = [
+    '.source',
+    '.article-source',
+    '.info-source',
+    '.ly',  # 中央纪委网站常用的来源标识
+    '.source-time'
+]
+
+TIME_SELECTORS = [
+    '.time',
+    '.article-time',
+    '.info-time',
+    '.date',
+    '.sj'  # 中央纪委网站常用的时间标识
+]
+
+# 详情页标题（仅离线重新解析时使用，浏览器版本的标题来自列表页）
+ARTICLE_TITLE_SELECTORS = [
+    'h2.tit',
+    'title'
+]
+
+# inner_text近似实现中视为块级、需要换行分隔的标签
+_BLOCK_TAGS = frozenset([
+    'address', 'article', 'br', 'dd', 'div', 'dl', 'dt', 'footer', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'header', 'hr', 'li', 'ol', 'p', 'pre', 'section', 'table', 'td', 'th', 'tr', 'ul'
+])
+_SKIPPED_TAGS = frozenset(['script', 'style', 'noscript', 'template'])
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_SOURCE_RE = re.compile(r'来源[:：]?\s*([^\s]+)')
+_DATETIME_RE = re.compile(r'(\d{4}[-年/]\d{1,2}[-月/]\d{1,2}日?\s*\d{1,2}:\d{1,2}(:\d{1,2})?)')
+_DATE_RE = re.compile(r'(\d{4}[-年/]\d{1,2}[-月/]\d{1,2})')
+_PAGE_PARAM_RE = re.compile(r'[?&]page=(\d+)')
+
+# 编译后的CSS选择器缓存，避免每个元素重复编译
+_compiled_selectors = {}
+
+
+def css(selector):
+    """返回编译后的CSS选择器（带缓存）"""
+    compiled = _compiled_selectors.get(selector)
+    if compiled is None:
+        compiled = CSSSelector(selector)
+        _compiled_selectors[selector] = compiled
+    return compiled
+
+
+def query_selector(element, selector):
+    """返回第一个匹配的元素，没有则返回None"""
+    matches = css(selector)(element)
+    return matches[0] if matches else None
+
+
+def element_text(element):
+    """获取元素文本并合并多余空白，近似浏览器的inner_text"""
+    return ' '.join(element.text_content().split())
+
+
+def inner_text(element):
+    """
+    近似浏览器inner_text的文本提取
+
+    跳过脚本、样式和注释，并在块级元素之间插入换行，
+    避免text_content()把相邻段落直接拼在一起。
+    """
+    parts = []
+
+    def walk(node):
+        if node.text:
+            parts.append(node.text)
+        for child in node:
+            if isinstance(child.tag, str) and child.tag not in _SKIPPED_TAGS:
+                walk(child)
+                if child.tag in _BLOCK_TAGS:
+                    parts.append('\n')
+            if child.tail:
+                parts.append(child.tail)
+
+    walk(element)
+    return ''.join(parts)
+
+
+# 页面开头<meta>中声明的字符集
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([A-Za-z0-9_.:-]+)', re.I)
+# GB2312、GBK页面中常有超出声明字符集的字符，按其超集GB18030解码
+CHARSET_ALIASES = {'gb2312': 'gb18030', 'gbk': 'gb18030'}
+
+
+def decode_html(data):
+    """
+    把页面原始字节解码为str（已是str时原样返回）
+
+    依次按字节顺序标记、前2KB内<meta>声明的字符集、UTF-8、GB18030尝试，都失败时按UTF-8替换非法字节。
+    lxml直接解析没有<meta>声明的字节时按Latin-1解码，中文会变成乱码，因此先在这里解码。
+    """
+    if isinstance(data, str):
+        return data
+    for bom, charset in ((codecs.BOM_UTF8, 'utf-8'), (codecs.BOM_UTF16_LE, 'utf-16-le'), (codecs.BOM_UTF16_BE, 'utf-16-be')):
+        if data.startswith(bom):
+            return data[len(bom):].decode(charset, errors='replace')
+
+    charsets = ['utf-8', 'gb18030']
+    match = META_CHARSET_RE.search(data[:2048])
+    if match:
+        declared = match.group(1).decode('ascii').lower()
+        charsets.insert(0, CHARSET_ALIASES.get(declared, declared))
+    for charset in charsets:
+        try:
+            return data.decode(charset)
+        except (LookupError, UnicodeDecodeError):
+            continue
+    return data.decode('utf-8', errors='replace')
+
+
+def parse_html(page_source):
+    """将HTML源码（str或bytes）解析为lxml文档，bytes按decode_html识别的字符集解码"""
+    return lxml_html.fromstring(decode_html(page_source))
+
+
+def parse_list_page(page_source, page_num, base_url):
+    """
+    解析搜索结果列表页
+
+    返回与浏览器版本相同结构的文章字典列表；
+    如果页面中根本没有结果列表（例如遇到验证页面），返回None。
+    """
+    doc = parse_html(page_source)
+
+    list_items = css(LIST_ITEM_SELECTOR)(doc)
+    if not list_items:
+        list_items = css(ALTERNATIVE_LIST_ITEM_SELECTOR)(doc)
+        if not list_items and query_selector(doc, LIST_CONTAINER_SELECTOR) is None:
+            return None
+
+    base_url_parts = urlparse(base_url)
+    site_root = f"{base_url_parts.scheme}://{base_url_parts.netloc}"
+
+    page_items = []
+    for item in list_items:
+        # 使用与浏览器版本相同的选择器顺序提取标题和链接
+        title_element = None
+        for selector in TITLE_SELECTORS:
+            title_element = query_selector(item, selector)
+            if title_element is not None:
+                break
+
+        if title_element is None:
+            continue
+
+        title = element_text(title_element)
+        link = title_element.get('href')
+
+        # 处理相对URL
+        if link and not link.startswith(('http://', 'https://')):
+            link = urljoin(site_root, link)
+
+        # 提取日期
+        date = "无日期"
+        for selector in DATE_SELECTORS:
+            date_element = query_selector(item, selector)
+            if date_element is not None:
+                date = element_text(date_element)
+                break
+
+        # 提取摘要
+        summary = "无摘要"
+        for selector in SUMMARY_SELECTORS:
+            summary_element = query_selector(item, selector)
+            if summary_element is not None:
+                summary = element_text(summary_element) or "无摘要"
+                break
+
+        page_items.append({
+            '标题': title,
+            '链接': link,
+            '日期': date,
+            '摘要': summary,
+            '正文': "",
+            '发布来源': "",
+            '发布时间': "",
+            '爬取页码': page_num
+        })
+
+    return page_items
+
+
+def parse_total_pages(page_source):
+    """
+    从列表页的分页区域解析总页数，解析不到时返回None
+
+    依次尝试隐藏的总页数输入框（#pagenum）、尾页链接中的page参数和页码链接中的最大数字。
+    """
+    doc = parse_html(page_source)
+
+    total_input = query_selector(doc, TOTAL_PAGES_INPUT_SELECTOR)
+    if total_input is not None and (total_input.get('value') or '').strip().isdigit():
+        return int(total_input.get('value').strip())
+
+    last_link = query_selector(doc, LAST_PAGE_LINK_SELECTOR)
+    if last_link is not None:
+        page_match = _PAGE_PARAM_RE.search(last_link.get('href') or '')
+        if page_match:
+            return int(page_match.group(1))
+
+    page_numbers = [int(text) for text in map(element_text, css(PAGE_LINK_SELECTOR)(doc)) if text.isdigit()]
+    return max(page_numbers) if page_numbers else None
+
+
+def clean_content(text):
+    """清理正文中的多余空白"""
+    return _WHITESPACE_RE.sub(' ', text.strip())
+
+
+def extract_source(source_text):
+    """从来源文本中提取来源信息，匹配不到时返回原文本"""
+    source_match = _SOURCE_RE.search(source_text)
+    if source_match:
+        return source_match.group(1)
+    return source_text
+
+
+def extract_publish_time(time_text):
+    """从时间文本中提取发布时间，优先匹配带时分的格式"""
+    time_match = _DATETIME_RE.search(time_text)
+    if time_match:
+        return time_match.group(1)
+
+    time_match = _DATE_RE.search(time_text)
+    if time_match:
+        return time_match.group(1)
+    return time_text
+
+
+def parse_article_detail(page_source, selectors=None, matched=None):
+    """
+    解析文章详情页
+
+    使用与crawl_article_detail相同的正文、来源、时间选择器顺序，
+    返回只包含匹配到的字段的字典，另外附带从详情页提取的标题（键为'标题'）。
+    selectors可按字段（content/source/time）指定选择器顺序；
+    传入matched字典时写入各字段命中的选择器序号（未命中为None）。
+    """
+    selectors = selectors or {}
+    matched = matched if matched is not None else {}
+    doc = parse_html(page_source)
+    result = {}
+
+    def first_match(field, defaults):
+        matched[field] = None
+        for index, selector in enumerate(selectors.get(field, defaults)):
+            element = query_selector(doc, selector)
+            if element is not None:
+                matched[field] = index
+                return element
+        return None
+
+    # 1. 尝试提取正文
+    content_element = first_match('content', CONTENT_SELECTORS)
+    if content_element is not None:
+        result['正文'] = clean_content(inner_text(content_element))
+
+    # 2. 尝试提取发布来源
+    source_element = first_match('source', SOURCE_SELECTORS)
+    if source_element is not None:
+        result['发布来源'] = extract_source(inner_text(source_element).strip())
+
+    # 3. 尝试提取发布时间
+    time_element = first_match('time', TIME_SELECTORS)
+    if time_element is not None:
+        result['发布时间'] = extract_publish_time(inner_text(time_element).strip())
+
+    for selector in ARTICLE_TITLE_SELECTORS:
+        title_element = query_selector(doc, selector)
+        if title_element is not None:
+            result['标题'] = element_text(title_element)
+            break
+
+    return result
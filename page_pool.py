@@ -0,0 +1,270 @@
+"""
+预热的浏览器页面池
+
+同步版爬虫原先为每篇文章执行一次 context.new_page() 和 page.close()，每个详情页都要
+新建一个渲染目标；Selenium爬虫虽然复用同一个驱动，但同一个标签页会一直使用到结束，
+长时间运行时内存只增不减。本模块提供：
+    - PagePool / AsyncPagePool：预先创建的Playwright页面，取出使用后重置（跳转到about:blank，
+      释放上一篇文章的DOM和脚本）再放回；
+    - SeleniumTabPool：Selenium驱动的工作标签页，用法相同。
+取出时做健康检查（页面已关闭、已崩溃或标签页已不存在时换新的），重置失败或使用出错的页面
+直接丢弃；每个页面使用max_uses次后关闭并换新，限制页面泄漏的内存，长时间运行时内存占用保持平稳。
+页面共用爬虫的浏览器上下文，C3VK Cookie和资源拦截规则对池中的页面同样生效。
+"""
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+
+from crawl_metrics import CrawlMetrics
+
+DEFAULT_MAX_USES = 50  # 每个页面使用多少次后换新
+BLANK_URL = 'about:blank'
+
+
+class _PoolAccounting:
+    """页面池共用的使用次数、崩溃标记和计数器"""
+
+    def __init__(self, size, max_uses, metrics):
+        self.size = size
+        self.max_uses = max_uses
+        self.metrics = metrics or CrawlMetrics()
+        self._idle = deque()
+        self._uses = {}  # 页面 -> 已使用次数
+        self._crashed = set()
+
+    def _track(self, page):
+        """登记新创建的页面"""
+        self._uses[page] = 0
+        self.metrics.inc('page_pool_created_total')
+        return page
+
+    def _is_broken(self, page):
+        return page in self._crashed or page.is_closed()
+
+    def _count_checkout(self, page):
+        self._uses[page] += 1
+        self.metrics.inc('page_pool_checkouts_total')
+        return page
+
+    def _recycle_reason(self, page, healthy):
+        """放回时是否需要换新，返回原因或None"""
+        if not healthy or self._is_broken(page):
+            return 'unhealthy'
+        if self._uses.get(page, 0) >= self.max_uses:
+            return 'max_uses'
+        return None
+
+    def _forget(self, page, reason):
+        self._uses.pop(page, None)
+        self._crashed.discard(page)
+        self.metrics.inc('page_pool_recycled_total', reason=reason)
+
+
+class PagePool(_PoolAccounting):
+    """同步Playwright的页面池（同步API只在创建它的线程中使用，不需要加锁）"""
+
+    def __init__(self, new_page, size=1, max_uses=DEFAULT_MAX_USES, metrics=None):
+        super().__init__(size, max_uses, metrics)
+        self.new_page = new_page  # 创建页面的函数，通常为 context.new_page
+
+    def start(self):
+        """预先创建size个页面"""
+        for _ in range(self.size):
+            self._idle.append(self._create())
+
+    def _create(self):
+        page = self.new_page()
+        page.on('crash', lambda _: self._crashed.add(page))
+        return self._track(page)
+
+    def checkout(self):
+        """取出一个可用的页面，没有空闲页面时新建"""
+        page = self._idle.popleft() if self._idle else self._create()
+        if self._is_broken(page):
+            self._discard(page, 'unhealthy')
+            page = self._create()
+        return self._count_checkout(page)
+
+    def checkin(self, page, healthy=True):
+        """放回页面：重置后留在池中，出错、重置失败或达到使用次数时关闭并补充新页面"""
+        reason = self._recycle_reason(page, healthy)
+        if reason is None:
+            try:
+                with self.metrics.stage('page_reset'):
+                    page.goto(BLANK_URL)
+                self._idle.append(page)
+                return
+            except Exception:
+                reason = 'reset_failed'
+
+        self._discard(page, reason)
+        try:
+            self._idle.append(self._create())
+        except Exception as e:
+            # 浏览器异常时不补充，下次取出时再新建
+            print(f"页面池补充新页面失败: {e}")
+
+    @contextmanager
+    def page(self):
+        """with块内使用一个页面，块内抛出异常时该页面不再复用"""
+        page = self.checkout()
+        healthy = False
+        try:
+            yield page
+            healthy = True
+        finally:
+            self.checkin(page, healthy)
+
+    def _discard(self, page, reason):
+        self._forget(page, reason)
+        try:
+            page.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """关闭池中的空闲页面"""
+        while self._idle:
+            self._discard(self._idle.popleft(), 'closed')
+
+
+class AsyncPagePool(_PoolAccounting):
+    """异步Playwright的页面池（只在事件循环线程中使用）"""
+
+    def __init__(self, new_page, size=4, max_uses=DEFAULT_MAX_USES, metrics=None):
+        super().__init__(size, max_uses, metrics)
+        self.new_page = new_page  # 创建页面的协程函数，通常为 context.new_page
+
+    async def start(self):
+        for _ in range(self.size):
+            self._idle.append(await self._create())
+
+    async def _create(self):
+        page = await self.new_page()
+        page.on('crash', lambda _: self._crashed.add(page))
+        return self._track(page)
+
+    async def checkout(self):
+        page = self._idle.popleft() if self._idle else await self._create()
+        if self._is_broken(page):
+            await self._discard(page, 'unhealthy')
+            page = await self._create()
+        return self._count_checkout(page)
+
+    async def checkin(self, page, healthy=True):
+        reason = self._recycle_reason(page, healthy)
+        if reason is None:
+            try:
+                with self.metrics.stage('page_reset'):
+                    await page.goto(BLANK_URL)
+                self._idle.append(page)
+                return
+            except Exception:
+                reason = 'reset_failed'
+
+        await self._discard(page, reason)
+        try:
+            self._idle.append(await self._create())
+        except Exception as e:
+            print(f"[并发] 页面池补充新页面失败: {e}")
+
+    @asynccontextmanager
+    async def page(self):
+        page = await self.checkout()
+        healthy = False
+        try:
+            yield page
+            healthy = True
+        finally:
+            await self.checkin(page, healthy)
+
+    async def _discard(self, page, reason):
+        self._forget(page, reason)
+        try:
+            await page.close()
+        except Exception:
+            pass
+
+    async def close(self):
+        while self._idle:
+            await self._discard(self._idle.popleft(), 'closed')
+
+
+class SeleniumTabPool:
+    """
+    Selenium驱动的工作标签页
+
+    驱动同一时间只能操作一个标签页，因此池中只有一个标签页：取出时确认它仍然存在并切换过去，
+    放回时跳转到about:blank，使用max_uses次或出错后新开一个标签页并关闭旧的。
+    on_new_tab在新标签页中调用，用于重新设置按标签页生效的CDP命令（如资源拦截）。
+    """
+
+    def __init__(self, driver, max_uses=DEFAULT_MAX_USES, metrics=None, on_new_tab=None):
+        self.driver = driver
+        self.max_uses = max_uses
+        self.metrics = metrics or CrawlMetrics()
+        self.on_new_tab = on_new_tab
+        self.handle = driver.current_window_handle
+        self.uses = 0
+
+    def checkout(self):
+        """切换到工作标签页，标签页已不存在时新开一个"""
+        handles = self.driver.window_handles
+        if self.handle not in handles:
+            self.metrics.inc('page_pool_recycled_total', reason='unhealthy')
+            if handles:
+                self.driver.switch_to.window(handles[0])
+            self._open_tab()
+        elif self.driver.current_window_handle != self.handle:
+            self.driver.switch_to.window(self.handle)
+        self.uses += 1
+        self.metrics.inc('page_pool_checkouts_total')
+        return self.handle
+
+    def checkin(self, healthy=True):
+        """重置工作标签页，出错或达到使用次数时换新"""
+        reason = None
+        if not healthy:
+            reason = 'unhealthy'
+        elif self.uses >= self.max_uses:
+            reason = 'max_uses'
+        else:
+            try:
+                with self.metrics.stage('page_reset'):
+                    self.driver.get(BLANK_URL)
+                return
+            except Exception:
+                reason = 'reset_failed'
+
+        self.metrics.inc('page_pool_recycled_total', reason=reason)
+        try:
+            self._replace_tab()
+        except Exception as e:
+            print(f"更换标签页失败: {e}")
+
+    @contextmanager
+    def tab(self):
+        """with块内使用工作标签页，块内抛出异常时放回后换新"""
+        self.checkout()
+        healthy = False
+        try:
+            yield self.handle
+            healthy = True
+        finally:
+            self.checkin(healthy)
+
+    def _replace_tab(self):
+        """新开一个标签页并关闭旧的"""
+        old_handle = self.handle
+        self._open_tab()
+        if old_handle in self.driver.window_handles:
+            self.driver.switch_to.window(old_handle)
+            self.driver.close()
+            self.driver.switch_to.window(self.handle)
+
+    def _open_tab(self):
+        self.driver.switch_to.new_window('tab')
+        self.handle = self.driver.current_window_handle
+        self.uses = 0
+        self.metrics.inc('page_pool_created_total')
+        if self.on_new_tab:
+            self.on_new_tab()
@@ -0,0 +1,141 @@
+"""
+页内提取脚本
+
+逐元素调用query_selector/find_element时，每次调用都是一次CDP或WebDriver往返，
+一个列表页需要几十次往返。这里的脚本在页面内一次性执行完整的选择器顺序，
+把所有行或字段作为一个JSON结果返回：
+Playwright通过page.evaluate调用，Selenium通过execute_script调用。
+结果中附带各字段命中的选择器序号（0为首选），用于统计选择器回退。
+"""
+from urllib.parse import urljoin, urlparse
+
+from page_parser import (
+    LIST_ITEM_SELECTOR, ALTERNATIVE_LIST_ITEM_SELECTOR, TITLE_SELECTORS, DATE_SELECTORS, SUMMARY_SELECTORS,
+    CONTENT_SELECTORS, SOURCE_SELECTORS, TIME_SELECTORS, clean_content, extract_source, extract_publish_time
+)
+
+# 列表页：返回 [{title, link, date, summary, titleIndex}]
+LIST_EXTRACT_JS = """
+(args) => {
+    const first = (root, selectors) => {
+        for (const selector of selectors) {
+            const element = root.querySelector(selector);
+            if (element) return element;
+        }
+        return null;
+    };
+    const text = (element) => element.innerText || element.textContent || '';
+
+    let items = document.querySelectorAll(args.itemSelector);
+    if (!items.length) items = document.querySelectorAll(args.alternativeItemSelector);
+
+    const rows = [];
+    for (const item of items) {
+        let titleElement = null;
+        let titleIndex = 0;
+        for (; titleIndex < args.titleSelectors.length; titleIndex++) {
+            titleElement = item.querySelector(args.titleSelectors[titleIndex]);
+            if (titleElement) break;
+        }
+        if (!titleElement) continue;
+        const dateElement = first(item, args.dateSelectors);
+        const summaryElement = first(item, args.summarySelectors);
+        rows.push({
+            title: text(titleElement),
+            link: titleElement.getAttribute('href'),
+            date: dateElement ? text(dateElement).trim() : null,
+            summary: summaryElement ? text(summaryElement).trim() : null,
+            titleIndex: titleIndex
+        });
+    }
+    return rows;
+}
+"""
+
+# 详情页：返回 {content, source, time, matched}，未匹配的字段为null，
+# matched为各字段命中的选择器序号
+DETAIL_EXTRACT_JS = """
+(args) => {
+    const matched = {};
+    const firstText = (field) => {
+        const selectors = args[field];
+        for (let i = 0; i < selectors.length; i++) {
+            const element = document.querySelector(selectors[i]);
+            if (element) {
+                matched[field] = i;
+                return element.innerText || element.textContent || '';
+            }
+        }
+        matched[field] = null;
+        return null;
+    };
+    return {
+        content: firstText('content'),
+        source: firstText('source'),
+        time: firstText('time'),
+        matched: matched
+    };
+}
+"""
+
+# 默认选择器顺序；爬虫按SelectorStats的命中统计调整顺序后传入同样结构的参数
+LIST_SCRIPT_ARGS = {
+    'itemSelector': LIST_ITEM_SELECTOR,
+    'alternativeItemSelector': ALTERNATIVE_LIST_ITEM_SELECTOR,
+    'titleSelectors': TITLE_SELECTORS,
+    'dateSelectors': DATE_SELECTORS,
+    'summarySelectors': SUMMARY_SELECTORS,
+}
+
+DETAIL_SCRIPT_ARGS = {
+    'content': CONTENT_SELECTORS,
+    'source': SOURCE_SELECTORS,
+    'time': TIME_SELECTORS,
+}
+
+
+def selenium_script(function_source):
+    """将箭头函数包装成execute_script可执行的脚本（参数通过arguments[0]传入）"""
+    return f"return ({function_source.strip()})(arguments[0]);"
+
+
+def rows_to_articles(rows, page_num, base_url):
+    """将列表页脚本返回的行转换为与逐元素提取相同结构的文章字典"""
+    base_url_parts = urlparse(base_url)
+    site_root = f"{base_url_parts.scheme}://{base_url_parts.netloc}"
+
+    page_items = []
+    for row in rows:
+        link = row['link']
+
+        # 处理相对URL
+        if link and not link.startswith(('http://', 'https://')):
+            link = urljoin(site_root, link)
+
+        page_items.append({
+            '标题': row['title'],
+            '链接': link,
+            '日期': row['date'] if row['date'] is not None else "无日期",
+            '摘要': row['summary'] or "无摘要",
+            '正文': "",
+            '发布来源': "",
+            '发布时间': "",
+            '爬取页码': page_num
+        })
+    return page_items
+
+
+def payload_to_detail(payload):
+    """将详情页脚本的返回值转换为详情数据，清理规则与逐元素提取相同"""
+    result = {}
+    if payload.get('content') is not None:
+        result['正文'] = clean_content(payload['content'])
+    if payload.get('source') is not None:
+        result['发布来源'] = extract_source(payload['source'].strip())
+    if payload.get('time') is not None:
+        result['发布时间'] = extract_publish_time(payload['time'].strip())
+    return result
+
+
+SELENIUM_LIST_EXTRACT_JS = selenium_script(LIST_EXTRACT_JS)
+SELENIUM_DETAIL_EXTRACT_JS = selenium_script(DETAIL_EXTRACT_JS)
@@ -0,0 +1,158 @@
+"""
+按发布年月分区的Parquet导出
+
+save_to_csv/save_to_json把全部结果写成一个CSV或一个缩进的JSON数组（30条记录约243KB，大部分是正文），
+下游每次都要重新解析整个文件。本模块从JSONL结果文件按批（默认每批5000条）读取记录，
+用normalize.normalize_columns规范化后转换为Arrow RecordBatch，流式写入按发布年月分区的Parquet数据集：
+
+    ccdi_reports_parquet/year=2024/month=4/part-0.parquet
+
+    - 发布来源、获取方式为Arrow字典类型（pandas读出为category），与爬取页码一样按Parquet字典编码存储；
+    - 正文用zstd压缩，其他列用snappy；
+    - 日期和发布时间为时间戳列，year/month由发布时间得到（无法解析时为分区默认值）。
+只读取某个月的部分列时只打开对应分区的文件、只解压这些列：
+
+    read_month('ccdi_reports_parquet', 2024, 4, columns=['标题', '发布来源'])
+
+每次导出完整重写数据集：先写入 <输出目录>.tmp，完成后替换旧目录。
+
+用法:
+    python parquet_export.py ccdi_selenium_reports.jsonl --output ccdi_reports_parquet
+"""
+import argparse
+import itertools
+import os
+import shutil
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from normalize import ARTICLE_ID_FIELD, normalize_columns
+from result_sink import iter_records
+
+DEFAULT_PARQUET_PATH = 'ccdi_reports_parquet'
+DEFAULT_BATCH_SIZE = 5000
+
+PARTITION_SCHEMA = pa.schema([('year', pa.int16()), ('month', pa.int8())])
+
+# 写入Parquet的列及类型，JSONL中的其他字段不导出
+RECORD_SCHEMA = pa.schema([
+    ('标题', pa.string()),
+    ('链接', pa.string()),
+    (ARTICLE_ID_FIELD, pa.string()),
+    ('日期', pa.timestamp('ms')),
+    ('摘要', pa.string()),
+    ('正文', pa.string()),
+    ('发布来源', pa.dictionary(pa.int32(), pa.string())),
+    ('发布时间', pa.timestamp('ms')),
+    ('爬取页码', pa.int32()),
+    ('获取方式', pa.dictionary(pa.int8(), pa.string())),
+]).append(PARTITION_SCHEMA.field('year')).append(PARTITION_SCHEMA.field('month'))
+
+DICTIONARY_FIELDS = ['发布来源', '爬取页码', '获取方式']
+BODY_COMPRESSION = 'zstd'
+DEFAULT_COMPRESSION = 'snappy'
+
+
+def _write_options():
+    compression = {field.name: DEFAULT_COMPRESSION for field in RECORD_SCHEMA if field.name not in PARTITION_SCHEMA.names}
+    compression['正文'] = BODY_COMPRESSION
+    return ds.ParquetFileFormat().make_write_options(compression=compression, use_dictionary=DICTIONARY_FIELDS)
+
+
+def records_to_batch(records):
+    """把一批记录规范化并转换为符合RECORD_SCHEMA的RecordBatch"""
+    df = normalize_columns(pd.DataFrame.from_records(records))
+    df['爬取页码'] = pd.to_numeric(df['爬取页码'], errors='coerce').astype('Int32')
+    published = df['发布时间']
+    df['year'] = published.dt.year.astype('Int16')
+    df['month'] = published.dt.month.astype('Int8')
+    for field in ('日期', '发布时间'):
+        df[field] = df[field].astype('datetime64[ms]')
+
+    arrays = []
+    for field in RECORD_SCHEMA:
+        if pa.types.is_dictionary(field.type):
+            # 先按取值类型转换再字典编码，字典只包含本批中出现的取值
+            array = pa.array(df[field.name], type=field.type.value_type, from_pandas=True)
+            arrays.append(array.dictionary_encode().cast(field.type))
+        else:
+            arrays.append(pa.array(df[field.name], type=field.type, from_pandas=True))
+    return pa.RecordBatch.from_arrays(arrays, schema=RECORD_SCHEMA)
+
+
+def iter_batches(jsonl_path, batch_size=DEFAULT_BATCH_SIZE):
+    """从JSONL文件逐批读取并转换，内存中只保留一批记录"""
+    records = iter_records(jsonl_path)
+    while True:
+        chunk = list(itertools.islice(records, batch_size))
+        if not chunk:
+            return
+        yield records_to_batch(chunk)
+
+
+def export_parquet(jsonl_path, output=DEFAULT_PARQUET_PATH, batch_size=DEFAULT_BATCH_SIZE):
+    """从JSONL结果文件流式生成按发布年月分区的Parquet数据集，返回记录数"""
+    count = 0
+
+    def counted(batches):
+        nonlocal count
+        for batch in batches:
+            count += batch.num_rows
+            yield batch
+
+    tmp_path = f"{output}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    reader = pa.RecordBatchReader.from_batches(RECORD_SCHEMA, counted(iter_batches(jsonl_path, batch_size)))
+    ds.write_dataset(
+        reader,
+        tmp_path,
+        format='parquet',
+        partitioning=ds.partitioning(PARTITION_SCHEMA, flavor='hive'),
+        file_options=_write_options(),
+        existing_data_behavior='overwrite_or_ignore',
+    )
+
+    if count == 0:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        return 0
+    if os.path.exists(output):
+        shutil.rmtree(output)
+    os.replace(tmp_path, output)
+    return count
+
+
+def open_dataset(path=DEFAULT_PARQUET_PATH):
+    """打开导出的数据集（year/month为分区列）"""
+    return ds.dataset(path, format='parquet', partitioning=ds.partitioning(PARTITION_SCHEMA, flavor='hive'))
+
+
+def read_month(path, year, month, columns=None):
+    """读取某年某月的记录（可只读部分列），返回DataFrame"""
+    dataset = open_dataset(path)
+    month_filter = (ds.field('year') == year) & (ds.field('month') == month)
+    return dataset.to_table(columns=columns, filter=month_filter).to_pandas()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='把JSONL爬取结果导出为按发布年月分区的Parquet数据集')
+    parser.add_argument('input', help='JSONL结果文件，如 ccdi_selenium_reports.jsonl')
+    parser.add_argument('--output', default=DEFAULT_PARQUET_PATH, help='输出目录（会被整体替换）')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='每批读取和转换的记录数')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    count = export_parquet(args.input, args.output, args.batch_size)
+    elapsed = time.perf_counter() - start
+    if not count:
+        print("没有数据可保存")
+        return
+
+    months = len(open_dataset(args.output).files)
+    print(f"数据已保存至 {args.output}，共{count}条记录，{months} 个分区文件，耗时 {elapsed:.2f} 秒")
+
+
+if __name__ == "__main__":
+    main()
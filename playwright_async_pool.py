@@ -0,0 +1,289 @@
+"""
+Playwright异步详情页池
+
+同步版爬虫逐个打开详情页，大部分时间都花在等待网络上。
+本模块在后台线程中运行一个asyncio事件循环和独立的异步浏览器，
+按速率控制器当前允许的并发数限制同时在途的详情页数量（不超过concurrency），
+供CCDIPlaywrightSpider的并发模式调用。
+每个并发槽位对应一个预先创建的页面（AsyncPagePool），使用后重置放回，不再为每篇文章新建页面。
+"""
+import asyncio
+import threading
+import time
+
+from playwright.async_api import async_playwright
+
+from urllib.parse import urlparse
+
+from c3vk_challenge import CHALLENGE_PAGE_MAX_LENGTH, SharedCookieCache, is_challenge_page, solve_challenge, to_playwright_cookie
+from crawl_metrics import CrawlMetrics
+from http_backend import DEFAULT_USER_AGENT
+from page_pool import DEFAULT_MAX_USES, AsyncPagePool
+from page_parser import parse_article_detail, clean_content, extract_source, extract_publish_time
+from page_scripts import DETAIL_EXTRACT_JS, payload_to_detail
+from rate_control import AdaptiveRateController, CHALLENGE, SERVER_ERROR
+from selector_stats import SelectorStats
+
+
+class AsyncDetailPool:
+    def __init__(self, concurrency=4, archive=None, user_agent=DEFAULT_USER_AGENT,
+                 headless=True, timeout=30000, extraction_mode='script',
+                 wait_until="networkidle", ready_selector=None, load_stats=None, metrics=None,
+                 selector_stats=None, page_max_uses=DEFAULT_MAX_USES, rate_controller=None, cookie_cache=None):
+        self.concurrency = concurrency  # 并发数上限
+        self.archive = archive  # 详情页HTML归档（HtmlArchive），为None时不保存
+        self.user_agent = user_agent
+        self.headless = headless
+        self.timeout = timeout
+        self.extraction_mode = extraction_mode
+        self.wait_until = wait_until
+        self.ready_selector = ready_selector  # 生产模式下的就绪选择器
+        self.load_stats = load_stats  # 生产模式下的请求拦截统计
+        self.metrics = metrics or CrawlMetrics()  # 与同步爬虫共用时各阶段合并统计
+        self.selector_stats = selector_stats or SelectorStats(path=None, metrics=self.metrics)
+        self.page_max_uses = page_max_uses
+        # 请求节奏和当前并发数（与同步爬虫共用时一起调整）
+        self.rate_controller = rate_controller or AdaptiveRateController(
+            'detail', max_concurrency=concurrency, metrics=self.metrics
+        )
+        # C3VK Cookie缓存（与同步爬虫共用时求解结果互相可见），批次中途过期时重新求解
+        self.cookie_cache = cookie_cache or SharedCookieCache()
+        self.loop = None
+        self.thread = None
+
+    def start(self):
+        """在后台线程中启动事件循环和异步浏览器"""
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='playwright-detail-pool', daemon=True)
+        self.thread.start()
+        self._run(self._start())
+
+    def _run(self, coro):
+        """在后台事件循环中执行协程并等待结果"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def _start(self):
+        self.playwright = await async_playwright().start()
+        self.browser = await self.playwright.chromium.launch(headless=self.headless)
+        self.context = await self.browser.new_context(
+            viewport={'width': 1280, 'height': 720},
+            user_agent=self.user_agent
+        )
+        self.context.set_default_timeout(self.timeout)
+        if self.load_stats:
+            await self.context.route('**/*', self.load_stats.async_playwright_route_handler)
+        self.slots = asyncio.Condition()
+        self.in_flight = 0
+        self.pages = AsyncPagePool(self.context.new_page, self.concurrency, self.page_max_uses, self.metrics)
+        await self.pages.start()
+
+    def crawl_details(self, article_links, cookie=None, cookie_domain=None):
+        """
+        并发爬取一组详情页
+
+        article_links为 [(结果索引, 链接)]，返回 [(结果索引, 详情数据或None)]，顺序与输入一致。
+        """
+        return self._run(self._crawl_all(article_links, cookie, cookie_domain))
+
+    async def _crawl_all(self, article_links, cookie, cookie_domain):
+        if cookie:
+            await self.context.add_cookies([to_playwright_cookie(cookie, cookie_domain)])
+
+        start = time.perf_counter()
+        details = await asyncio.gather(*(self._crawl_one(link) for _, link in article_links))
+        elapsed = time.perf_counter() - start
+        print(f"[并发] {len(article_links)} 个详情页完成，耗时 {elapsed:.2f} 秒（并发数 {self.concurrency}）")
+        if self.load_stats:
+            self.load_stats.record_page(f"{len(article_links)} 个并发详情页", pages=len(article_links))
+
+        return [(idx, detail) for (idx, _), detail in zip(article_links, details)]
+
+    async def _acquire_slot(self):
+        """等待在途数低于速率控制器当前允许的并发数"""
+        async with self.slots:
+            await self.slots.wait_for(lambda: self.in_flight < min(self.concurrency, self.rate_controller.concurrency))
+            self.in_flight += 1
+
+    async def _release_slot(self):
+        async with self.slots:
+            self.in_flight -= 1
+            self.slots.notify_all()
+
+    async def _crawl_one(self, url):
+        await self._acquire_slot()
+        try:
+            # 按速率控制器的节奏开始请求
+            with self.metrics.stage('detail_delay'):
+                await asyncio.sleep(self.rate_controller.reserve())
+            return await self._crawl_detail(url)
+        finally:
+            await self._release_slot()
+
+    async def _crawl_detail(self, url):
+        """用池中的页面打开详情页并提取，结果反馈给速率控制器"""
+        page = None
+        healthy = False
+        start = time.perf_counter()
+        try:
+            print(f"[并发] 正在访问文章详情页: {url}")
+            with self.metrics.stage('detail_goto'):
+                page = await self.pages.checkout()
+                response = await page.goto(url, wait_until=self.wait_until)
+            if response and response.status >= 500:
+                self.rate_controller.record_failure(SERVER_ERROR)
+            with self.metrics.stage('detail_challenge'):
+                response = await self._handle_challenge(page, url, response)
+
+            # 原始字节模式：保存并解析服务器返回的文档，有正文时不再序列化DOM和执行页内脚本
+            body = None
+            if self.extraction_mode == 'raw' and response and response.status == 200:
+                with self.metrics.stage('detail_body'):
+                    body = await response.body()
+                if self.archive:
+                    with self.metrics.stage('archive_write'):
+                        self.archive.put(url, body)
+                with self.metrics.stage('detail_extract'):
+                    detail = self._extract_from_body(body, url)
+                if detail is not None:
+                    healthy = True
+                    self.rate_controller.record_success(time.perf_counter() - start)
+                    return detail
+
+            with self.metrics.stage('detail_wait_for_selector'):
+                await page.wait_for_load_state('domcontentloaded')
+                if self.ready_selector:
+                    try:
+                        await page.wait_for_selector(self.ready_selector, timeout=10000)
+                    except Exception as e:
+                        print(f"[并发] 未找到正文容器，继续尝试提取: {url}")
+                        self.metrics.record_failure('detail_wait_for_selector', e)
+
+            # 保存详情页HTML到归档，供调试和离线重新解析
+            if self.archive and body is None:
+                with self.metrics.stage('detail_content'):
+                    page_source = await page.content()
+                with self.metrics.stage('archive_write'):
+                    self.archive.put(url, page_source)
+
+            with self.metrics.stage('detail_extract'):
+                orders = self.selector_stats.detail_orders(url)
+                detail = None
+                if self.extraction_mode != 'element':
+                    try:
+                        payload = await page.evaluate(DETAIL_EXTRACT_JS, orders)
+                        self.selector_stats.record_matches(orders, payload.get('matched', {}), url)
+                        detail = payload_to_detail(payload)
+                    except Exception as e:
+                        print(f"[并发] 页内脚本提取详情失败，改用逐元素提取: {e}")
+                        self.metrics.record_failure('detail_extract_script', e)
+
+                if detail is None:
+                    detail = await self._extract_with_elements(page, url, orders)
+
+            healthy = True
+            if detail:
+                self.rate_controller.record_success(time.perf_counter() - start)
+            return detail
+
+        except Exception as e:
+            print(f"[并发] 爬取文章详情时出错: {url}: {e}")
+            self.metrics.record_failure('crawl_article_detail', e)
+            self.rate_controller.record_error(e)
+            return None
+
+        finally:
+            # 放回页面池：重置后复用，出错的页面关闭并换新
+            if page:
+                await self.pages.checkin(page, healthy)
+            self.metrics.observe('detail_total', time.perf_counter() - start)
+
+    async def _handle_challenge(self, page, url, response):
+        """
+        详情页返回C3VK验证页时在进程内求解Cookie，写入共享缓存和浏览器上下文后重新打开一次
+
+        返回当前页面的文档响应；与同步爬虫的handle_challenge_page相同，按响应长度粗筛，正常页面不做解析。
+        """
+        if response is None:
+            return None
+        try:
+            body = await response.body()
+        except Exception:
+            # 验证脚本已经触发跳转，响应体不可用
+            return response
+        if len(body) > CHALLENGE_PAGE_MAX_LENGTH or not is_challenge_page(body):
+            return response
+
+        # 带着仍有效的Cookie还被验证，说明请求过快，需要降速（Cookie过期后的验证不算）
+        if self.cookie_cache.get() is not None:
+            self.rate_controller.record_failure(CHALLENGE)
+
+        solution = solve_challenge(body)
+        if not solution:
+            print(f"[并发] 验证页处理失败，可能影响详情页数据获取: {url}")
+            return response
+
+        print(f"[并发] 遇到C3VK验证页，已求解Cookie，重新打开详情页: {url}")
+        cookie = self.cookie_cache.store(solution)
+        await self.context.add_cookies([to_playwright_cookie(cookie, urlparse(url).hostname)])
+        return await page.goto(url, wait_until=self.wait_until)
+
+    def _extract_from_body(self, body, url):
+        """用lxml从文档原始字节中提取详情，没有正文（可能由脚本渲染）时返回None"""
+        orders = self.selector_stats.detail_orders(url)
+        matched = {}
+        detail = parse_article_detail(body, orders, matched)
+        if not detail.get('正文'):
+            return None
+        self.selector_stats.record_matches(orders, matched, url)
+        detail.pop('标题', None)  # 标题沿用列表页的
+        return detail
+
+    async def _extract_with_elements(self, page, url, orders):
+        """逐个选择器查询详情页元素，提取正文、来源和时间"""
+        result = {}
+        matched = {'content': None, 'source': None, 'time': None}  # 各字段命中的选择器序号
+
+        # 1. 尝试提取正文
+        for index, selector in enumerate(orders['content']):
+            content_element = await page.query_selector(selector)
+            if content_element:
+                result['正文'] = clean_content(await content_element.inner_text())
+                matched['content'] = index
+                break
+
+        # 2. 尝试提取发布来源
+        for index, selector in enumerate(orders['source']):
+            source_element = await page.query_selector(selector)
+            if source_element:
+                result['发布来源'] = extract_source((await source_element.inner_text()).strip())
+                matched['source'] = index
+                break
+
+        # 3. 尝试提取发布时间
+        for index, selector in enumerate(orders['time']):
+            time_element = await page.query_selector(selector)
+            if time_element:
+                result['发布时间'] = extract_publish_time((await time_element.inner_text()).strip())
+                matched['time'] = index
+                break
+
+        self.selector_stats.record_matches(orders, matched, url)
+        return result
+
+    async def _close(self):
+        await self.pages.close()
+        await self.browser.close()
+        await self.playwright.stop()
+
+    def close(self):
+        """关闭异步浏览器并停止后台事件循环"""
+        if not self.loop:
+            return
+
+        try:
+            self._run(self._close())
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=10)
+            self.loop = None
+        print("异步详情页池已关闭")
@@ -1,14 +1,36 @@
 import time
-import pandas as pd
 import json
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
-import os
-import re
-import random
-from urllib.parse import urljoin, urlparse, parse_qs, urlencode, urlunparse
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse, parse_qs, urlencode
+from http_backend import CCDIHttpBackend
+from c3vk_challenge import CHALLENGE_PAGE_MAX_LENGTH, SharedCookieCache, apply_cookie_to_playwright_context, is_challenge_page, solve_challenge
+from playwright_async_pool import AsyncDetailPool
+from load_profile import PRODUCTION_PROFILE, DEFAULT_ALLOWED_RESOURCE_TYPES, LIST_READY_SELECTOR, DETAIL_READY_SELECTOR, PAGE_TRANSFER_JS, LoadStats
+from seen_index import SeenArticleIndex
+from result_sink import JsonlResultSink, export_csv, export_json, merge_records
+from checkpoint import CrawlCheckpoint
+from html_archive import DEFAULT_ARCHIVE_PATH, HtmlArchive
+from detail_cache import CACHE_MODES, DetailCache
+from crawl_metrics import CrawlMetrics
+from selector_stats import DEFAULT_SELECTOR_STATS_PATH, SelectorStats
+from page_pool import DEFAULT_MAX_USES, PagePool
+from rate_control import AdaptiveRateController, CHALLENGE, SERVER_ERROR, LIST_INITIAL_RATE, LIST_MAX_RATE, DETAIL_INITIAL_RATE, DETAIL_MAX_RATE
+from retry_queue import DEFAULT_MAX_ATTEMPTS, RetryQueue, finish_dead_letters, take_dead_letters
+from tiered_fetch import TieredDetailFetcher, TIER_FIELD, BROWSER_TIER, CACHE_TIER
+from page_parser import parse_total_pages, parse_article_detail, clean_content, extract_source, extract_publish_time
+from page_scripts import LIST_EXTRACT_JS, DETAIL_EXTRACT_JS, LIST_SCRIPT_ARGS, rows_to_articles, payload_to_detail
 
 class CCDIPlaywrightSpider:
-    def __init__(self):
+    def __init__(self, use_http_backend=True, detail_concurrency=1, seen_index_path=None, extraction_mode='script',
+                 sink_path=None, checkpoint_path=None, resume=False,
+                 archive_path=DEFAULT_ARCHIVE_PATH, detail_cache_mode=None, detail_cache_ttl=None,
+                 metrics_textfile=None, metrics_summary_path=None, http_details=True,
+                 selector_stats_path=DEFAULT_SELECTOR_STATS_PATH, page_max_uses=DEFAULT_MAX_USES,
+                 max_detail_rate=DETAIL_MAX_RATE, retry_attempts=DEFAULT_MAX_ATTEMPTS, dead_letter_path=None,
+                 search_index_path=None, near_duplicates_path=None, skip_duplicate_summaries=False,
+                 max_list_rate=LIST_MAX_RATE):
         # 设置目标URL
         self.base_url = "https://www.ccdi.gov.cn/was5/web/search"
         self.params = {
@@ -30,12 +52,100 @@ class CCDIPlaywrightSpider:
         }
         self.url = self.build_url(1)
         self.results = []
-        self.detail_folder = "article_details_playwright"  # 用于保存详情页HTML的文件夹
+        self.archive = HtmlArchive(archive_path)  # 详情页HTML的压缩归档
         self.pages_crawled = 0
         
-        # 创建保存详情页的文件夹
-        if not os.path.exists(self.detail_folder):
-            os.makedirs(self.detail_folder)
+        # 增量爬取：记录已爬取文章ID的磁盘索引（为None时每次全量爬取）
+        self.seen_index = SeenArticleIndex(seen_index_path) if seen_index_path else None
+        self.last_page_all_known = False
+        
+        # 断点续爬：每个列表页和详情页完成后记录进度，已完成的记录保存在JSONL文件中
+        if checkpoint_path and not sink_path:
+            raise ValueError("断点续爬需要同时设置sink_path")
+        self.checkpoint = CrawlCheckpoint(checkpoint_path) if checkpoint_path else None
+        self.last_page_failed = False
+        resuming = False
+        if self.checkpoint and resume:
+            resuming = self.checkpoint.load()
+            if not resuming:
+                print("未找到可用的断点，从第1页开始爬取")
+        
+        # 流式输出：每条记录完成后立即追加到JSONL文件，并释放内存中的副本（续爬时追加到上次的文件）
+        self.sink = JsonlResultSink(sink_path, append=resuming) if sink_path else None
+        self.detail_concurrency = detail_concurrency  # 大于1时使用异步详情页池并发爬取
+        self.detail_pool = None
+        
+        # 详情页使用预先创建的页面，每个页面使用page_max_uses次后换新
+        self.page_max_uses = page_max_uses
+        self.page_pool = None
+        
+        # 'script': 每个页面只执行一次页内脚本提取全部字段；'element': 逐元素查询；
+        # 'raw': 详情页保存并解析文档响应的原始字节（不序列化DOM），没有正文时再用页内脚本提取
+        self.extraction_mode = extraction_mode
+        
+        # 页面加载配置，由setup_browser的profile参数决定
+        self.profile = 'default'
+        self.wait_until = "networkidle"
+        self.load_stats = None
+        
+        # C3VK验证Cookie在HTTP会话和浏览器之间共享，只需求解一次
+        self.cookie_cache = SharedCookieCache()
+        self.cookie_domain = urlparse(self.base_url).hostname
+        self.applied_cookie_version = None
+        
+        # 列表页优先使用的HTTP后端（为None时全部使用浏览器）
+        self.http_backend = CCDIHttpBackend(cookie_cache=self.cookie_cache) if use_http_backend else None
+        
+        # 详情页缓存：'trust'直接使用归档副本，'revalidate'先发条件请求（为None时每次都用浏览器爬取）
+        self.detail_cache = None
+        if detail_cache_mode:
+            self.detail_cache = DetailCache(self.archive, detail_cache_mode, detail_cache_ttl, self.http_backend)
+        
+        # 分阶段计时与计数：每页完成后更新Prometheus textfile，结束时写出JSON汇总（路径为None时不写）
+        self.metrics = CrawlMetrics()
+        self.metrics_textfile = metrics_textfile
+        self.metrics_summary_path = metrics_summary_path
+        
+        # 自适应选择器顺序：按历史命中统计先尝试最常命中的选择器，统计保存在文件中（为None时不保存）
+        self.selector_stats = SelectorStats(selector_stats_path, metrics=self.metrics)
+        
+        # 自适应速率：列表页和详情页各一个控制器，响应正常时加速，超时、验证页或5xx时减速
+        # （列表页速率不超过max_list_rate、详情页不超过max_detail_rate请求/秒，并发不超过detail_concurrency；
+        # 上限只约束本进程，多进程分片爬取时由sharded_crawl按工作进程数分摊）
+        self.list_rate = AdaptiveRateController(
+            'list', LIST_INITIAL_RATE, max_list_rate, increase=0.02, metrics=self.metrics
+        )
+        self.detail_rate = AdaptiveRateController(
+            'detail', DETAIL_INITIAL_RATE, max_detail_rate, initial_concurrency=max(1, detail_concurrency // 2),
+            max_concurrency=detail_concurrency, metrics=self.metrics
+        )
+        
+        # 详情页重试：失败的文章按指数退避稍后重试，retry_attempts次仍失败时写入死信文件（为None时不保存）
+        self.retry_queue = RetryQueue(retry_attempts, dead_letter_path=dead_letter_path, metrics=self.metrics)
+        
+        # 全文索引：每条记录写出时加入标题、摘要、正文的倒排索引（为None时不建索引；依赖numpy，启用时才导入）
+        self.search_index = None
+        if search_index_path:
+            from search_index import SearchIndex
+            self.search_index = SearchIndex(search_index_path)
+        
+        # 近似重复检测：按正文的MinHash签名把转载的同一篇文章记为一个簇，重复的记录不再加入全文索引；
+        # skip_duplicate_summaries为True时，列表页摘要与已知文章近似重复的不爬取详情页
+        if skip_duplicate_summaries and not near_duplicates_path:
+            raise ValueError("按摘要跳过重复文章需要同时设置near_duplicates_path")
+        self.near_duplicates = None
+        if near_duplicates_path:
+            from near_duplicates import NearDuplicateIndex
+            self.near_duplicates = NearDuplicateIndex(near_duplicates_path)
+        self.skip_duplicate_summaries = skip_duplicate_summaries
+        self.last_detail_error = None
+        
+        # 分层抓取详情页：先用HTTP后端抓取并解析，验证页、无正文或页面过短时才使用浏览器
+        self.tiered_fetcher = None
+        if http_details and self.http_backend:
+            self.tiered_fetcher = TieredDetailFetcher(
+                self.http_backend, self.archive, self.metrics, self.selector_stats, rate_controller=self.detail_rate
+            )
 
     def build_url(self, page_num):
         """根据页码构建URL"""
@@ -43,15 +153,26 @@ class CCDIPlaywrightSpider:
         query_string = urlencode(self.params)
         return f"{self.base_url}?{query_string}"
 
-    def setup_browser(self):
-        """设置Playwright浏览器"""
+    def setup_browser(self, profile='default', allowed_resource_types=DEFAULT_ALLOWED_RESOURCE_TYPES):
+        """
+        设置Playwright浏览器
+        
+        profile='production' 时使用无头模式、拦截文档以外的资源（allowed_resource_types可配置），
+        并以domcontentloaded加目标选择器作为页面就绪条件。
+        """
+        self.profile = profile
+        production = profile == PRODUCTION_PROFILE
+        if production:
+            self.wait_until = "domcontentloaded"
+            self.load_stats = LoadStats(allowed_resource_types)
+        
         self.playwright = sync_playwright().start()
         
         try:
             # 尝试启动Chromium浏览器
             self.browser = self.playwright.chromium.launch(
-                headless=False,  # 设置为True可启用无头模式
-                slow_mo=50,  # 操作之间的延时，便于调试
+                headless=production,  # 生产模式使用无头模式
+                slow_mo=0 if production else 50,  # 操作之间的延时，便于调试
             )
             print("成功启动Chromium浏览器")
             
@@ -61,12 +182,41 @@ class CCDIPlaywrightSpider:
                 user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36'
             )
             
+            # 生产模式：拦截文档以外的资源请求
+            if self.load_stats:
+                self.context.route('**/*', self.load_stats.playwright_route_handler)
+            
+            # 带上已缓存的C3VK Cookie，避免每个页面重新执行验证脚本
+            self.sync_challenge_cookie()
+            
             # 创建新页面
             self.page = self.context.new_page()
             
             # 设置超时时间(毫秒)
             self.page.set_default_timeout(30000)
             
+            # 预先创建详情页使用的页面
+            self.page_pool = PagePool(self.context.new_page, max_uses=self.page_max_uses, metrics=self.metrics)
+            self.page_pool.start()
+            
+            # 并发模式下启动异步详情页池
+            if self.detail_concurrency > 1:
+                self.detail_pool = AsyncDetailPool(
+                    concurrency=self.detail_concurrency,
+                    archive=self.archive,
+                    extraction_mode=self.extraction_mode,
+                    wait_until=self.wait_until,
+                    ready_selector=DETAIL_READY_SELECTOR if production else None,
+                    load_stats=self.load_stats,
+                    metrics=self.metrics,
+                    selector_stats=self.selector_stats,
+                    page_max_uses=self.page_max_uses,
+                    rate_controller=self.detail_rate,
+                    cookie_cache=self.cookie_cache
+                )
+                self.detail_pool.start()
+                print(f"已启动异步详情页池，并发数 {self.detail_concurrency}")
+            
         except Exception as e:
             print(f"启动浏览器失败: {e}")
             # 确保清理资源
@@ -74,11 +224,35 @@ class CCDIPlaywrightSpider:
                 self.playwright.stop()
             raise
 
+    def sync_challenge_cookie(self):
+        """将共享缓存中的C3VK Cookie同步到浏览器上下文"""
+        cookie = self.cookie_cache.get()
+        if cookie and cookie['solved_at'] != self.applied_cookie_version:
+            apply_cookie_to_playwright_context(cookie, self.context, self.cookie_domain)
+            self.applied_cookie_version = cookie['solved_at']
+
     def crawl_multiple_pages(self, max_pages=5, with_details=True):
         """爬取多个页面的内容"""
         current_page = 1
         
+        if self.checkpoint and self.checkpoint.resumed:
+            # 从断点恢复时沿用上次的参数，并先补完上次中断的页面
+            max_pages = self.checkpoint.state['max_pages']
+            with_details = self.checkpoint.state['with_details']
+            current_page = self.resume_from_checkpoint()
+        elif self.checkpoint:
+            self.checkpoint.start(self.params, max_pages, with_details)
+        
         while current_page <= max_pages:
+            # 先重试已经到期的详情页，未到期的不等待
+            self.retry_due_details()
+            
+            # 按速率控制器的节奏请求列表页，避免请求过快
+            with self.metrics.stage('page_delay'):
+                delay = self.list_rate.wait()
+            if delay > 0:
+                print(f"已延时 {delay:.2f} 秒")
+            
             print(f"\n====== 开始爬取第 {current_page} 页 ======\n")
             url = self.build_url(current_page)
             
@@ -86,23 +260,109 @@ class CCDIPlaywrightSpider:
             page_items = self.crawl_page(url, with_details)
             
             if not page_items:
-                print(f"第 {current_page} 页没有找到数据，爬取结束")
+                if self.last_page_failed:
+                    print(f"第 {current_page} 页爬取出错，爬取中止")
+                    break
+                if self.last_page_all_known:
+                    print(f"第 {current_page} 页的文章均已爬取过，增量爬取结束")
+                else:
+                    print(f"第 {current_page} 页没有找到数据，爬取结束")
                 break
                 
             self.pages_crawled += 1
+            self.metrics.inc('pages_total')
+            if self.checkpoint:
+                self.checkpoint.complete_page(current_page)
+            self.write_metrics_textfile()
+            self.selector_stats.save()
             current_page += 1
-            
-            # 随机延迟，避免请求过快
-            if current_page <= max_pages:
-                delay = random.uniform(2, 5)
-                print(f"延时 {delay:.2f} 秒后继续爬取下一页...")
-                time.sleep(delay)
+        
+        # 所有列表页完成后，等待并处理剩余的重试（中止时留在断点中，续爬时再处理）
+        if not self.last_page_failed:
+            self.drain_retries()
         
         print(f"\n爬取完成！共爬取了 {self.pages_crawled} 页，获取 {len(self.results)} 条数据")
+        
+        if self.checkpoint:
+            if self.last_page_failed:
+                print(f"进度已保存到 {self.checkpoint.path}，可使用 --resume 从中断处继续")
+            else:
+                self.checkpoint.clear()
+        
+        if self.load_stats:
+            self.load_stats.print_summary()
+        
+        if self.detail_cache:
+            self.detail_cache.print_summary()
+        
+        if self.tiered_fetcher:
+            self.tiered_fetcher.print_summary()
+        
+        if self.retry_queue.dead_letters:
+            print(f"共有 {self.retry_queue.dead_letters} 篇文章多次重试仍未获取详情"
+                  f"{f'，已写入 {self.retry_queue.dead_letter_path}' if self.retry_queue.dead_letter_path else ''}")
+        
+        self.list_rate.print_summary()
+        self.detail_rate.print_summary()
+        self.selector_stats.print_summary()
+        self.selector_stats.save()
+        
+        self.metrics.print_summary()
+        self.write_metrics_textfile()
+        if self.metrics_summary_path:
+            self.metrics.write_summary(self.metrics_summary_path)
+            print(f"指标汇总已保存至 {self.metrics_summary_path}")
+
+    def write_metrics_textfile(self):
+        """更新Prometheus textfile（未设置路径时跳过）"""
+        if not self.metrics_textfile:
+            return
+        try:
+            self.metrics.write_textfile(self.metrics_textfile)
+        except OSError as e:
+            print(f"写入指标文件失败: {e}")
+
+    def resume_from_checkpoint(self):
+        """按断点恢复查询参数和结果索引，补完上次中断页面的详情，返回下一个要爬取的页码"""
+        state = self.checkpoint.state
+        self.params.update(state['params'])
+        self.results = [None] * state['results_count']  # 之前的记录已在JSONL文件中
+        self.pages_crawled = len(state['completed_pages'])
+        print(f"从断点 {self.checkpoint.path} 恢复，已完成 {self.pages_crawled} 页")
+        
+        # 恢复等待重试的详情页（仍在中断页面待完成列表中的会随该页重新爬取）
+        page = state['page']
+        pending_indices = {entry['index'] for entry in page['pending']} if page else set()
+        retries = [entry for entry in state.get('retries', []) if entry['index'] not in pending_indices]
+        for entry in retries:
+            self.results[entry['index']] = entry['record']
+        self.retry_queue.restore(retries)
+        if retries:
+            print(f"恢复 {len(retries)} 篇等待重试的文章")
+        
+        if page:
+            print(f"\n====== 继续第 {page['page_num']} 页剩余的 {len(page['pending'])} 篇文章 ======\n")
+            article_links = []
+            for entry in page['pending']:
+                self.results[entry['index']] = entry['record']
+                article_links.append((entry['index'], entry['link']))
+            
+            self.crawl_page_details(page['page_num'], article_links, state['with_details'])
+            self.pages_crawled += 1
+            self.metrics.inc('pages_total')
+            self.checkpoint.complete_page(page['page_num'])
+        
+        return self.checkpoint.next_page()
 
     def get_total_pages(self):
         """获取总页数"""
         try:
+            # 优先从分页区域的隐藏总页数和尾页链接中解析
+            total_pages = parse_total_pages(self.page.content())
+            if total_pages:
+                print(f"找到总页数: {total_pages}")
+                return total_pages
+            
             # 尝试查找页码信息
             pagination_info = self.page.query_selector('.page')
             if pagination_info:
@@ -141,151 +401,468 @@ class CCDIPlaywrightSpider:
 
     def crawl_page(self, url, with_details=True):
         """爬取指定URL的页面内容"""
+        self.last_page_failed = False
         try:
-            print(f"正在访问页面: {url}")
-            self.page.goto(url, wait_until="networkidle")
-            
-            # 如果是第一页，保存页面源码以便调试
             page_num = self.get_current_page_number(url)
-            if page_num == 1:
-                with open('playwright_page_source.html', 'w', encoding='utf-8') as f:
-                    f.write(self.page.content())
-                print("已保存第1页源码到playwright_page_source.html")
             
-            # 等待列表项加载完成
-            try:
-                self.page.wait_for_selector('ul.s_0603_list', timeout=10000)
-            except PlaywrightTimeoutError:
-                print("未找到标准列表选择器，尝试其他方式...")
-            
-            # 查找所有列表项
-            list_items = self.page.query_selector_all('ul.s_0603_list li')
-            print(f"找到{len(list_items)}个列表项")
-            
-            if not list_items:
-                # 如果没有找到列表项，尝试查找页面结构
-                print("未找到列表项，正在分析页面结构...")
-                all_uls = self.page.query_selector_all('ul')
-                print(f"页面上共有 {len(all_uls)} 个ul元素")
-                for i, ul in enumerate(all_uls[:5]):  # 只显示前5个，避免输出过多
-                    class_attr = ul.get_attribute('class') or '无class'
-                    print(f"第{i+1}个ul的class: {class_attr}")
-                    
-                # 尝试其他可能的选择器
-                alternative_items = self.page.query_selector_all('.s_0603_list li, .center_box0 li, .other_center_22 li')
-                print(f"使用备选选择器找到{len(alternative_items)}个列表项")
-                list_items = alternative_items if alternative_items else list_items
+            # 优先通过HTTP后端抓取列表页，失败时才使用浏览器
+            page_items = self.crawl_list_via_http(url, page_num)
+            if page_items is None:
+                with self.metrics.stage('list_browser'):
+                    page_items = self.crawl_list_via_browser(url, page_num)
+            
+            # 增量模式下跳过已经爬取过的文章
+            page_items = self.filter_known_articles(page_items)
             
             # 处理每个列表项
             article_links = []  # 存储文章链接，用于后续爬取详情
-            page_items = []  # 存储当前页的数据
-            
-            for item in list_items:
-                try:
-                    # 使用不同的选择器组合尝试提取标题和链接
-                    title_element = None
-                    selectors = [
-                        'em.emtitle b.title a', 
-                        'b.title a', 
-                        'a', 
-                        'em a', 
-                        '.title a'
-                    ]
-                    
-                    for selector in selectors:
-                        title_element = item.query_selector(selector)
-                        if title_element:
-                            break
-                    
-                    if not title_element:
-                        print(f"无法找到标题元素，跳过: {item.inner_html()[:100]}...")
-                        continue
-                    
-                    title = title_element.inner_text()
-                    link = title_element.get_attribute('href')
-                    
-                    # 处理相对URL
-                    if link and not link.startswith(('http://', 'https://')):
-                        base_url_parts = urlparse(self.base_url)
-                        base_url = f"{base_url_parts.scheme}://{base_url_parts.netloc}"
-                        link = urljoin(base_url, link)
-                    
-                    # 提取日期
-                    date = "无日期"
-                    date_element = item.query_selector('span.time')
-                    if date_element:
-                        date = date_element.inner_text().strip()
-                    else:
-                        # 尝试其他日期选择器
-                        date_element = item.query_selector('.time, .date')
-                        if date_element:
-                            date = date_element.inner_text().strip()
-                    
-                    # 提取摘要
-                    summary = "无摘要"
-                    summary_element = item.query_selector('em.emabstr i.abstract')
-                    if summary_element:
-                        summary = summary_element.inner_text().strip()
-                        if not summary:
-                            summary = "无摘要"
-                    else:
-                        # 尝试其他摘要选择器
-                        summary_element = item.query_selector('.abstract, .summary, .description')
-                        if summary_element:
-                            summary = summary_element.inner_text().strip()
-                    
-                    # 添加到结果
-                    article_data = {
-                        '标题': title,
-                        '链接': link,
-                        '日期': date,
-                        '摘要': summary,
-                        '正文': "",
-                        '发布来源': "",
-                        '发布时间': "",
-                        '爬取页码': page_num
-                    }
-                    
-                    self.results.append(article_data)
-                    page_items.append(article_data)
-                    article_links.append((len(self.results) - 1, link))  # 保存索引和链接，用于更新结果
-                    print(f"成功解析: {title}")
-                
-                except Exception as e:
-                    print(f"解析列表项时出错: {e}")
+            
+            for article_data in page_items:
+                self.results.append(article_data)
+                article_links.append((len(self.results) - 1, article_data['链接']))  # 保存索引和链接，用于更新结果
+                print(f"成功解析: {article_data['标题']}")
             
             print(f"第{page_num}页共解析 {len(page_items)} 条数据")
             
-            # 爬取详情页
-            if with_details and article_links:
-                print(f"\n正在爬取第{page_num}页的文章详情...")
-                for idx, link in article_links:
-                    try:
-                        detail_data = self.crawl_article_detail(link)
-                        if detail_data:
-                            # 更新结果中的详情数据
-                            self.results[idx].update(detail_data)
-                            print(f"已获取详情: {self.results[idx]['标题']}")
-                        else:
-                            print(f"未能获取详情: {self.results[idx]['标题']}")
-                        
-                        # 每个详情页之间添加小延迟，避免请求过快
-                        time.sleep(random.uniform(0.5, 1.5))
-                    except Exception as e:
-                        print(f"获取详情页时出错: {e}")
-                
-                print(f"第{page_num}页所有详情页爬取完成！")
+            if self.checkpoint:
+                self.checkpoint.begin_page(page_num, self.params, self.results, article_links)
             
+            self.crawl_page_details(page_num, article_links, with_details)
             return page_items
                 
-        except PlaywrightTimeoutError:
+        except PlaywrightTimeoutError as e:
             print("页面加载超时，请检查网络连接或网站是否可访问")
+            self.metrics.record_failure('crawl_page', e)
+            self.list_rate.record_error(e)
+            self.last_page_failed = True
             return []
         except Exception as e:
             print(f"爬取页面时出错: {e}")
             import traceback
             print(traceback.format_exc())
+            self.metrics.record_failure('crawl_page', e)
+            self.list_rate.record_error(e)
+            self.last_page_failed = True
+            return []
+
+    def crawl_page_details(self, page_num, article_links, with_details=True):
+        """爬取一页中各文章的详情，每条记录完成后立即写出"""
+        if with_details:
+            article_links = self.skip_duplicate_details(article_links)
+        
+        # 爬取详情页
+        if with_details and article_links and self.detail_pool:
+            print(f"\n正在并发爬取第{page_num}页的文章详情...")
+            self.crawl_details_concurrently(article_links)
+            print(f"第{page_num}页所有详情页爬取完成！")
+        elif with_details and article_links:
+            print(f"\n正在爬取第{page_num}页的文章详情...")
+            for idx, link in article_links:
+                self.crawl_one_detail(idx, link)
+            
+            print(f"第{page_num}页所有详情页爬取完成！")
+        
+        elif article_links:
+            # 不爬取详情时，解析出列表项即为完整记录
+            for idx, link in article_links:
+                self.mark_article_seen(link)
+                self.flush_record(idx)
+
+    def crawl_details_concurrently(self, article_links):
+        """通过异步详情页池并发爬取详情，并按索引合并回结果"""
+        # 缓存中已有的详情不再交给浏览器
+        detail_results = []
+        remaining_links = []
+        for idx, link in article_links:
+            detail_data = self.cached_detail(link)
+            if detail_data is None:
+                remaining_links.append((idx, link))
+            else:
+                detail_results.append((idx, detail_data))
+        cached_count = len(detail_results)
+        
+        # 先并发通过HTTP层抓取，只有需要升级的链接才交给浏览器
+        if remaining_links and self.tiered_fetcher:
+            with ThreadPoolExecutor(max_workers=self.detail_concurrency) as executor:
+                http_details = list(executor.map(self.fetch_http_detail, [link for _, link in remaining_links]))
+            escalated_links = []
+            for (idx, link), detail_data in zip(remaining_links, http_details):
+                if detail_data is None:
+                    escalated_links.append((idx, link))
+                else:
+                    detail_results.append((idx, detail_data))
+            print(f"[分层抓取] HTTP获取 {len(remaining_links) - len(escalated_links)} 个详情页，"
+                  f"{len(escalated_links)} 个交给浏览器")
+            remaining_links = escalated_links
+        
+        if remaining_links:
+            with self.metrics.stage('detail_batch'):
+                browser_results = self.detail_pool.crawl_details(
+                    remaining_links,
+                    cookie=self.cookie_cache.get(),
+                    cookie_domain=self.cookie_domain
+                )
+            detail_results += [(idx, self.mark_browser_tier(detail_data)) for idx, detail_data in browser_results]
+        
+        self.last_detail_error = None
+        for position, (idx, detail_data) in enumerate(detail_results):
+            self.settle_detail(idx, detail_data, position < cached_count)
+
+    def skip_duplicate_details(self, article_links):
+        """摘要与已知文章近似重复的文章不爬取详情页，直接写出列表页记录，返回其余的文章"""
+        if not self.skip_duplicate_summaries:
+            return article_links
+        
+        remaining = []
+        for idx, link in article_links:
+            record = self.results[idx]
+            cluster = self.near_duplicates.match_summary(record.get('摘要'))
+            if cluster is None:
+                remaining.append((idx, link))
+                continue
+            print(f"摘要与已爬取的文章 {cluster} 近似重复，跳过详情页: {record['标题']}")
+            self.metrics.inc('details_total', result='duplicate')
+            self.mark_article_seen(link)
+            self.flush_record(idx)
+        return remaining
+
+    def crawl_one_detail(self, idx, link):
+        """逐个爬取模式下获取一篇文章的详情并写出记录"""
+        self.last_detail_error = None
+        detail_data = None
+        from_cache = False
+        try:
+            detail_data = self.cached_detail(link)
+            from_cache = detail_data is not None
+            if not from_cache:
+                # 按速率控制器的节奏请求详情页（使用缓存时不需要）
+                with self.metrics.stage('detail_delay'):
+                    self.detail_rate.wait()
+                with self.metrics.stage('detail_total'):
+                    detail_data = self.fetch_article_detail(link)
+        except Exception as e:
+            print(f"获取详情页时出错: {e}")
+            self.metrics.record_failure('crawl_page_details', e)
+            self.last_detail_error = f"{type(e).__name__}: {e}"
+        
+        self.settle_detail(idx, detail_data, from_cache)
+
+    def settle_detail(self, idx, detail_data, from_cache=False):
+        """合并详情并写出记录；抓取失败时交给重试队列，记录暂不写出"""
+        record = self.results[idx]
+        if detail_data is None and not from_cache:
+            delay = self.retry_queue.schedule(idx, record['链接'], record, self.last_detail_error or '未能获取详情')
+            if delay is not None:
+                print(f"未能获取详情，{delay:.0f} 秒后重试: {record['标题']}")
+                self.metrics.inc('details_total', result='retry')
+                if self.checkpoint:
+                    self.checkpoint.save_retries(self.retry_queue.pending())
+                return
+        
+        if detail_data:
+            # 更新结果中的详情数据
+            record.update(detail_data)
+            self.mark_article_seen(record['链接'])
+            print(f"已获取详情: {record['标题']}")
+        else:
+            print(f"未能获取详情: {record['标题']}")
+        self.count_detail_result(detail_data, from_cache)
+        
+        self.retry_queue.done(idx)
+        self.flush_record(idx)
+
+    def retry_due_details(self):
+        """重试已经到期的详情页，返回重试的篇数"""
+        article_links = self.retry_queue.pop_due()
+        if not article_links:
+            return 0
+        
+        print(f"\n正在重试 {len(article_links)} 篇未能获取详情的文章...")
+        if self.detail_pool:
+            try:
+                self.crawl_details_concurrently(article_links)
+            except Exception as e:
+                print(f"并发重试详情页时出错: {e}")
+                self.metrics.record_failure('retry_details', e)
+                self.last_detail_error = f"{type(e).__name__}: {e}"
+                for idx, _ in article_links:
+                    self.settle_detail(idx, None)
+        else:
+            for idx, link in article_links:
+                self.crawl_one_detail(idx, link)
+        return len(article_links)
+
+    def drain_retries(self):
+        """等待并处理重试队列中剩余的全部详情页"""
+        while len(self.retry_queue):
+            wait = self.retry_queue.wait_time()
+            if wait is None:
+                break
+            if wait > 0:
+                print(f"等待 {wait:.0f} 秒后重试剩余的 {len(self.retry_queue)} 篇文章...")
+                time.sleep(wait)
+            self.retry_due_details()
+
+    def replay_dead_letters(self, path):
+        """
+        重新爬取死信文件中的文章，返回补全了正文的记录（再次失败的写回死信文件）
+
+        待重放的条目保留在 <path>.replaying 中，调用方把返回的记录合并进结果文件后调用
+        finish_dead_letters删除它；中途崩溃时下次重放会重新读取这些条目。
+        """
+        entries = take_dead_letters(path)
+        if not entries:
+            print(f"死信文件 {path} 不存在或为空")
             return []
+        
+        print(f"重新爬取死信文件中的 {len(entries)} 篇文章")
+        self.retry_queue.dead_letter_path = path
+        restored = []
+        for entry in entries:
+            self.results.append(entry['record'])
+            restored.append({
+                'index': len(self.results) - 1, 'link': entry['link'], 'record': entry['record'],
+                'attempts': 0, 'error': entry.get('error')
+            })
+        self.retry_queue.restore(restored)
+        self.drain_retries()
+        
+        return [record for record in self.results if record and record.get('正文')]
+
+    def cached_detail(self, link):
+        """从详情页缓存中取详情，需要用浏览器重新爬取时返回None"""
+        if not self.detail_cache:
+            return None
+        
+        with self.metrics.stage('detail_cache'):
+            detail_data = self.detail_cache.lookup(link)
+        if detail_data is not None:
+            print(f"使用已归档的详情页: {link}")
+            detail_data[TIER_FIELD] = CACHE_TIER
+            self.metrics.inc('detail_tier_total', tier=CACHE_TIER)
+        return detail_data
+
+    def fetch_http_detail(self, url):
+        """按速率控制器的节奏通过HTTP层抓取详情（在线程池中调用）"""
+        with self.metrics.stage('detail_delay'):
+            self.detail_rate.wait()
+        return self.tiered_fetcher.fetch(url)
+
+    def fetch_article_detail(self, url):
+        """先通过HTTP层抓取详情，需要时才升级到浏览器"""
+        if self.tiered_fetcher:
+            detail_data = self.tiered_fetcher.fetch(url)
+            if detail_data is not None:
+                print(f"已通过HTTP获取详情页: {url}")
+                return detail_data
+        
+        return self.mark_browser_tier(self.crawl_article_detail(url))
+
+    def mark_browser_tier(self, detail_data):
+        """为浏览器得到的详情标记获取方式"""
+        if detail_data is not None:
+            detail_data[TIER_FIELD] = BROWSER_TIER
+            self.metrics.inc('detail_tier_total', tier=BROWSER_TIER)
+        return detail_data
+
+    def count_detail_result(self, detail_data, from_cache=False):
+        """按结果（cached/ok/empty/failed）计数一个详情页"""
+        if from_cache:
+            result = 'cached'
+        elif detail_data is None:
+            result = 'failed'
+        elif detail_data.get('正文'):
+            result = 'ok'
+        else:
+            result = 'empty'
+        self.metrics.inc('details_total', result=result)
+
+    def filter_known_articles(self, page_items):
+        """增量模式下去掉已经爬取过的文章，并记录本页是否全部已知"""
+        self.last_page_all_known = False
+        if not self.seen_index or not page_items:
+            return page_items
+        
+        known_urls = self.seen_index.known_urls(item['链接'] for item in page_items)
+        new_items = [item for item in page_items if item['链接'] not in known_urls]
+        
+        if known_urls:
+            print(f"跳过 {len(page_items) - len(new_items)} 篇已爬取过的文章")
+        self.last_page_all_known = not new_items
+        return new_items
+
+    def flush_record(self, idx):
+        """流式模式下把已完成的记录写入JSONL，并释放内存中的副本"""
+        self.metrics.inc('records_total')
+        record = self.results[idx]
+        duplicate = self.near_duplicates is not None and self.near_duplicates.mark(record)
+        if duplicate:
+            self.metrics.inc('near_duplicates_total')
+        if self.search_index and not duplicate:
+            self.search_index.add(record)
+        if not self.sink:
+            return
+        
+        self.sink.write(self.results[idx])
+        self.results[idx] = None
+        
+        if self.checkpoint:
+            # 先确保记录落盘，再从断点中移除，保证续爬时不丢记录
+            self.sink.sync()
+            self.checkpoint.finish_detail(idx)
+
+    def mark_article_seen(self, link):
+        """将文章记入已爬取索引"""
+        if self.seen_index:
+            self.seen_index.add(link)
+
+    def crawl_list_via_http(self, url, page_num):
+        """通过HTTP后端抓取列表页，失败时返回None"""
+        if not self.http_backend:
+            return None
+        
+        try:
+            print(f"正在通过HTTP访问页面: {url}")
+            start = time.perf_counter()
+            with self.metrics.stage('list_http'):
+                page_items, page_source = self.http_backend.fetch_list_page(url, page_num, self.base_url)
+            self.list_rate.record_success(time.perf_counter() - start)
+        except Exception as e:
+            print(f"HTTP后端抓取失败，回退到浏览器: {e}")
+            self.metrics.record_failure('list_http', e)
+            self.list_rate.record_error(e)
+            return None
+        
+        if page_items is None:
+            print("HTTP响应中未找到结果列表，回退到浏览器")
+            return None
+        
+        # 如果是第一页，保存页面源码以便调试
+        if page_num == 1:
+            with open('playwright_page_source.html', 'w', encoding='utf-8') as f:
+                f.write(page_source)
+            print("已保存第1页源码到playwright_page_source.html")
+        
+        return page_items
+
+    def crawl_list_via_browser(self, url, page_num):
+        """通过浏览器抓取列表页"""
+        print(f"正在访问页面: {url}")
+        self.sync_challenge_cookie()
+        with self.metrics.stage('list_goto'):
+            self.page.goto(url, wait_until=self.wait_until)
+        
+        # 如果是第一页，保存页面源码以便调试
+        if page_num == 1:
+            with self.metrics.stage('list_content'):
+                page_source = self.page.content()
+            with open('playwright_page_source.html', 'w', encoding='utf-8') as f:
+                f.write(page_source)
+            print("已保存第1页源码到playwright_page_source.html")
+        
+        # 等待列表项加载完成
+        try:
+            with self.metrics.stage('list_wait_for_selector'):
+                self.page.wait_for_selector(LIST_READY_SELECTOR, timeout=10000)
+        except PlaywrightTimeoutError as e:
+            print("未找到标准列表选择器，尝试其他方式...")
+            self.metrics.record_failure('list_wait_for_selector', e)
+        
+        self.report_page_load(self.page, url)
+        
+        # 优先在页面内一次性提取所有列表项
+        if self.extraction_mode != 'element':
+            with self.metrics.stage('list_extract'):
+                page_items = self.extract_list_with_script(page_num)
+            if page_items:
+                return page_items
+        
+        # 查找所有列表项
+        list_items = self.page.query_selector_all('ul.s_0603_list li')
+        print(f"找到{len(list_items)}个列表项")
+        
+        if not list_items:
+            # 如果没有找到列表项，尝试查找页面结构
+            print("未找到列表项，正在分析页面结构...")
+            all_uls = self.page.query_selector_all('ul')
+            print(f"页面上共有 {len(all_uls)} 个ul元素")
+            for i, ul in enumerate(all_uls[:5]):  # 只显示前5个，避免输出过多
+                class_attr = ul.get_attribute('class') or '无class'
+                print(f"第{i+1}个ul的class: {class_attr}")
+                
+            # 尝试其他可能的选择器
+            alternative_items = self.page.query_selector_all('.s_0603_list li, .center_box0 li, .other_center_22 li')
+            print(f"使用备选选择器找到{len(alternative_items)}个列表项")
+            list_items = alternative_items if alternative_items else list_items
+        
+        page_items = []  # 存储当前页的数据
+        
+        for item in list_items:
+            try:
+                # 使用不同的选择器组合尝试提取标题和链接
+                title_element = None
+                selectors = self.selector_stats.order('title')
+                
+                title_index = None
+                for index, selector in enumerate(selectors):
+                    title_element = item.query_selector(selector)
+                    if title_element:
+                        title_index = index
+                        break
+                self.selector_stats.record_matches({'title': selectors}, {'title': title_index})
+                
+                if not title_element:
+                    print(f"无法找到标题元素，跳过: {item.inner_html()[:100]}...")
+                    continue
+                
+                title = title_element.inner_text()
+                link = title_element.get_attribute('href')
+                
+                # 处理相对URL
+                if link and not link.startswith(('http://', 'https://')):
+                    base_url_parts = urlparse(self.base_url)
+                    base_url = f"{base_url_parts.scheme}://{base_url_parts.netloc}"
+                    link = urljoin(base_url, link)
+                
+                # 提取日期
+                date = "无日期"
+                date_element = item.query_selector('span.time')
+                if date_element:
+                    date = date_element.inner_text().strip()
+                else:
+                    # 尝试其他日期选择器
+                    date_element = item.query_selector('.time, .date')
+                    if date_element:
+                        date = date_element.inner_text().strip()
+                
+                # 提取摘要
+                summary = "无摘要"
+                summary_element = item.query_selector('em.emabstr i.abstract')
+                if summary_element:
+                    summary = summary_element.inner_text().strip()
+                    if not summary:
+                        summary = "无摘要"
+                else:
+                    # 尝试其他摘要选择器
+                    summary_element = item.query_selector('.abstract, .summary, .description')
+                    if summary_element:
+                        summary = summary_element.inner_text().strip()
+                
+                page_items.append({
+                    '标题': title,
+                    '链接': link,
+                    '日期': date,
+                    '摘要': summary,
+                    '正文': "",
+                    '发布来源': "",
+                    '发布时间': "",
+                    '爬取页码': page_num
+                })
+            
+            except Exception as e:
+                print(f"解析列表项时出错: {e}")
+        
+        return page_items
 
     def get_current_page_number(self, url):
         """从URL中提取当前页码"""
@@ -327,126 +904,244 @@ class CCDIPlaywrightSpider:
 
     def crawl_article_detail(self, url):
         """爬取文章详情页内容"""
+        page = None
+        body = None  # 原始字节模式下文档响应的内容
+        healthy = False
+        start = time.perf_counter()
         try:
             print(f"正在访问文章详情页: {url}")
-            page = self.context.new_page()
-            page.goto(url, wait_until="networkidle")
+            self.sync_challenge_cookie()
+            with self.metrics.stage('detail_goto'):
+                page = self.page_pool.checkout()
+                response = page.goto(url, wait_until=self.wait_until)
+            if response and response.status >= 500:
+                self.detail_rate.record_failure(SERVER_ERROR)
             
-            # 处理可能出现的验证码
-            if not self.handle_slider_captcha(page):
-                print("验证码处理失败，可能影响详情页数据获取")
+            # 处理可能出现的C3VK验证页（求解后重新打开时换成新的文档响应）
+            with self.metrics.stage('detail_challenge'):
+                solved, response = self.handle_challenge_page(page, url, response)
+                if not solved:
+                    print("验证页处理失败，可能影响详情页数据获取")
             
-            # 等待页面加载完成
-            page.wait_for_load_state('domcontentloaded')
+            # 原始字节模式：直接保存并解析服务器返回的文档，不等待页面渲染、不序列化DOM
+            if self.extraction_mode == 'raw':
+                with self.metrics.stage('detail_body'):
+                    body = self.document_body(response)
+                if body is not None:
+                    with self.metrics.stage('archive_write'):
+                        self.archive.put(url, body)
+                    with self.metrics.stage('detail_extract'):
+                        result = self.extract_detail_from_body(body, url)
+                    if result is not None:
+                        healthy = True
+                        self.detail_rate.record_success(time.perf_counter() - start)
+                        return result
             
-            # 提取页面ID，用于保存HTML
-            page_id = re.search(r'[^/]+\.html$', url)
-            page_filename = page_id.group() if page_id else f"article_{int(time.time())}.html"
+            # 等待页面加载完成
+            with self.metrics.stage('detail_wait_for_selector'):
+                page.wait_for_load_state('domcontentloaded')
+                
+                # 生产模式下以正文容器出现作为就绪条件
+                if self.load_stats:
+                    try:
+                        page.wait_for_selector(DETAIL_READY_SELECTOR, timeout=10000)
+                    except PlaywrightTimeoutError as e:
+                        print("未找到正文容器，继续尝试提取...")
+                        self.metrics.record_failure('detail_wait_for_selector', e)
+            self.report_page_load(page, url)
             
-            # 保存详情页HTML以供调试
-            detail_page_path = os.path.join(self.detail_folder, page_filename)
-            with open(detail_page_path, 'w', encoding='utf-8') as f:
-                f.write(page.content())
+            # 保存详情页HTML到归档，供调试和离线重新解析（原始字节模式下已经保存）
+            if self.extraction_mode != 'raw' or body is None:
+                with self.metrics.stage('detail_content'):
+                    page_source = page.content()
+                with self.metrics.stage('archive_write'):
+                    self.archive.put(url, page_source)
             
             # 尝试不同的选择器提取内容
-            result = {}
-            
-            # 1. 尝试提取正文
-            content_selectors = [
-                '.TRS_Editor',  # 常见的正文容器
-                '.article-content', 
-                '.content',
-                '#content',
-                '.detail-content',
-                '.w1100'  # 中央纪委网站常用的内容容器
-            ]
-            
-            for selector in content_selectors:
-                content_element = page.query_selector(selector)
-                if content_element:
-                    # 清理正文中的多余空白
-                    content = content_element.inner_text().strip()
-                    content = re.sub(r'\s+', ' ', content)
-                    result['正文'] = content
-                    break
-            
-            # 2. 尝试提取发布来源
-            source_selectors = [
-                '.source', 
-                '.article-source',
-                '.info-source',
-                '.ly',  # 中央纪委网站常用的来源标识
-                '.source-time'
-            ]
-            
-            for selector in source_selectors:
-                source_element = page.query_selector(selector)
-                if source_element:
-                    source_text = source_element.inner_text().strip()
-                    # 尝试从文本中提取来源信息
-                    source_match = re.search(r'来源[:：]?\s*([^\s]+)', source_text)
-                    if source_match:
-                        result['发布来源'] = source_match.group(1)
-                    else:
-                        result['发布来源'] = source_text
-                    break
-            
-            # 3. 尝试提取发布时间
-            time_selectors = [
-                '.time',
-                '.article-time',
-                '.info-time',
-                '.date',
-                '.sj'  # 中央纪委网站常用的时间标识
-            ]
-            
-            for selector in time_selectors:
-                time_element = page.query_selector(selector)
-                if time_element:
-                    time_text = time_element.inner_text().strip()
-                    # 尝试从文本中提取时间信息
-                    time_match = re.search(r'(\d{4}[-年/]\d{1,2}[-月/]\d{1,2}日?\s*\d{1,2}:\d{1,2}(:\d{1,2})?)', time_text)
-                    if time_match:
-                        result['发布时间'] = time_match.group(1)
-                    else:
-                        time_match = re.search(r'(\d{4}[-年/]\d{1,2}[-月/]\d{1,2})', time_text)
-                        if time_match:
-                            result['发布时间'] = time_match.group(1)
-                        else:
-                            result['发布时间'] = time_text
-                    break
-            
-            # 关闭详情页面
-            page.close()
+            with self.metrics.stage('detail_extract'):
+                result = None
+                if self.extraction_mode != 'element':
+                    result = self.extract_detail_with_script(page, url)
+                if result is None:
+                    result = self.extract_detail_with_elements(page, url)
             
+            healthy = True
+            if result:
+                self.detail_rate.record_success(time.perf_counter() - start)
             return result
             
         except Exception as e:
             print(f"爬取文章详情时出错: {e}")
             import traceback
             print(traceback.format_exc())
-            
-            # 确保页面被关闭，即使出错
-            if 'page' in locals() and page:
-                try:
-                    page.close()
-                except:
-                    pass
-                
+            self.metrics.record_failure('crawl_article_detail', e)
+            self.detail_rate.record_error(e)
+            self.last_detail_error = f"{type(e).__name__}: {e}"
             return None
+        
+        finally:
+            # 放回页面池：重置后复用，出错的页面关闭并换新
+            if page:
+                self.page_pool.checkin(page, healthy)
+    
+    def handle_challenge_page(self, page, url, response=None):
+        """
+        详情页返回C3VK验证页时，在进程内求解Cookie并重新打开页面
+        
+        返回 (是否可以继续提取, 当前页面的文档响应)；先按文档长度粗筛，正常页面不需要序列化整个DOM。
+        验证脚本自行跳转后无法得到新的响应，此时响应为None。
+        """
+        try:
+            if page.evaluate("() => document.documentElement.outerHTML.length") > CHALLENGE_PAGE_MAX_LENGTH:
+                return True, response
+            page_source = page.content()
+        except Exception:
+            # 验证脚本已经触发跳转，等待跳转后的页面加载
+            page.wait_for_load_state(self.wait_until)
+            return True, None
+        
+        if not is_challenge_page(page_source):
+            return True, response
+        
+        # 带着仍有效的Cookie还被验证，说明请求过快，需要降速（Cookie过期后的验证不算）
+        if self.cookie_cache.get() is not None:
+            self.detail_rate.record_failure(CHALLENGE)
+        
+        solution = solve_challenge(page_source)
+        if not solution:
+            return False, response
+        
+        print("遇到C3VK验证页，已求解Cookie，重新打开详情页")
+        self.cookie_cache.store(solution)
+        self.sync_challenge_cookie()
+        return True, page.goto(url, wait_until=self.wait_until)
+
+    def document_body(self, response):
+        """
+        取回文档响应的原始字节（服务器返回的内容，不经过DOM），无法获取时返回None
+        
+        response.body()一次性把整个响应体读入内存，Playwright没有流式读取文档响应的接口
+        （详情页通常只有几十KB）。
+        """
+        if response is None or response.status != 200:
+            return None
+        try:
+            return response.body()
+        except Exception as e:
+            print(f"无法获取文档响应的原始内容，改为序列化页面: {e}")
+            self.metrics.record_failure('detail_body', e)
+            return None
+
+    def extract_detail_from_body(self, body, url):
+        """用与HTTP层相同的选择器顺序（lxml）从文档原始字节中提取详情，没有正文时返回None"""
+        orders = self.selector_stats.detail_orders(url)
+        matched = {}
+        detail = parse_article_detail(body, orders, matched)
+        if not detail.get('正文'):
+            # 正文可能由脚本渲染，交给页内提取（命中统计由它记录）
+            return None
+        self.selector_stats.record_matches(orders, matched, url)
+        detail.pop('标题', None)  # 标题沿用列表页的
+        return detail
+
+    def report_page_load(self, page, url):
+        """生产模式下统计并打印页面实际加载和被拦截的请求"""
+        if not self.load_stats:
+            return
+        
+        try:
+            transfer = page.evaluate(PAGE_TRANSFER_JS)
+        except Exception:
+            transfer = None
+        self.load_stats.record_page(url, transfer)
+
+    def extract_list_with_script(self, page_num):
+        """在页面内执行一次脚本提取所有列表项，失败时返回None"""
+        try:
+            title_selectors = self.selector_stats.order('title')
+            rows = self.page.evaluate(LIST_EXTRACT_JS, dict(LIST_SCRIPT_ARGS, titleSelectors=title_selectors))
+        except Exception as e:
+            print(f"页内脚本提取列表失败，改用逐元素提取: {e}")
+            return None
+        
+        print(f"找到{len(rows)}个列表项")
+        for row in rows:
+            self.selector_stats.record_matches({'title': title_selectors}, {'title': row.get('titleIndex')})
+        return rows_to_articles(rows, page_num, self.base_url)
+
+    def extract_detail_with_script(self, page, url):
+        """在详情页内执行一次脚本提取正文、来源和时间，失败时返回None"""
+        orders = self.selector_stats.detail_orders(url)
+        try:
+            payload = page.evaluate(DETAIL_EXTRACT_JS, orders)
+        except Exception as e:
+            print(f"页内脚本提取详情失败，改用逐元素提取: {e}")
+            self.metrics.record_failure('detail_extract_script', e)
+            return None
+        
+        self.selector_stats.record_matches(orders, payload.get('matched', {}), url)
+        return payload_to_detail(payload)
+
+    def extract_detail_with_elements(self, page, url):
+        """逐个选择器查询详情页元素，提取正文、来源和时间"""
+        orders = self.selector_stats.detail_orders(url)
+        result = {}
+        matched = {'content': None, 'source': None, 'time': None}  # 各字段命中的选择器序号
+        
+        # 1. 尝试提取正文
+        for index, selector in enumerate(orders['content']):
+            content_element = page.query_selector(selector)
+            if content_element:
+                result['正文'] = clean_content(content_element.inner_text())
+                matched['content'] = index
+                break
+        
+        # 2. 尝试提取发布来源
+        for index, selector in enumerate(orders['source']):
+            source_element = page.query_selector(selector)
+            if source_element:
+                result['发布来源'] = extract_source(source_element.inner_text().strip())
+                matched['source'] = index
+                break
+        
+        # 3. 尝试提取发布时间
+        for index, selector in enumerate(orders['time']):
+            time_element = page.query_selector(selector)
+            if time_element:
+                result['发布时间'] = extract_publish_time(time_element.inner_text().strip())
+                matched['time'] = index
+                break
+        
+        self.selector_stats.record_matches(orders, matched, url)
+        return result
     
     def save_to_csv(self, filename='ccdi_playwright_reports.csv'):
         """将结果保存为CSV文件"""
+        if self.sink:
+            # 流式模式下从JSONL文件生成，不在内存中构建整张表
+            self.sink.sync()
+            count = export_csv(self.sink.path, filename)
+            print(f"数据已保存至 {filename}，共{count}条记录")
+            return
+        
         if not self.results:
             print("没有数据可保存")
             return
         
+        import pandas as pd  # 只在这里用到，不在启动时导入
         df = pd.DataFrame(self.results)
         df.to_csv(filename, index=False, encoding='utf-8-sig')
         print(f"数据已保存至 {filename}，共{len(self.results)}条记录")
     
     def save_to_json(self, filename='ccdi_playwright_reports.json'):
         """将结果保存为JSON文件"""
+        if self.sink:
+            # 流式模式下从JSONL文件生成
+            self.sink.sync()
+            count = export_json(self.sink.path, filename)
+            print(f"数据已保存至 {filename}，共{count}条记录")
+            return
+        
         if not self.results:
             print("没有数据可保存")
             return
@@ -458,6 +1153,30 @@ class CCDIPlaywrightSpider:
     
     def close(self):
         """关闭浏览器和Playwright实例"""
+        if self.http_backend:
+            self.http_backend.close()
+        
+        if self.seen_index:
+            self.seen_index.close()
+        
+        if self.search_index:
+            # 写出尚在内存中累积的索引记录
+            self.search_index.close()
+        
+        if self.near_duplicates:
+            self.near_duplicates.close()
+        
+        if self.sink:
+            self.sink.close()
+        
+        self.archive.close()
+        
+        if self.detail_pool:
+            self.detail_pool.close()
+        
+        if self.page_pool:
+            self.page_pool.close()
+        
         if hasattr(self, 'browser'):
             self.browser.close()
             print("浏览器已关闭")
@@ -466,22 +1185,97 @@ class CCDIPlaywrightSpider:
             self.playwright.stop()
             print("Playwright实例已停止")
 
-def main():
-    # 设置要爬取的最大页数
-    max_pages = 3    # 可以根据需要调整
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='爬取中央纪委国家监委网站的公开通报')
+    parser.add_argument('--max-pages', type=int, default=3, help='最多爬取的搜索结果页数')
+    parser.add_argument('--profile', choices=['default', PRODUCTION_PROFILE], default='default',
+                        help="页面加载配置：'default' 便于调试，'production' 无头运行并拦截非文档资源")
+    parser.add_argument('--extraction-mode', choices=['script', 'element', 'raw'], default='script',
+                        help="详情页提取方式：'script' 页内脚本，'element' 逐元素查询，'raw' 保存并解析服务器返回的原始字节")
+    parser.add_argument('--detail-concurrency', type=int, default=1,
+                        help='同时在途的详情页数量上限，1表示逐个爬取，大于1时使用异步详情页池')
+    parser.add_argument('--resume', action='store_true', help='从上次中断的断点继续爬取')
+    parser.add_argument('--seen-index', default=None,
+                        help='已爬取文章索引（如 ccdi_seen_articles.db），设置后跳过已知文章，只爬取新文章')
+    parser.add_argument('--detail-cache', choices=CACHE_MODES, default=None,
+                        help="已归档的详情页：'trust' 直接使用副本，'revalidate' 先发条件请求验证")
+    parser.add_argument('--cache-ttl-days', type=float, default=None, help='归档副本的有效期（天），默认不过期/每次验证')
+    parser.add_argument('--checkpoint', default='ccdi_playwright_checkpoint.json', help='断点文件路径')
+    parser.add_argument('--metrics-textfile', default=None, help='Prometheus textfile路径（每页完成后更新）')
+    parser.add_argument('--metrics-port', type=int, default=None, help='在该端口提供Prometheus /metrics 端点')
+    parser.add_argument('--browser-details', action='store_true', help='详情页全部用浏览器爬取，不先尝试HTTP')
+    parser.add_argument('--metrics-json', default='ccdi_playwright_metrics.json', help='爬取结束时写出的指标汇总')
+    parser.add_argument('--max-rate', type=float, default=DETAIL_MAX_RATE, help='详情页请求速率的上限（请求/秒）')
+    parser.add_argument('--retry-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS, help='每篇文章详情页的最多尝试次数')
+    parser.add_argument('--dead-letters', default='ccdi_playwright_dead_letters.jsonl', help='多次重试仍失败的文章写入的文件')
+    parser.add_argument('--replay-dead-letters', action='store_true', help='只重新爬取死信文件中的文章，补全结果文件中的记录')
+    parser.add_argument('--search-index', default=None, help='写出记录时同时更新该全文索引文件（如 ccdi_search_index.db）')
+    parser.add_argument('--near-duplicates', default=None, help='检测正文近似重复的文章，签名和簇保存在该文件（如 ccdi_near_duplicates.db）')
+    parser.add_argument('--skip-duplicate-summaries', action='store_true', help='列表页摘要与已知文章近似重复时不爬取详情页（需要--near-duplicates）')
+    parser.add_argument('--parquet', default=None, help='结束时同时导出按发布年月分区的Parquet数据集到该目录（需要pyarrow）')
+    args = parser.parse_args(argv)
+    if args.skip_duplicate_summaries and not args.near_duplicates:
+        parser.error("--skip-duplicate-summaries 需要同时设置 --near-duplicates")
+    
+    if args.parquet:
+        # pyarrow只在导出Parquet时需要，在爬取开始前导入，缺少时尽早报错
+        from parquet_export import export_parquet
     
-    spider = CCDIPlaywrightSpider()
+    # 每条记录完成后立即追加写入的JSONL文件，CSV/JSON在结束时由它生成
+    sink_path = 'ccdi_playwright_reports.jsonl'
+    
+    # 重放死信时不写结果文件和断点，补全的记录在结束时合并进结果文件
+    replaying = args.replay_dead_letters
+    spider = CCDIPlaywrightSpider(
+        detail_concurrency=args.detail_concurrency,
+        seen_index_path=args.seen_index,
+        extraction_mode=args.extraction_mode,
+        sink_path=None if replaying else sink_path,
+        checkpoint_path=None if replaying else args.checkpoint,
+        resume=args.resume,
+        detail_cache_mode=args.detail_cache,
+        detail_cache_ttl=args.cache_ttl_days * 86400 if args.cache_ttl_days is not None else None,
+        metrics_textfile=args.metrics_textfile,
+        metrics_summary_path=args.metrics_json,
+        http_details=not args.browser_details,
+        max_detail_rate=args.max_rate,
+        retry_attempts=args.retry_attempts,
+        dead_letter_path=args.dead_letters,
+        search_index_path=args.search_index,
+        near_duplicates_path=args.near_duplicates,
+        skip_duplicate_summaries=args.skip_duplicate_summaries
+    )
+    if args.metrics_port is not None:
+        spider.metrics.serve(args.metrics_port)
     
     try:
         # 设置浏览器
-        spider.setup_browser()
+        spider.setup_browser(profile=args.profile)
+        
+        if replaying:
+            # 按链接替换结果文件中缺少正文的旧记录，再重新生成CSV/JSON
+            records = spider.replay_dead_letters(args.dead_letters)
+            if records:
+                merge_records(sink_path, records)
+            # 补全的记录已写入结果文件（再次失败的已写回死信文件），此后才删除待重放的条目
+            finish_dead_letters(args.dead_letters)
+            if records:
+                export_csv(sink_path, 'ccdi_playwright_reports.csv')
+                export_json(sink_path, 'ccdi_playwright_reports.json')
+                if args.parquet:
+                    export_parquet(sink_path, args.parquet)
+            print(f"重放完成！补全 {len(records)} 条记录")
+            return
         
         # 爬取多个页面
-        spider.crawl_multiple_pages(max_pages=max_pages, with_details=True)
+        spider.crawl_multiple_pages(max_pages=args.max_pages, with_details=True)
         
         # 保存数据
         spider.save_to_csv()
         spider.save_to_json()
+        if args.parquet:
+            count = export_parquet(sink_path, args.parquet)
+            print(f"数据已保存至 {args.parquet}，共{count}条记录")
         
         print("爬取完成！")
     
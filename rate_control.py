@@ -0,0 +1,130 @@
+"""
+自适应请求速率控制
+
+爬虫原先在列表页之间固定随机等待2~5秒、详情页之间等待0.5~1.5秒，不论网站响应快慢。
+AdaptiveRateController按加性增、乘性减（AIMD）调整请求速率和并发数：
+    - 请求成功且耗时低于latency_target时，速率加increase、并发窗口加 1/当前窗口；
+    - 超时、求解Cookie后仍返回验证页或5xx时，速率和并发窗口乘以decrease，
+      cooldown秒内的多次失败只回退一次（并发请求常常同时失败）；
+    - 速率不超过max_rate（硬上限），并发不超过max_concurrency。
+每个控制器只约束所在进程的请求：sharded_crawl启动N个工作进程时，对网站的总速率最高是
+max_rate的N倍，因此它把总速率上限除以工作进程数后再交给各进程的爬虫。
+速率控制的是相邻两个请求开始之间的间隔（带少量随机抖动），请求本身耗时超过间隔时不再额外等待。
+当前速率和并发数作为 rate_limit_* 指标导出。
+"""
+import random
+import threading
+import time
+
+from crawl_metrics import CrawlMetrics
+
+# 触发回退的信号
+TIMEOUT = 'timeout'
+CHALLENGE = 'challenge'
+SERVER_ERROR = 'server_error'
+
+# 列表页默认约每3.5秒一个请求（原先的平均间隔），详情页约每秒一个
+LIST_INITIAL_RATE = 1 / 3.5
+LIST_MAX_RATE = 1.0
+DETAIL_INITIAL_RATE = 1.0
+DETAIL_MAX_RATE = 4.0
+
+
+def classify_error(error):
+    """把异常归类为回退信号，与网站负载无关的异常（如解析错误）返回None"""
+    name = type(error).__name__
+    if 'Timeout' in name:
+        # requests的Timeout、Playwright的TimeoutError、Selenium的TimeoutException
+        return TIMEOUT
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    if name == 'RetryError' or (status is not None and status >= 500):
+        # urllib3对5xx重试用尽后抛出RetryError
+        return SERVER_ERROR
+    return None
+
+
+class AdaptiveRateController:
+    def __init__(self, name, initial_rate=DETAIL_INITIAL_RATE, max_rate=DETAIL_MAX_RATE, min_rate=0.05,
+                 increase=0.1, decrease=0.5, latency_target=5.0, initial_concurrency=1, max_concurrency=1,
+                 jitter=0.25, cooldown=5.0, metrics=None):
+        self.name = name  # 指标标签，如 list / detail
+        self.max_rate = max_rate  # 请求/秒的硬上限
+        self.min_rate = min(min_rate, max_rate)  # 多进程分摊后的上限可能低于默认下限
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target  # 耗时超过该值（秒）时不再加速
+        self.max_concurrency = max_concurrency
+        self.jitter = jitter  # 间隔的随机抖动比例
+        self.cooldown = cooldown
+        self.metrics = metrics or CrawlMetrics()
+        self._lock = threading.Lock()  # 异步详情页池和HTTP层线程会同时使用
+        self._rate = min(initial_rate, max_rate)
+        self._window = float(min(initial_concurrency, max_concurrency))
+        self._next_at = 0.0
+        self._last_backoff = None
+        self._publish()
+
+    @property
+    def rate(self):
+        """当前速率（请求/秒）"""
+        return self._rate
+
+    @property
+    def concurrency(self):
+        """当前允许同时在途的请求数"""
+        return max(1, int(self._window))
+
+    def reserve(self):
+        """预约下一个请求的开始时间，返回还需等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_at)
+            self._next_at = start + random.uniform(1 - self.jitter, 1 + self.jitter) / self._rate
+        return start - now
+
+    def wait(self):
+        """等待到下一个请求可以开始，返回等待的秒数"""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def record_success(self, latency):
+        """请求成功：耗时正常时加速"""
+        if latency > self.latency_target:
+            return
+        with self._lock:
+            self._rate = min(self.max_rate, self._rate + self.increase)
+            self._window = min(float(self.max_concurrency), self._window + 1 / self._window)
+            self._publish()
+
+    def record_failure(self, reason):
+        """遇到回退信号（TIMEOUT/CHALLENGE/SERVER_ERROR）：速率和并发按比例下降"""
+        self.metrics.inc('rate_limit_signals_total', controller=self.name, reason=reason)
+        with self._lock:
+            now = time.monotonic()
+            if self._last_backoff is not None and now - self._last_backoff < self.cooldown:
+                return
+            self._last_backoff = now
+            self._rate = max(self.min_rate, self._rate * self.decrease)
+            self._window = max(1.0, self._window * self.decrease)
+            self._publish()
+        print(f"[速率控制] {self.name} 遇到 {reason}，降速至 {self._rate:.2f} 请求/秒，并发 {self.concurrency}")
+        self.metrics.inc('rate_limit_backoffs_total', controller=self.name, reason=reason)
+
+    def record_error(self, error):
+        """按异常类型判断是否回退，返回回退信号或None"""
+        reason = classify_error(error)
+        if reason:
+            self.record_failure(reason)
+        return reason
+
+    def _publish(self):
+        self.metrics.set_gauge('rate_limit_requests_per_second', round(self._rate, 4), controller=self.name)
+        self.metrics.set_gauge('rate_limit_concurrency', self.concurrency, controller=self.name)
+
+    def print_summary(self):
+        backoffs = self.metrics.summary()['counters'].get('rate_limit_backoffs_total', {})
+        count = sum(value for label, value in backoffs.items() if label.startswith(f"controller={self.name},"))
+        print(f"[速率控制] {self.name}: 当前 {self._rate:.2f} 请求/秒（上限 {self.max_rate}），"
+              f"并发 {self.concurrency}（上限 {self.max_concurrency}），回退 {count} 次")
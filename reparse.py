@@ -0,0 +1,179 @@
+"""
+离线重新解析已保存的详情页HTML
+
+修改选择器后不需要重新爬取网站：本脚本对详情页HTML归档（article_archive/）
+或旧版按文章保存的目录（article_details/）中的HTML套用与crawl_article_detail相同的
+正文、来源、时间选择器顺序（lxml解析），用进程池并行处理，输出与save_to_json相同结构的记录。
+
+用法:
+    python reparse.py article_archive
+    python reparse.py article_details --records ccdi_selenium_reports.json --output ccdi_reparsed_reports.json --csv ccdi_reparsed_reports.csv
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from page_parser import RECORD_FIELDS, parse_article_detail
+from html_archive import DEFAULT_ARCHIVE_PATH, HtmlArchive
+
+# 工作进程中打开的归档（每个进程一个，读取时各自mmap分段文件）
+_archive = None
+
+
+def article_filename(url):
+    """从文章链接中取出保存HTML时使用的文件名"""
+    page_id = re.search(r'[^/]+\.html$', url or '')
+    return page_id.group() if page_id else None
+
+
+def load_list_records(paths):
+    """读取之前导出的JSON结果，按详情页文件名建立索引，用于补全列表页字段"""
+    list_records = {}
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for record in json.load(f):
+                filename = article_filename(record.get('链接'))
+                if filename:
+                    list_records[filename] = record
+    return list_records
+
+
+def reparse_file(path):
+    """解析单个HTML文件，返回 (文件名, 详情数据, 错误信息)"""
+    filename = os.path.basename(path)
+    try:
+        with open(path, 'rb') as f:
+            return filename, parse_article_detail(f.read()), None
+    except Exception as e:
+        return filename, None, str(e)
+
+
+def _open_archive(path):
+    """进程池初始化函数：在工作进程中打开归档"""
+    global _archive
+    _archive = HtmlArchive(path)
+
+
+def reparse_archived(entry):
+    """解析归档中的一个页面，entry为 (文章键, 链接, 内容哈希)，返回值同reparse_file"""
+    key, url, digest = entry
+    filename = article_filename(url) or f"{key}.html"
+    try:
+        return filename, parse_article_detail(_archive.get_bytes(digest)), None
+    except Exception as e:
+        return filename, None, str(e)
+
+
+def is_html_archive(path):
+    """判断目录是否为HtmlArchive归档"""
+    return os.path.exists(os.path.join(path, 'index.sqlite'))
+
+
+def build_record(filename, detail, list_record=None):
+    """合并列表页字段与重新解析出的详情字段"""
+    record = dict.fromkeys(RECORD_FIELDS, "")
+    if list_record:
+        record.update({key: list_record.get(key, "") for key in RECORD_FIELDS})
+    else:
+        record['标题'] = detail.get('标题', "")
+        record['日期'] = "无日期"
+        record['摘要'] = "无摘要"
+
+    for key in ('正文', '发布来源', '发布时间'):
+        if key in detail:
+            record[key] = detail[key]
+
+    return record
+
+
+def reparse_archive(folder, list_records=None, workers=None):
+    """并行重新解析归档或目录中的所有HTML，返回记录列表（按文章ID/文件名排序）"""
+    list_records = list_records or {}
+    initializer, initargs = None, ()
+    if is_html_archive(folder):
+        archive = HtmlArchive(folder)
+        tasks = archive.articles()
+        archive.close()
+        parse_one = reparse_archived
+        initializer, initargs = _open_archive, (folder,)
+    else:
+        tasks = sorted(
+            os.path.join(folder, name) for name in os.listdir(folder)
+            if name.endswith('.html')
+        )
+        parse_one = reparse_file
+    if not tasks:
+        return []
+
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        if initializer:
+            initializer(*initargs)
+        parsed = map(parse_one, tasks)
+        executor = None
+    else:
+        # 每个进程一次领取一批页面，减少进程间通信
+        chunksize = max(1, len(tasks) // (workers * 4))
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs)
+        parsed = executor.map(parse_one, tasks, chunksize=chunksize)
+
+    records = []
+    try:
+        for filename, detail, error in parsed:
+            if error:
+                print(f"解析 {filename} 时出错: {error}")
+                continue
+            records.append(build_record(filename, detail, list_records.get(filename)))
+    finally:
+        if executor:
+            executor.shutdown()
+
+    return records
+
+
+def save_records_json(records, filename):
+    """保存为与save_to_json相同格式的JSON文件"""
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(records, f, ensure_ascii=False, indent=2)
+    print(f"数据已保存至 {filename}，共{len(records)}条记录")
+
+
+def save_records_csv(records, filename):
+    """保存为与save_to_csv相同列顺序和编码的CSV文件"""
+    with open(filename, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=RECORD_FIELDS, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(records)
+    print(f"数据已保存至 {filename}，共{len(records)}条记录")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='离线重新解析已保存的详情页HTML')
+    parser.add_argument('folder', nargs='?', default=DEFAULT_ARCHIVE_PATH, help='详情页HTML归档，或旧版按文章保存HTML的目录')
+    parser.add_argument('--records', action='append', default=[], help='之前导出的JSON结果，用于补全标题、链接等列表页字段，可重复指定')
+    parser.add_argument('--output', default='ccdi_reparsed_reports.json', help='输出的JSON文件')
+    parser.add_argument('--csv', help='同时输出的CSV文件')
+    parser.add_argument('--workers', type=int, default=None, help='进程数，默认等于CPU核数')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    records = reparse_archive(args.folder, load_list_records(args.records), args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"重新解析 {len(records)} 个页面，耗时 {elapsed:.2f} 秒")
+
+    if not records:
+        print("没有数据可保存")
+        return
+
+    save_records_json(records, args.output)
+    if args.csv:
+        save_records_csv(records, args.csv)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+本地回放服务器
+
+离线模拟www.ccdi.gov.cn，供基准测试和调试使用：
+    - /was5/web/search?page=N 返回保存的列表页（selenium_page_source.html），
+      其中的文章链接改写为本服务器上的详情页，不同页码轮换使用不同的详情页；
+    - /replay/<文件名>.html 返回article_details/（或HTML归档）中保存的详情页；
+    - 请求没有带正确的C3VK Cookie时，先返回debug_page.html中的验证脚本，
+      跳转地址改写为当前请求的路径，与真实网站的行为一致。
+
+用法:
+    python replay_server.py --port 8000
+    # 然后把爬虫的base_url改为 http://127.0.0.1:8000/was5/web/search
+"""
+import argparse
+import os
+import re
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from c3vk_challenge import COOKIE_NAME, solve_challenge
+
+SEARCH_PATH = '/was5/web/search'
+DETAIL_PREFIX = '/replay/'
+
+_ARTICLE_LINK_RE = re.compile(r'href="https?://www\.ccdi\.gov\.cn/[^"]*?t\d{8}_\d+\.html"')
+_CHALLENGE_REDIRECT_RE = re.compile(r'window\.open\("[^"]*"')
+
+
+class ReplaySite:
+    """回放内容：列表页模板、详情页和验证页"""
+
+    def __init__(self, list_page_path='selenium_page_source.html', detail_folder='article_details',
+                 challenge_page_path='debug_page.html', total_pages=17, challenge=True):
+        with open(list_page_path, 'r', encoding='utf-8') as f:
+            self.list_template = f.read()
+        with open(challenge_page_path, 'r', encoding='utf-8') as f:
+            self.challenge_template = f.read()
+
+        self.details = {}
+        for name in sorted(os.listdir(detail_folder)):
+            if name.endswith('.html'):
+                with open(os.path.join(detail_folder, name), 'rb') as f:
+                    self.details[name] = f.read()
+        self.detail_names = list(self.details)
+
+        self.total_pages = total_pages
+        self.challenge = challenge
+        self.cookie_value = solve_challenge(self.challenge_template).value
+
+        self._lock = threading.Lock()
+        self._list_pages = {}
+        self.requests = 0
+        self.challenges_served = 0
+
+    def list_page(self, page_num, host):
+        """返回第page_num页的列表页，文章链接指向本服务器的详情页"""
+        with self._lock:
+            cached = self._list_pages.get((page_num, host))
+        if cached is not None:
+            return cached
+
+        counter = iter(range(len(self.detail_names) * self.total_pages))
+
+        def rewrite(match):
+            position = (page_num - 1) * 10 + next(counter)
+            name = self.detail_names[position % len(self.detail_names)]
+            return f'href="http://{host}{DETAIL_PREFIX}{name}"'
+
+        page_source = _ARTICLE_LINK_RE.sub(rewrite, self.list_template).encode('utf-8')
+        with self._lock:
+            self._list_pages[(page_num, host)] = page_source
+        return page_source
+
+    def challenge_page(self, path):
+        """返回跳转回当前路径的验证页"""
+        script = _CHALLENGE_REDIRECT_RE.sub(lambda match: f'window.open("{path}"', self.challenge_template)
+        return script.encode('utf-8')
+
+    def count(self, challenged):
+        with self._lock:
+            self.requests += 1
+            self.challenges_served += challenged
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    site = None  # 由make_server设置
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+
+        if self.site.challenge and f"{COOKIE_NAME}={self.site.cookie_value}" not in self.headers.get('Cookie', ''):
+            self.site.count(True)
+            self._send(200, self.site.challenge_page(self.path))
+            return
+        self.site.count(False)
+
+        if parsed.path == SEARCH_PATH:
+            page_num = int(parse_qs(parsed.query).get('page', ['1'])[0])
+            if page_num > self.site.total_pages:
+                self._send(200, b'<html><body><ul class="s_0603_list"></ul></body></html>')
+            else:
+                self._send(200, self.site.list_page(page_num, self.headers.get('Host')))
+        elif parsed.path.startswith(DETAIL_PREFIX) and parsed.path[len(DETAIL_PREFIX):] in self.site.details:
+            self._send(200, self.site.details[parsed.path[len(DETAIL_PREFIX):]])
+        else:
+            # 样式、图片等资源一律返回空内容
+            self._send(404, b'')
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(site, host='127.0.0.1', port=0):
+    """创建回放服务器（port为0时自动分配端口），返回 (服务器, 搜索页base_url)"""
+    handler = type('BoundReplayHandler', (ReplayHandler,), {'site': site})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server, f"http://{host}:{server.server_address[1]}{SEARCH_PATH}"
+
+
+def start_in_thread(site, host='127.0.0.1', port=0):
+    """在后台线程中启动回放服务器，返回 (服务器, 搜索页base_url)"""
+    server, base_url = make_server(site, host, port)
+    threading.Thread(target=server.serve_forever, name='replay-server', daemon=True).start()
+    return server, base_url
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='离线回放www.ccdi.gov.cn的列表页、详情页和验证页')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--pages', type=int, default=17, help='模拟的总页数')
+    parser.add_argument('--no-challenge', action='store_true', help='不返回C3VK验证页')
+    args = parser.parse_args(argv)
+
+    site = ReplaySite(total_pages=args.pages, challenge=not args.no_challenge)
+    server, base_url = make_server(site, args.host, args.port)
+    print(f"回放服务器已启动: {base_url}（{len(site.details)} 个详情页）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
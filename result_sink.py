@@ -0,0 +1,148 @@
+"""
+流式结果输出
+
+每条记录在详情合并完成后立即以JSONL追加写入磁盘，并定期fsync，
+爬取中途崩溃时已完成的记录不会丢失，内存中也不必保留全部正文。
+CSV/JSON在爬取结束后从JSONL文件流式生成，格式与save_to_csv/save_to_json一致。
+"""
+import csv
+import json
+import os
+import time
+
+from page_parser import RECORD_FIELDS
+
+
+class JsonlResultSink:
+    def __init__(self, path, fsync_every=20, fsync_interval=5.0, append=False):
+        self.path = path
+        self.fsync_every = fsync_every  # 每写入多少条记录fsync一次
+        self.fsync_interval = fsync_interval  # 距上次fsync超过多少秒也会fsync
+        self.count = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        if append:
+            _truncate_torn_tail(path)
+        self.file = open(path, 'a' if append else 'w', encoding='utf-8')
+
+    def write(self, record):
+        """追加一条记录"""
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.count += 1
+        self._unsynced += 1
+
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        """把缓冲区内容刷到磁盘"""
+        if self.file.closed:
+            return
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        """同步并关闭文件"""
+        if not self.file.closed:
+            self.sync()
+            self.file.close()
+
+
+def _truncate_torn_tail(path, block_size=65536):
+    """
+    把文件截断到最后一个换行符之后
+
+    上次运行崩溃时最后一行可能只写了一半，续写时不截断的话新记录会接在这半行后面，
+    两条记录都无法解析。被截掉的记录没有完成，恢复后会重新爬取。
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'r+b') as f:
+        size = f.seek(0, os.SEEK_END)
+        end = size
+        while end > 0:
+            start = max(0, end - block_size)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b'\n')
+            if newline != -1:
+                end = start + newline + 1
+                break
+            end = start
+        if end < size:
+            print(f"截断结果文件末尾不完整的记录（{size - end} 字节）: {path}")
+            f.truncate(end)
+
+
+def iter_records(path):
+    """逐行读取JSONL记录，跳过崩溃时可能写了一半的最后一行"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                print(f"跳过不完整的记录: {line[:80]}...")
+
+
+def merge_records(path, records):
+    """
+    按链接用records替换JSONL文件中的同名记录，文件中没有的追加在末尾，返回替换的条数
+
+    逐行流式改写到临时文件后原子替换，内存中只保留records。
+    """
+    by_link = {record['链接']: record for record in records}
+    replaced = 0
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as out:
+        if os.path.exists(path):
+            for record in iter_records(path):
+                link = record.get('链接')
+                if link in by_link:
+                    record = by_link.pop(link)
+                    replaced += 1
+                out.write(json.dumps(record, ensure_ascii=False) + '\n')
+        for record in by_link.values():
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp_path, path)
+    return replaced
+
+
+def export_csv(jsonl_path, csv_path):
+    """从JSONL流式生成CSV（utf-8-sig编码），返回记录数"""
+    records = iter_records(jsonl_path)
+    first = next(records, None)
+    if first is None:
+        return 0
+
+    # 固定字段在前，其余字段（如有）按第一条记录的顺序附加在后
+    fieldnames = RECORD_FIELDS + [key for key in first if key not in RECORD_FIELDS]
+
+    count = 0
+    with open(csv_path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore', lineterminator='\n')
+        writer.writeheader()
+        writer.writerow(first)
+        count += 1
+        for record in records:
+            writer.writerow(record)
+            count += 1
+    return count
+
+
+def export_json(jsonl_path, json_path):
+    """从JSONL流式生成与json.dump(indent=2)格式相同的JSON数组，返回记录数"""
+    count = 0
+    with open(json_path, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for record in iter_records(jsonl_path):
+            body = json.dumps(record, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+            f.write(('\n  ' if count == 0 else ',\n  ') + body)
+            count += 1
+        f.write('\n]' if count else ']')
+    return count
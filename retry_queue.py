@@ -0,0 +1,182 @@
+"""
+详情页重试队列与死信文件
+
+crawl_article_detail出错或超时时返回None，原先这条记录就一直缺少正文；在原地立即重试
+又会拖住整页。RetryQueue记录失败的详情页，按指数退避（base_delay * 2^(失败次数-1)，
+不超过max_delay，带随机抖动）安排下一次尝试：
+    - 爬虫在每个列表页之前处理已经到期的重试，不等待未到期的；
+    - 所有列表页完成后等待并处理剩余的重试；
+    - 失败max_attempts次后写入死信文件（JSONL，每行包含链接、列表页字段、尝试次数和最后的错误），
+      记录照常写出（没有正文），之后可以用 --replay-dead-letters 重新爬取这些文章。
+"""
+import heapq
+import json
+import os
+import random
+import time
+
+from crawl_metrics import CrawlMetrics
+
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_BASE_DELAY = 15.0
+DEFAULT_MAX_DELAY = 300.0
+
+
+class RetryQueue:
+    def __init__(self, max_attempts=DEFAULT_MAX_ATTEMPTS, base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY,
+                 dead_letter_path=None, metrics=None, clock=time.monotonic):
+        self.max_attempts = max_attempts  # 包括第一次爬取在内的总尝试次数
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.dead_letter_path = dead_letter_path  # 为None时放弃的文章只打印不保存
+        self.metrics = metrics or CrawlMetrics()
+        self.clock = clock  # 返回当前秒数的单调时钟（测试中可替换）
+        self._heap = []  # (到期时间, 序号, 结果索引)
+        self._entries = {}  # 等待到期的重试：结果索引 -> {'index', 'link', 'record', 'attempts', 'error', 'seq'}
+        self._taken = {}  # 已取出、正在重试的条目
+        self._seq = 0
+        self.dead_letters = 0
+
+    def __len__(self):
+        return len(self._entries) + len(self._taken)
+
+    def schedule(self, idx, link, record, error=None):
+        """
+        记录一次失败
+
+        未达到max_attempts时按指数退避安排重试，返回下一次尝试前的等待秒数；
+        已达到时写入死信文件，返回None。
+        """
+        entry = self._taken.pop(idx, None) or self._entries.pop(idx, None)
+        attempts = (entry['attempts'] if entry else 0) + 1
+        if attempts >= self.max_attempts:
+            self._dead_letter(link, record, attempts, error)
+            return None
+
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+        self._push({'index': idx, 'link': link, 'record': record, 'attempts': attempts, 'error': error}, delay)
+        self.metrics.inc('detail_retries_total')
+        return delay
+
+    def restore(self, entries, delay=0.0):
+        """放回之前保存的重试（断点或死信文件中的），delay秒后到期"""
+        for entry in entries:
+            self._push(dict(entry), delay)
+
+    def _push(self, entry, delay):
+        self._seq += 1
+        entry['seq'] = self._seq
+        self._entries[entry['index']] = entry
+        heapq.heappush(self._heap, (self.clock() + delay, self._seq, entry['index']))
+
+    def _drop_stale(self):
+        """丢弃堆顶已经失效的条目（同一索引被重新安排或已完成）"""
+        while self._heap:
+            _, seq, idx = self._heap[0]
+            entry = self._entries.get(idx)
+            if entry is not None and entry['seq'] == seq:
+                return
+            heapq.heappop(self._heap)
+
+    def pop_due(self):
+        """取出所有已经到期的重试，返回 [(结果索引, 链接)]"""
+        now = self.clock()
+        due = []
+        self._drop_stale()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, idx = heapq.heappop(self._heap)
+            entry = self._entries.pop(idx)
+            self._taken[idx] = entry
+            due.append((idx, entry['link']))
+            self._drop_stale()
+        return due
+
+    def wait_time(self):
+        """距下一个重试到期的秒数，没有等待中的重试时返回None"""
+        self._drop_stale()
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - self.clock())
+
+    def done(self, idx):
+        """重试成功或记录已写出，不再跟踪"""
+        self._entries.pop(idx, None)
+        self._taken.pop(idx, None)
+
+    def pending(self):
+        """尚未完成的重试（供断点保存）"""
+        return [
+            {key: entry[key] for key in ('index', 'link', 'record', 'attempts', 'error')}
+            for entry in list(self._entries.values()) + list(self._taken.values())
+        ]
+
+    def _dead_letter(self, link, record, attempts, error):
+        self.dead_letters += 1
+        self.metrics.inc('detail_dead_letters_total')
+        print(f"详情页 {attempts} 次尝试均失败，放弃: {link}")
+        if not self.dead_letter_path:
+            return
+        line = {
+            'link': link,
+            'record': record,
+            'attempts': attempts,
+            'error': error,
+            'failed_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(line, ensure_ascii=False) + '\n')
+
+
+def read_dead_letters(path):
+    """读取死信文件中的条目，跳过不完整的行"""
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                print(f"跳过不完整的死信记录: {line[:80]}...")
+    return entries
+
+
+def take_dead_letters(path):
+    """
+    把死信文件中的条目移入 <path>.replaying 并返回全部待重放的条目
+
+    上次重放中途崩溃时 .replaying 文件还在，其中的条目先读出来与死信文件合并（同一链接以死信文件
+    中较新的条目为准），不会被覆盖丢失。合并结果先原子写入 .replaying，再删除死信文件，
+    任一步骤崩溃后重新执行都能得到同样的结果。重放过程中再次失败的文章会重新写入path；
+    补全的记录合并进结果文件后由调用方调用finish_dead_letters删除 .replaying。
+    """
+    replaying_path = f"{path}.replaying"
+    by_link = {}
+    if os.path.exists(replaying_path):
+        leftover = read_dead_letters(replaying_path)
+        print(f"发现上次未完成的重放，合并其中的 {len(leftover)} 篇文章")
+        for entry in leftover:
+            by_link[entry['link']] = entry
+    if os.path.exists(path):
+        for entry in read_dead_letters(path):
+            by_link[entry['link']] = entry
+    if not by_link:
+        return []
+
+    entries = list(by_link.values())
+    tmp_path = f"{replaying_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    os.replace(tmp_path, replaying_path)
+    if os.path.exists(path):
+        os.remove(path)
+    return entries
+
+
+def finish_dead_letters(path):
+    """重放的记录已经合并进结果文件后删除 <path>.replaying"""
+    replaying_path = f"{path}.replaying"
+    if os.path.exists(replaying_path):
+        os.remove(replaying_path)
@@ -0,0 +1,521 @@
+"""
+标题、摘要、正文的全文倒排索引
+
+在爬取的通报中检索人名、省份和违纪类型，原先只能逐个扫描导出的JSON/CSV中每篇约4KB的正文。
+本模块在磁盘上维护倒排索引（SQLite，默认 ccdi_search_index.db）：
+    - 分词：NFKC规范化并转小写后，连续的汉字切成字符二元组（“违规吃喝” -> 违规/规吃/吃喝），
+      单独的一个汉字保留为一元组，连续的字母和数字作为一个词；标题、摘要中的词按3倍、2倍计入词频；
+    - 倒排表：每个词的文档号按差值编码、词频直接保存，按最大值选用uint8/uint16/uint32宽度后
+      分别用zlib压缩（常见词的差值几乎都是1，只占一个字节）；
+    - 增量更新：新记录先在内存中累积，每flush_every篇写成一个新段，段数超过max_segments时
+      把相邻的几个段中总篇数最少的一组合并为一个，各段的文档号区间互不重叠，按区间顺序拼接即有序；
+      同一篇文章（按文章ID）再次加入时旧文档标记为删除，合并段时清除；
+    - 查询：查询词同样切成二元组，默认要求全部命中，按BM25打分返回得分最高的文章。
+      倒排表用numpy整体解压；最短的倒排表较短时在其中二分求交，较长时（查询词在大部分文章中出现）
+      按文档号把得分累加到整个文档数组上。人名、地名等查询在百万篇文章中只需数毫秒；
+      所有二元组都出现在几乎每篇文章中的查询要处理整个倒排表，耗时与文章数成正比
+      （打开索引后的第一次查询需要加载文档长度，可以先调用preload）。
+尚未写成段的记录查询不到；爬虫关闭时会写出剩余的记录。
+索引可以由爬虫在写出每条记录时实时更新（search_index_path / --search-index），也可以从
+JSONL/JSON结果文件、详情页HTML归档（article_archive/）或旧版article_details/目录构建。
+
+用法:
+    python search_index.py build ccdi_selenium_reports.jsonl article_archive
+    python search_index.py query 违规吃喝 --limit 20
+    python search_index.py optimize
+    python search_index.py stats
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import re
+import sqlite3
+import struct
+import sys
+import time
+import unicodedata
+import zlib
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from html_archive import HtmlArchive
+from page_parser import parse_article_detail
+from reparse import is_html_archive
+from result_sink import iter_records
+from seen_index import article_id_from_url
+
+DEFAULT_SEARCH_INDEX_PATH = 'ccdi_search_index.db'
+DEFAULT_FLUSH_EVERY = 2000
+DEFAULT_MAX_SEGMENTS = 8
+MERGE_FACTOR = 4  # 每次合并的段数
+
+# 参与索引的字段及词频权重；列表页的占位文本不计入
+FIELD_WEIGHTS = (('标题', 3), ('摘要', 2), ('正文', 1))
+PLACEHOLDER_TEXTS = frozenset(['无标题', '无摘要', '无日期'])
+MAX_TERM_FREQ = 65535
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 汉字（含扩展A区和兼容汉字）连续段，或字母数字连续段
+_TOKEN_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[0-9a-z]+')
+_SQL_CHUNK = 500  # IN查询每次的参数个数
+_DOCS_HEADER = struct.Struct('<Bq')  # 差值宽度、第一个文档号
+# 最短的倒排表超过文档数的该比例时改为在整个文档数组上累加得分
+_DENSE_RATIO = 1 / 32
+
+
+def tokenize(text):
+    """把文本切成索引词：汉字二元组、单独的汉字和字母数字词"""
+    tokens = []
+    for run in _TOKEN_RE.findall(unicodedata.normalize('NFKC', text or '').lower()):
+        if run.isascii() or len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def _width(values):
+    """能容纳values中最大值的无符号整数字节数"""
+    maximum = int(values.max()) if len(values) else 0
+    return 1 if maximum < 1 << 8 else 2 if maximum < 1 << 16 else 4 if maximum < 1 << 32 else 8
+
+
+def encode_postings(docs, freqs):
+    """
+    倒排表编码，返回 (文档号, 词频) 两个字节串
+
+    文档号：记录头（差值宽度、第一个文档号）+ zlib压缩的差值；词频：宽度字节 + zlib压缩的词频。
+    """
+    docs = np.asarray(docs, dtype=np.int64)
+    gaps = np.diff(docs, prepend=docs[0])
+    freqs = np.minimum(np.asarray(freqs, dtype=np.int64), MAX_TERM_FREQ)
+    gap_width, freq_width = _width(gaps), _width(freqs)
+    return (
+        _DOCS_HEADER.pack(gap_width, int(docs[0])) + zlib.compress(gaps.astype(f'<u{gap_width}').tobytes()),
+        bytes([freq_width]) + zlib.compress(freqs.astype(f'<u{freq_width}').tobytes()),
+    )
+
+
+def decode_postings(doc_blob, freq_blob):
+    """倒排表解码，返回 (有序文档号数组, 词频数组)"""
+    gap_width, first_doc = _DOCS_HEADER.unpack_from(doc_blob)
+    gaps = np.frombuffer(zlib.decompress(doc_blob[_DOCS_HEADER.size:]), dtype=f'<u{gap_width}')
+    docs = np.cumsum(gaps, dtype=np.int64) + first_doc
+    freqs = np.frombuffer(zlib.decompress(freq_blob[1:]), dtype=f'<u{freq_blob[0]}')
+    return docs, freqs
+
+
+def _concat_postings(parts):
+    """拼接按段的文档号区间排列的多个倒排表（结果仍然有序）"""
+    if len(parts) == 1:
+        return parts[0]
+    return np.concatenate([docs for docs, _ in parts]), np.concatenate([freqs for _, freqs in parts])
+
+
+def _lookup(sorted_docs, docs):
+    """在有序数组sorted_docs中二分查找docs，返回 (位置, 是否存在)"""
+    if not len(sorted_docs):
+        return np.zeros(len(docs), dtype=np.int64), np.zeros(len(docs), dtype=bool)
+    positions = np.minimum(np.searchsorted(sorted_docs, docs), len(sorted_docs) - 1)
+    return positions, sorted_docs[positions] == docs
+
+
+def article_key(record):
+    """记录在索引中的键：文章ID，无法识别时使用链接"""
+    link = record.get('链接') or ''
+    return record.get('文章ID') or article_id_from_url(link) or link
+
+
+class SearchIndex:
+    def __init__(self, path=DEFAULT_SEARCH_INDEX_PATH, flush_every=DEFAULT_FLUSH_EVERY, max_segments=DEFAULT_MAX_SEGMENTS):
+        self.path = path
+        self.flush_every = flush_every  # 内存中累积多少篇后写成一个段
+        if max_segments < 1:
+            raise ValueError(f"max_segments 至少为1: {max_segments}")
+        self.max_segments = max_segments
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(
+            'CREATE TABLE IF NOT EXISTS docs ('
+            'doc INTEGER PRIMARY KEY, article_key TEXT UNIQUE, link TEXT, title TEXT, length INTEGER);'
+            'CREATE TABLE IF NOT EXISTS deleted (doc INTEGER PRIMARY KEY);'
+            'CREATE TABLE IF NOT EXISTS segments (segment INTEGER PRIMARY KEY, first_doc INTEGER, doc_count INTEGER);'
+            'CREATE TABLE IF NOT EXISTS postings ('
+            'term TEXT, segment INTEGER, docs BLOB, freqs BLOB, PRIMARY KEY (term, segment)) WITHOUT ROWID;'
+        )
+        self.conn.commit()
+
+        self._pending = defaultdict(list)  # 词 -> [(文档号, 词频)]
+        self._pending_docs = {}  # 文章键 -> (文档号, 链接, 标题, 文档长度)
+        self._pending_deleted = []  # 同一批中被再次加入的文章的旧文档号
+        last_doc = self.conn.execute('SELECT MAX(doc) FROM (SELECT doc FROM docs UNION ALL SELECT doc FROM deleted)').fetchone()[0]
+        self._next_doc = (last_doc or 0) + 1
+        self._first_pending_doc = self._next_doc  # 下一个段的第一个文档号
+        self._reset_cache()
+
+    def _reset_cache(self):
+        """段变化后清除查询时缓存的文档长度、已删除文档和统计"""
+        self._lengths = None
+        self._deleted = None
+        self._totals = None
+
+    def add(self, record):
+        """加入或更新一篇文章（记录字段同JSONL结果），返回是否加入"""
+        key = article_key(record)
+        if not key:
+            return False
+
+        counts = Counter()
+        for field, weight in FIELD_WEIGHTS:
+            value = record.get(field) or ''
+            if value in PLACEHOLDER_TEXTS:
+                continue
+            for token in tokenize(value):
+                counts[token] += weight
+
+        if key in self._pending_docs:
+            self._pending_deleted.append(self._pending_docs[key][0])
+        doc = self._next_doc
+        self._next_doc += 1
+        for term, freq in counts.items():
+            self._pending[term].append((doc, freq))
+        self._pending_docs[key] = (doc, record.get('链接') or '', record.get('标题') or '', sum(counts.values()))
+
+        if len(self._pending_docs) >= self.flush_every:
+            self.flush()
+        return True
+
+    def flush(self):
+        """把内存中累积的文章写成一个新段，返回写入的篇数"""
+        if not self._pending_docs:
+            return 0
+
+        keys = list(self._pending_docs)
+        with self.conn:
+            replaced = list(self._pending_deleted)
+            for start in range(0, len(keys), _SQL_CHUNK):
+                chunk = keys[start:start + _SQL_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                replaced.extend(doc for (doc,) in self.conn.execute(
+                    f'SELECT doc FROM docs WHERE article_key IN ({placeholders})', chunk
+                ))
+                self.conn.execute(f'DELETE FROM docs WHERE article_key IN ({placeholders})', chunk)
+            self.conn.executemany('INSERT OR IGNORE INTO deleted (doc) VALUES (?)', [(doc,) for doc in replaced])
+            self.conn.executemany(
+                'INSERT INTO docs (doc, article_key, link, title, length) VALUES (?, ?, ?, ?, ?)',
+                [(doc, key, link, title, length) for key, (doc, link, title, length) in self._pending_docs.items()]
+            )
+
+            segment = self._new_segment(self._first_pending_doc, len(keys))
+            self.conn.executemany(
+                'INSERT INTO postings (term, segment, docs, freqs) VALUES (?, ?, ?, ?)',
+                ((term, segment, *encode_postings(*zip(*postings))) for term, postings in self._pending.items())
+            )
+
+        self._pending = defaultdict(list)
+        self._pending_docs = {}
+        self._pending_deleted = []
+        self._first_pending_doc = self._next_doc
+        self._reset_cache()
+        self._merge_if_needed()
+        return len(keys)
+
+    def _new_segment(self, first_doc, doc_count):
+        segment = self.conn.execute('SELECT COALESCE(MAX(segment), 0) + 1 FROM segments').fetchone()[0]
+        self.conn.execute(
+            'INSERT INTO segments (segment, first_doc, doc_count) VALUES (?, ?, ?)', (segment, first_doc, doc_count)
+        )
+        return segment
+
+    def _merge_if_needed(self):
+        """
+        段数超过max_segments时，合并相邻MERGE_FACTOR个段中总篇数最少的一组
+
+        max_segments小于MERGE_FACTOR时段数可能不足MERGE_FACTOR个，此时合并全部段。
+        """
+        while True:
+            segments = self.conn.execute('SELECT segment, doc_count FROM segments ORDER BY first_doc').fetchall()
+            if len(segments) <= self.max_segments:
+                return
+            window = min(MERGE_FACTOR, len(segments))
+            start = min(
+                range(len(segments) - window + 1),
+                key=lambda i: sum(doc_count for _, doc_count in segments[i:i + window])
+            )
+            self.merge_segments([segment for segment, _ in segments[start:start + window]])
+
+    def merge_segments(self, segments):
+        """把文档号区间相邻的若干段合并为一个新段，同时去掉已删除的文档"""
+        deleted = self._deleted_docs()
+        placeholders = ','.join('?' * len(segments))
+        with self.conn:
+            first_doc, doc_count = self.conn.execute(
+                f'SELECT MIN(first_doc), SUM(doc_count) FROM segments WHERE segment IN ({placeholders})', segments
+            ).fetchone()
+            merged = self._new_segment(first_doc, doc_count or 0)
+            rows = self.conn.execute(
+                'SELECT p.term, p.docs, p.freqs FROM postings p JOIN segments s ON s.segment = p.segment '
+                f'WHERE p.segment IN ({placeholders}) ORDER BY p.term, s.first_doc', segments
+            )
+
+            def merged_rows():
+                for term, group in itertools.groupby(rows, key=lambda row: row[0]):
+                    docs, freqs = _concat_postings([decode_postings(doc_blob, freq_blob) for _, doc_blob, freq_blob in group])
+                    if len(deleted):
+                        live = ~np.isin(docs, deleted)
+                        docs, freqs = docs[live], freqs[live]
+                    if len(docs):
+                        yield (term, merged, *encode_postings(docs, freqs))
+
+            # 先读完再写，避免在同一张表上边读边插入
+            new_rows = list(merged_rows())
+            self.conn.execute(f'DELETE FROM postings WHERE segment IN ({placeholders})', segments)
+            self.conn.execute(f'DELETE FROM segments WHERE segment IN ({placeholders})', segments)
+            self.conn.executemany('INSERT INTO postings (term, segment, docs, freqs) VALUES (?, ?, ?, ?)', new_rows)
+        self._reset_cache()
+        return merged
+
+    def optimize(self):
+        """写出累积的记录，把所有段合并为一个并清除已删除的文档，返回合并前的段数"""
+        self.flush()
+        segments = [segment for (segment,) in self.conn.execute('SELECT segment FROM segments')]
+        if len(segments) > 1 or self._deleted_docs().size:
+            if segments:
+                self.merge_segments(segments)
+            with self.conn:
+                self.conn.execute('DELETE FROM deleted')
+            self._reset_cache()
+            self.conn.execute('VACUUM')
+        return len(segments)
+
+    def preload(self):
+        """预先加载查询时使用的文档长度、已删除文档和统计"""
+        self._doc_lengths()
+        self._deleted_docs()
+        self._collection_totals()
+
+    def _deleted_docs(self):
+        if self._deleted is None:
+            self._deleted = np.array(
+                sorted(doc for (doc,) in self.conn.execute('SELECT doc FROM deleted')), dtype=np.int64
+            )
+        return self._deleted
+
+    def _doc_lengths(self):
+        """按文档号索引的文档长度数组（已删除的文档为0）"""
+        if self._lengths is None:
+            rows = np.array(self.conn.execute('SELECT doc, length FROM docs').fetchall(), dtype=np.int64).reshape(-1, 2)
+            lengths = np.zeros(self._next_doc, dtype=np.float64)
+            lengths[rows[:, 0]] = rows[:, 1]
+            self._lengths = lengths
+        return self._lengths
+
+    def _collection_totals(self):
+        """(文档总数, 平均文档长度)"""
+        if self._totals is None:
+            count, average = self.conn.execute('SELECT COUNT(*), AVG(length) FROM docs').fetchone()
+            self._totals = (count, average or 1.0)
+        return self._totals
+
+    def postings(self, term):
+        """返回词在所有段中的 (有序文档号数组, 词频数组)，不含尚未写出的记录"""
+        parts = [
+            decode_postings(doc_blob, freq_blob)
+            for doc_blob, freq_blob in self.conn.execute(
+                'SELECT p.docs, p.freqs FROM postings p JOIN segments s ON s.segment = p.segment '
+                'WHERE p.term = ? ORDER BY s.first_doc', (term,)
+            )
+        ]
+        if not parts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint8)
+        return _concat_postings(parts)
+
+    def search(self, query, limit=10, match_all=True):
+        """
+        查询文章，返回按BM25得分排序的 [{'文章ID', '标题', '链接', '得分'}]
+
+        match_all为True时要求查询中的每个词（汉字二元组）都出现，否则命中任意一个即可。
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        # 先去掉已删除的旧文档，文档频率只统计现存的文章
+        deleted = self._deleted_docs()
+        postings = []
+        for term in terms:
+            docs, freqs = self.postings(term)
+            if len(deleted) and len(docs):
+                live = ~_lookup(deleted, docs)[1]
+                docs, freqs = docs[live], freqs[live]
+            if not len(docs):
+                if match_all:
+                    return []
+                continue
+            postings.append((docs, freqs))
+        if not postings:
+            return []
+
+        postings.sort(key=lambda item: len(item[0]))
+        if match_all and len(postings[0][0]) <= len(self._doc_lengths()) * _DENSE_RATIO:
+            candidates, scores = self._score_intersection(postings)
+        else:
+            candidates, scores = self._score_dense(postings, match_all)
+        if not len(candidates):
+            return []
+
+        if len(scores) > limit:
+            top = np.argpartition(-scores, limit)[:limit]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return self._describe(candidates[top], scores[top])
+
+    def _bm25(self, freqs, lengths, df):
+        """一个词对各文档的BM25得分"""
+        total, average_length = self._collection_totals()
+        idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+        tf = freqs.astype(np.float64)
+        return idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * lengths / average_length))
+
+    def _score_intersection(self, postings):
+        """从最短的倒排表开始二分求交，只为交集中的文档打分"""
+        candidates = postings[0][0]
+        for docs, _ in postings[1:]:
+            candidates = candidates[_lookup(docs, candidates)[1]]
+        lengths = self._doc_lengths()[candidates]
+        scores = np.zeros(len(candidates))
+        for docs, freqs in postings:
+            positions = _lookup(docs, candidates)[0]
+            scores += self._bm25(freqs[positions], lengths, len(docs))
+        return candidates, scores
+
+    def _score_dense(self, postings, match_all):
+        """按文档号把各词的得分累加到整个文档数组上，适合长倒排表和任意命中"""
+        lengths = self._doc_lengths()
+        scores = np.zeros(len(lengths))
+        hits = np.zeros(len(lengths), dtype=np.int16)
+        for docs, freqs in postings:
+            scores[docs] += self._bm25(freqs, lengths[docs], len(docs))
+            hits[docs] += 1
+        candidates = np.flatnonzero(hits == len(postings) if match_all else hits > 0)
+        return candidates, scores[candidates]
+
+    def _describe(self, docs, scores):
+        doc_ids = [int(doc) for doc in docs]
+        placeholders = ','.join('?' * len(doc_ids))
+        rows = {
+            doc: (key, title, link)
+            for doc, key, title, link in self.conn.execute(
+                f'SELECT doc, article_key, title, link FROM docs WHERE doc IN ({placeholders})', doc_ids
+            )
+        }
+        results = []
+        for doc, score in zip(doc_ids, scores):
+            key, title, link = rows[doc]
+            results.append({'文章ID': key, '标题': title, '链接': link, '得分': round(float(score), 4)})
+        return results
+
+    def stats(self):
+        """返回文章数、待清除的旧文档数、段数、倒排表行数和文件大小"""
+        self.flush()
+        stats = {
+            table: self.conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+            for table in ('docs', 'deleted', 'segments', 'postings')
+        }
+        stats['bytes'] = os.path.getsize(self.path)
+        return stats
+
+    def close(self):
+        """写出剩余的记录并关闭数据库"""
+        self.flush()
+        self.conn.close()
+
+
+def iter_source_records(path):
+    """
+    读取索引来源中的记录
+
+    支持JSONL/JSON结果文件、HtmlArchive归档（按归档中的链接和文章ID）和
+    按文章保存HTML的目录（文章ID取自文件名，只有详情页字段）。
+    """
+    if os.path.isdir(path) and is_html_archive(path):
+        archive = HtmlArchive(path)
+        try:
+            for key, url, digest in archive.articles():
+                detail = parse_article_detail(archive.get_bytes(digest))
+                yield dict(detail, 链接=url, 文章ID=key)
+        finally:
+            archive.close()
+    elif os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if not name.endswith('.html'):
+                continue
+            with open(os.path.join(path, name), 'rb') as f:
+                detail = parse_article_detail(f.read())
+            yield dict(detail, 文章ID=article_id_from_url(name) or name[:-len('.html')])
+    elif path.endswith('.jsonl'):
+        yield from iter_records(path)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='标题、摘要、正文的全文倒排索引')
+    parser.add_argument('--index', default=DEFAULT_SEARCH_INDEX_PATH, help='索引文件')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='从结果文件、HTML归档或HTML目录加入文章（同一篇文章以后加入的为准）')
+    build_parser.add_argument('sources', nargs='+', help='如 ccdi_selenium_reports.jsonl article_archive')
+
+    query_parser = subparsers.add_parser('query', help='查询文章')
+    query_parser.add_argument('query', help='查询词，如 违规吃喝')
+    query_parser.add_argument('--limit', type=int, default=10, help='返回的文章数')
+    query_parser.add_argument('--any', action='store_true', help='命中查询中任意一个词即可（默认要求全部命中）')
+    query_parser.add_argument('--json', action='store_true', help='以JSON输出结果')
+
+    subparsers.add_parser('optimize', help='合并所有段并清除已删除的文档')
+    subparsers.add_parser('stats', help='显示索引统计')
+    args = parser.parse_args(argv)
+
+    index = SearchIndex(args.index)
+    try:
+        if args.command == 'build':
+            for source in args.sources:
+                start = time.perf_counter()
+                added = sum(index.add(record) for record in iter_source_records(source))
+                index.flush()
+                print(f"已从 {source} 加入 {added} 篇文章，耗时 {time.perf_counter() - start:.2f} 秒")
+
+        elif args.command == 'query':
+            index.preload()  # 下面的计时只包括查询本身
+            start = time.perf_counter()
+            results = index.search(args.query, args.limit, match_all=not args.any)
+            elapsed = (time.perf_counter() - start) * 1000
+            if args.json:
+                print(json.dumps(results, ensure_ascii=False, indent=2))
+            else:
+                for rank, result in enumerate(results, 1):
+                    print(f"{rank:>3}. {result['文章ID']}  {result['得分']:.2f}  {result['标题']}  {result['链接']}")
+            print(f"找到 {len(results)} 篇文章，查询耗时 {elapsed:.1f} 毫秒", file=sys.stderr)
+            return 0
+
+        elif args.command == 'optimize':
+            start = time.perf_counter()
+            segments = index.optimize()
+            print(f"已合并 {segments} 个段，耗时 {time.perf_counter() - start:.2f} 秒")
+
+        stats = index.stats()
+        print(f"索引 {args.index}: {stats['docs']} 篇文章，{stats['segments']} 个段，{stats['postings']} 行倒排表，"
+              f"待清除旧文档 {stats['deleted']} 个，{stats['bytes'] / 1024 / 1024:.1f} MB")
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
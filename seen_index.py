@@ -0,0 +1,81 @@
+"""
+已爬取文章索引
+
+搜索结果按发布时间倒序（orderby=-DocRelTime）排列，文章链接中带有稳定的ID（如t20230418_259205）。
+本模块用SQLite在磁盘上记录已经成功爬取的文章ID，供增量爬取时跳过已知文章、提前停止翻页。
+"""
+import re
+import sqlite3
+import time
+
+DEFAULT_INDEX_PATH = 'ccdi_seen_articles.db'
+
+# 文章ID的正则（normalize.py在整列上做向量化提取时也使用）
+ARTICLE_ID_PATTERN = r't\d{8}_\d+'
+_ARTICLE_ID_RE = re.compile(ARTICLE_ID_PATTERN)
+
+
+def article_id_from_url(url):
+    """从文章链接中提取稳定的文章ID，无法识别时返回None"""
+    match = _ARTICLE_ID_RE.search(url or '')
+    return match.group() if match else None
+
+
+class SeenArticleIndex:
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS seen_articles ('
+            'article_id TEXT PRIMARY KEY, '
+            'url TEXT, '
+            'first_seen REAL)'
+        )
+        self.conn.commit()
+
+    def known_urls(self, urls):
+        """返回urls中已经记录过的链接集合（一次查询）"""
+        ids = {}
+        for url in urls:
+            article_id = article_id_from_url(url)
+            if article_id:
+                ids.setdefault(article_id, []).append(url)
+
+        if not ids:
+            return set()
+
+        placeholders = ','.join('?' * len(ids))
+        rows = self.conn.execute(
+            f'SELECT article_id FROM seen_articles WHERE article_id IN ({placeholders})',
+            list(ids)
+        ).fetchall()
+
+        known = set()
+        for (article_id,) in rows:
+            known.update(ids[article_id])
+        return known
+
+    def is_known(self, url):
+        """判断单个链接是否已记录"""
+        return url in self.known_urls([url])
+
+    def add(self, url):
+        """记录一篇已成功爬取的文章，立即提交以免中途崩溃丢失"""
+        article_id = article_id_from_url(url)
+        if not article_id:
+            return False
+
+        self.conn.execute(
+            'INSERT OR IGNORE INTO seen_articles (article_id, url, first_seen) VALUES (?, ?, ?)',
+            (article_id, url, time.time())
+        )
+        self.conn.commit()
+        return True
+
+    def count(self):
+        """返回已记录的文章数量"""
+        return self.conn.execute('SELECT COUNT(*) FROM seen_articles').fetchone()[0]
+
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
@@ -0,0 +1,267 @@
+"""
+按命中统计自适应调整选择器顺序
+
+详情页的正文、来源、时间选择器和列表页的标题选择器原先总按固定顺序尝试，
+例如正文要先试完 .TRS_Editor、.article-content、.content、#content、.detail-content 才轮到 .w1100，
+在浏览器中每次未命中都是一次往返。本模块按 字段 + URL模式（主机名加第一级目录，如
+www.ccdi.gov.cn/yaowenn；列表页为 list）记录每次命中的选择器：
+    - 命中分数按指数衰减累计，排序时分数高的选择器排在前面，分数相同时保持默认顺序；
+    - 统计在多次运行之间保存在JSON文件中（原子写入）；多个进程（如sharded_crawl的工作进程）
+      共用同一文件时，保存时在锁文件保护下把本进程新增的命中合并进文件中的统计，互不覆盖；
+    - 最近一个窗口内的命中分布与历史分布明显不同（历史上最常命中的选择器在窗口内占比
+      低于阈值）时打印告警，这通常意味着网站改版；告警后以最近窗口作为新的基线。
+只会在默认选择器列表内重新排序，不会引入新的选择器。
+"""
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from urllib.parse import urlparse
+
+from crawl_metrics import CrawlMetrics
+from page_parser import CONTENT_SELECTORS, SOURCE_SELECTORS, TIME_SELECTORS, TITLE_SELECTORS
+
+DEFAULT_SELECTOR_STATS_PATH = 'ccdi_selector_stats.json'
+
+# 各字段的默认选择器顺序（与page_parser一致）
+DEFAULT_FIELD_SELECTORS = {
+    'content': CONTENT_SELECTORS,
+    'source': SOURCE_SELECTORS,
+    'time': TIME_SELECTORS,
+    'title': TITLE_SELECTORS,
+}
+DETAIL_FIELDS = ('content', 'source', 'time')
+LIST_PATTERN = 'list'
+MISS = '<miss>'  # 所有选择器都未命中
+LOCK_TIMEOUT = 30.0  # 锁文件存在超过该秒数视为持有者已崩溃
+
+
+def url_pattern(url):
+    """URL模式：主机名加第一级目录，没有链接时视为列表页"""
+    if not url:
+        return LIST_PATTERN
+    parsed = urlparse(url)
+    segments = [segment for segment in parsed.path.split('/') if segment]
+    directory = segments[0] if len(segments) > 1 else ''
+    return f"{parsed.hostname}/{directory}" if directory else parsed.hostname or LIST_PATTERN
+
+
+class SelectorStats:
+    def __init__(self, path=DEFAULT_SELECTOR_STATS_PATH, decay=0.98, window=50, min_samples=100,
+                 drift_threshold=0.5, metrics=None):
+        self.path = path  # 为None时只在内存中统计
+        self.decay = decay  # 每次记录时旧分数的衰减系数
+        self.window = window  # 漂移检测的最近窗口大小
+        self.min_samples = min_samples  # 历史样本少于该数时不检测漂移
+        self.drift_threshold = drift_threshold
+        self.metrics = metrics or CrawlMetrics()
+        self._lock = threading.Lock()  # 异步详情页池和HTTP层线程会同时记录
+        self._stats = {}  # (URL模式, 字段) -> {'scores': {}, 'hits': Counter, 'recent': deque}
+        # 上次保存以来的新增记录：(URL模式, 字段) -> {'count': 次数, 'base': 上次保存时的分数,
+        # 'hits': Counter, 'recent': list, 'reset': 是否因漂移告警重置了基线}
+        self._pending = {}
+        self._alerted = set()
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        """读取之前运行保存的统计，不存在或无法解析时从空统计开始"""
+        with self._lock:
+            self._stats = self._read_file()
+
+    def _read_file(self):
+        """读取统计文件，返回 {(URL模式, 字段): 统计}"""
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"选择器统计文件无法读取，重新开始统计: {e}")
+            return {}
+
+        stats = {}
+        for pattern, fields in data.get('patterns', {}).items():
+            for field, entry in fields.items():
+                stats[(pattern, field)] = {
+                    'scores': dict(entry.get('scores', {})),
+                    'hits': Counter(entry.get('hits', {})),
+                    'recent': deque(entry.get('recent', []), maxlen=self.window),
+                }
+        return stats
+
+    def save(self):
+        """
+        把上次保存以来的新增记录合并进统计文件并原子写入（没有新记录时跳过）
+
+        持有锁文件期间重新读取文件，把其他进程保存的统计作为基础，只叠加本进程新增的部分：
+        分数按本进程新增的记录次数衰减后加上本进程的增量，命中次数相加，最近窗口追加在后面。
+        合并结果同时成为本进程的内存统计，之后的排序也能用上其他进程的命中。
+        """
+        if not self.path or not self._dirty:
+            return
+        with self._lock, self._file_lock():
+            merged = self._read_file()
+            for key, entry in self._stats.items():
+                pending = self._pending.get(key)
+                disk = merged.get(key)
+                if disk is None:
+                    merged[key] = entry
+                    continue
+                if pending is None:
+                    continue
+                factor = self.decay ** pending['count']
+                scores = {selector: score * factor for selector, score in disk['scores'].items()}
+                for selector, score in entry['scores'].items():
+                    delta = score - pending['base'].get(selector, 0.0) * factor
+                    scores[selector] = scores.get(selector, 0.0) + delta
+                disk['scores'] = scores
+                disk['hits'] = Counter(entry['hits']) if pending['reset'] else disk['hits'] + pending['hits']
+                disk['recent'].extend(pending['recent'])
+
+            patterns = {}
+            for (pattern, field), entry in sorted(merged.items()):
+                patterns.setdefault(pattern, {})[field] = {
+                    'scores': {selector: round(score, 4) for selector, score in entry['scores'].items()},
+                    'hits': dict(entry['hits']),
+                    'recent': list(entry['recent']),
+                }
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': 1, 'patterns': patterns}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+            self._stats = merged
+            self._pending = {}
+            self._dirty = False
+
+    def _file_lock(self):
+        """进程间互斥的锁文件（O_EXCL创建，Windows和Linux都可用）"""
+        return _LockFile(f"{self.path}.lock")
+
+    def order(self, field, url=None):
+        """返回字段的选择器列表，历史上命中最多的排在前面"""
+        return self._ordered(url_pattern(url), field)
+
+    def _ordered(self, pattern, field):
+        defaults = DEFAULT_FIELD_SELECTORS[field]
+        with self._lock:
+            entry = self._stats.get((pattern, field))
+            if not entry or not entry['scores']:
+                return list(defaults)
+            scores = dict(entry['scores'])
+        # sorted是稳定排序，分数相同时保持默认顺序
+        return sorted(defaults, key=lambda selector: -scores.get(selector, 0.0))
+
+    def detail_orders(self, url):
+        """详情页三个字段的选择器顺序：{字段: 选择器列表}"""
+        return {field: self.order(field, url) for field in DETAIL_FIELDS}
+
+    def record(self, field, selector, url=None):
+        """记录一次命中的选择器（selector为None表示全部未命中）"""
+        pattern = url_pattern(url)
+        winner = selector or MISS
+        with self._lock:
+            entry = self._stats.get((pattern, field))
+            if entry is None:
+                entry = self._stats[(pattern, field)] = {
+                    'scores': {}, 'hits': Counter(), 'recent': deque(maxlen=self.window)
+                }
+            pending = self._pending.get((pattern, field))
+            if pending is None:
+                pending = self._pending[(pattern, field)] = {
+                    'count': 0, 'base': dict(entry['scores']), 'hits': Counter(), 'recent': [], 'reset': False
+                }
+            scores = entry['scores']
+            for key in scores:
+                scores[key] *= self.decay
+            if selector:
+                scores[selector] = scores.get(selector, 0.0) + 1.0
+            entry['hits'][winner] += 1
+            entry['recent'].append(winner)
+            pending['count'] += 1
+            pending['hits'][winner] += 1
+            pending['recent'].append(winner)
+            self._dirty = True
+            drift = self._check_drift(pattern, field, entry)
+            if drift:
+                pending['reset'] = True
+
+        if drift:
+            baseline, share, recent_top = drift
+            print(f"[选择器告警] {pattern} 的 {field} 字段命中分布发生变化：历史上最常命中的 {baseline} "
+                  f"在最近 {self.window} 次中只占 {share:.0%}，最近最常命中 {recent_top}，网站可能已改版")
+            self.metrics.inc('selector_drift_alerts_total', field=field)
+
+    def _check_drift(self, pattern, field, entry):
+        """比较最近窗口和历史分布，发生漂移时返回 (历史首选, 窗口内占比, 窗口内首选)（调用方持有锁）"""
+        recent = entry['recent']
+        hits = entry['hits']
+        if (pattern, field) in self._alerted or len(recent) < self.window or sum(hits.values()) < self.min_samples:
+            return None
+
+        baseline = hits.most_common(1)[0][0]
+        share = sum(1 for winner in recent if winner == baseline) / len(recent)
+        if share >= self.drift_threshold:
+            return None
+
+        # 以最近窗口作为新的基线，之后的运行不再重复告警
+        self._alerted.add((pattern, field))
+        entry['hits'] = Counter(recent)
+        return baseline, share, Counter(recent).most_common(1)[0][0]
+
+    def record_matches(self, orders, matched, url=None):
+        """
+        记录一次提取中各字段命中的选择器
+
+        orders为提取时使用的 {字段: 选择器列表}，matched为 {字段: 命中的序号或None}
+        （页内脚本的返回值格式）。同时把序号计入回退指标：序号大于0说明排在前面的选择器未命中。
+        """
+        for field, index in matched.items():
+            if field in orders:
+                self.record(field, orders[field][index] if index is not None else None, url)
+        self.metrics.record_selector_matches(matched)
+
+    def print_summary(self):
+        """打印各URL模式下每个字段当前的首选选择器"""
+        with self._lock:
+            items = sorted(self._stats.items())
+        for (pattern, field), entry in items:
+            total = sum(entry['hits'].values())
+            if not total:
+                continue
+            top, count = entry['hits'].most_common(1)[0]
+            print(f"[选择器统计] {pattern} {field}: 当前首选 {self._ordered(pattern, field)[0]}，"
+                  f"最常命中 {top}（{count}/{total}）")
+
+
+class _LockFile:
+    """用O_EXCL创建锁文件实现的进程间锁，持有者崩溃留下的锁文件超过LOCK_TIMEOUT秒后被清除"""
+
+    def __init__(self, path, poll_interval=0.05):
+        self.path = path
+        self.poll_interval = poll_interval
+
+    def __enter__(self):
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > LOCK_TIMEOUT:
+                        os.remove(self.path)
+                        continue
+                except OSError:
+                    continue
+                time.sleep(self.poll_interval)
+                continue
+            os.write(fd, str(os.getpid()).encode())
+            os.close(fd)
+            return self
+
+    def __exit__(self, *exc):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,326 @@
+"""
+多进程分片爬取
+
+单个CCDIPlaywrightSpider只驱动一个浏览器并逐页顺序爬取。本脚本作为协调进程：
+先通过get_total_pages确定总页数，把页码范围切成若干分片交给进程池，
+每个工作进程启动一个浏览器，把分片结果写入各自的JSONL文件；
+失败的分片单独重试（工作进程崩溃时重建进程池），不需要重新开始整个任务。
+全部完成后按爬取页码顺序合并各分片，并按文章链接去重（爬取期间有新文章发布时，
+相邻页之间可能出现重复条目）；各分片的死信文件也按链接去重合并为一个文件，
+可以直接交给 playwright_spider.py --replay-dead-letters --dead-letters <文件> 重新爬取
+（补全的记录合并进该脚本的结果文件 ccdi_playwright_reports.jsonl）。
+
+用法:
+    python sharded_crawl.py --workers 16
+    python sharded_crawl.py --workers 4 --max-pages 8 --pages-per-shard 2 --output ccdi_backfill
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+from page_parser import parse_total_pages
+from playwright_spider import CCDIPlaywrightSpider
+from load_profile import PRODUCTION_PROFILE
+from detail_cache import CACHE_MODES
+from result_sink import JsonlResultSink, iter_records, export_csv, export_json
+from retry_queue import RetryQueue, read_dead_letters
+from rate_control import LIST_MAX_RATE, DETAIL_MAX_RATE
+
+# 工作进程内的爬虫实例（每个进程一个浏览器，跨分片复用）
+_worker_spider = None
+_worker_options = None
+
+
+def discover_total_pages(profile=PRODUCTION_PROFILE):
+    """获取搜索结果总页数：优先通过HTTP抓取第一页解析，失败时用浏览器打开第一页调用get_total_pages"""
+    spider = CCDIPlaywrightSpider()
+    url = spider.build_url(1)
+    try:
+        try:
+            total_pages = parse_total_pages(spider.http_backend.fetch(url))
+            if total_pages:
+                print(f"找到总页数: {total_pages}")
+                return total_pages
+        except Exception as e:
+            print(f"HTTP获取总页数失败，改用浏览器: {e}")
+
+        spider.setup_browser(profile=profile)
+        spider.sync_challenge_cookie()
+        spider.page.goto(url, wait_until=spider.wait_until)
+        return spider.get_total_pages()
+    finally:
+        spider.close()
+
+
+def plan_shards(total_pages, pages_per_shard=1):
+    """把 1..total_pages 切成连续的页码分片，返回 {分片编号: [页码, ...]}"""
+    pages = list(range(1, total_pages + 1))
+    return {
+        shard_id: pages[start:start + pages_per_shard]
+        for shard_id, start in enumerate(range(0, len(pages), pages_per_shard))
+    }
+
+
+def dead_letter_shard_path(shard_dir, shard_id):
+    """分片的死信文件路径"""
+    return os.path.join(shard_dir, f"dead_letters_{shard_id:04d}.jsonl")
+
+
+def shard_path(shard_dir, shard_id):
+    """分片结果文件路径"""
+    return os.path.join(shard_dir, f"shard_{shard_id:04d}.jsonl")
+
+
+def _start_worker_spider():
+    """在工作进程中创建爬虫并启动浏览器"""
+    global _worker_spider
+    spider = CCDIPlaywrightSpider(
+        detail_concurrency=_worker_options['detail_concurrency'],
+        detail_cache_mode=_worker_options['detail_cache_mode'],
+        detail_cache_ttl=_worker_options['detail_cache_ttl'],
+        max_detail_rate=_worker_options['max_detail_rate'],
+        max_list_rate=_worker_options['max_list_rate']
+    )
+    spider.setup_browser(profile=_worker_options['profile'])
+    _worker_spider = spider
+
+
+def _init_worker(options):
+    """进程池初始化函数：每个工作进程只启动一次浏览器"""
+    global _worker_options
+    _worker_options = options
+    _start_worker_spider()
+
+
+def crawl_shard(shard_id, pages, shard_dir, with_details=True):
+    """
+    在工作进程中爬取一个分片的所有页面，返回 (分片编号, 结果文件路径, 记录数)
+
+    结果先写入临时文件，整个分片成功后才改名为正式文件；
+    任何一页出错都会抛出异常，由协调进程重试整个分片。
+    """
+    spider = _worker_spider
+    path = shard_path(shard_dir, shard_id)
+    tmp_path = f"{path}.part"
+
+    spider.results = []
+    spider.sink = JsonlResultSink(tmp_path)
+    # 重试分片时整个分片重新爬取，上一次尝试留下的死信已经过时
+    dead_letter_path = dead_letter_shard_path(shard_dir, shard_id)
+    if os.path.exists(dead_letter_path):
+        os.remove(dead_letter_path)
+    spider.retry_queue = RetryQueue(metrics=spider.metrics, dead_letter_path=dead_letter_path)
+    try:
+        for page_num in pages:
+            spider.retry_due_details()
+            spider.crawl_page(spider.build_url(page_num), with_details)
+            if spider.last_page_failed:
+                raise RuntimeError(f"第{page_num}页爬取失败")
+
+        # 分片内失败的详情页重试完（或写入死信文件）后才算完成
+        spider.drain_retries()
+        spider.sink.close()
+        os.replace(tmp_path, path)
+        return shard_id, path, spider.sink.count
+    except Exception:
+        spider.sink.close()
+        # 浏览器可能已经崩溃，重启后再交给协调进程重试
+        spider.sink = None
+        spider.close()
+        _start_worker_spider()
+        raise
+    finally:
+        spider.sink = None
+
+
+def run_shards(shards, shard_dir, workers, options, with_details=True, retries=2):
+    """
+    用进程池爬取所有分片
+
+    返回 ({分片编号: 结果文件路径}, {分片编号: 页码列表}) ，后者为重试后仍失败的分片。
+    """
+    pending = dict(shards)
+    completed = {}
+    failed = {}
+    attempts = Counter()
+    context = multiprocessing.get_context('spawn')  # 避免fork继承父进程中的浏览器连接
+
+    while pending:
+        executor = ProcessPoolExecutor(
+            max_workers=min(workers, len(pending)),
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(options,)
+        )
+        try:
+            futures = {
+                executor.submit(crawl_shard, shard_id, pages, shard_dir, with_details): shard_id
+                for shard_id, pages in pending.items()
+            }
+            started = set()
+            while futures:
+                done, _ = wait(futures, timeout=1.0, return_when=FIRST_COMPLETED)
+                started.update(future for future in futures if future.running())
+                for future in done:
+                    shard_id = futures.pop(future)
+                    try:
+                        _, path, count = future.result()
+                    except BrokenProcessPool:
+                        # 某个工作进程崩溃时所有未完成的分片都会失败，只对已经开始执行的分片计入重试次数
+                        if future in started:
+                            attempts[shard_id] += 1
+                            print(f"分片 {shard_id}（第{pending[shard_id]}页）执行时工作进程崩溃（第{attempts[shard_id]}次失败）")
+                            if attempts[shard_id] > retries:
+                                failed[shard_id] = pending.pop(shard_id)
+                        continue
+                    except Exception as e:
+                        attempts[shard_id] += 1
+                        print(f"分片 {shard_id}（第{pending[shard_id]}页）第{attempts[shard_id]}次失败: {e}")
+                        if attempts[shard_id] > retries:
+                            failed[shard_id] = pending.pop(shard_id)
+                        else:
+                            futures[executor.submit(crawl_shard, shard_id, pending[shard_id], shard_dir, with_details)] = shard_id
+                        continue
+
+                    completed[shard_id] = path
+                    pending.pop(shard_id)
+                    print(f"分片 {shard_id} 完成，共{count}条记录（剩余 {len(pending)} 个分片）")
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        if pending:
+            print(f"工作进程异常退出，重建进程池继续爬取剩余的 {len(pending)} 个分片")
+
+    return completed, failed
+
+
+def merge_shards(shard_paths, output_path):
+    """
+    按分片顺序合并JSONL结果并按文章链接去重，返回 (写出的记录数, 去掉的重复数)
+
+    分片按页码连续切分，分片内也按页码顺序写出，因此按分片编号依次读取即保持爬取页码顺序。
+    """
+    seen_links = set()
+    duplicates = 0
+    sink = JsonlResultSink(output_path)
+    try:
+        for path in shard_paths:
+            for record in iter_records(path):
+                link = record.get('链接')
+                if link in seen_links:
+                    duplicates += 1
+                    continue
+                if link:
+                    seen_links.add(link)
+                sink.write(record)
+    finally:
+        sink.close()
+    return sink.count, duplicates
+
+
+def merge_dead_letters(shard_dir, output_path, result_path=None):
+    """
+    把各分片的死信文件按链接去重合并到output_path，返回 (合并后的条数, 去掉的重复数)
+
+    同一链接出现多次时保留最后一条（编号大的分片、较晚的尝试）；result_path中已经有正文的文章
+    不再列入。没有死信时删除output_path中上次运行留下的文件。
+    """
+    by_link = {}
+    total = 0
+    for path in sorted(glob.glob(os.path.join(shard_dir, 'dead_letters_*.jsonl'))):
+        for entry in read_dead_letters(path):
+            by_link[entry['link']] = entry
+            total += 1
+    duplicates = total - len(by_link)
+
+    if by_link and result_path and os.path.exists(result_path):
+        for record in iter_records(result_path):
+            if record.get('正文'):
+                by_link.pop(record.get('链接'), None)
+
+    if not by_link:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        return 0, duplicates
+    with open(output_path, 'w', encoding='utf-8') as f:
+        for entry in by_link.values():
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    return len(by_link), duplicates
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='多进程分片爬取全部搜索结果页并合并输出')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='工作进程数（每个进程一个浏览器），默认等于CPU核数')
+    parser.add_argument('--max-pages', type=int, default=None, help='最多爬取的页数，默认爬取全部页面')
+    parser.add_argument('--pages-per-shard', type=int, default=1, help='每个分片包含的页数，失败时按分片重试')
+    parser.add_argument('--retries', type=int, default=2, help='每个分片失败后的最大重试次数')
+    parser.add_argument('--shard-dir', default='ccdi_shards', help='保存分片结果的目录')
+    parser.add_argument('--output', default='ccdi_sharded_reports', help='合并结果的文件名前缀（生成.jsonl/.csv/.json）')
+    parser.add_argument('--profile', default=PRODUCTION_PROFILE, help="页面加载配置，'default' 或 'production'")
+    parser.add_argument('--detail-concurrency', type=int, default=1, help='每个工作进程内同时在途的详情页数量')
+    parser.add_argument('--no-details', action='store_true', help='只爬取列表页，不访问详情页')
+    parser.add_argument('--detail-cache', choices=CACHE_MODES, default=None,
+                        help="已归档的详情页：'trust' 直接使用副本，'revalidate' 先发条件请求验证")
+    parser.add_argument('--cache-ttl-days', type=float, default=None, help='归档副本的有效期（天）')
+    parser.add_argument('--max-rate', type=float, default=DETAIL_MAX_RATE,
+                        help='所有工作进程合计的详情页请求速率上限（请求/秒），按工作进程数平均分给各进程')
+    parser.add_argument('--max-list-rate', type=float, default=LIST_MAX_RATE,
+                        help='所有工作进程合计的列表页请求速率上限（请求/秒），按工作进程数平均分给各进程')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    total_pages = discover_total_pages(args.profile)
+    if args.max_pages:
+        total_pages = min(total_pages, args.max_pages)
+
+    shards = plan_shards(total_pages, args.pages_per_shard)
+    worker_count = max(1, min(args.workers, len(shards)))
+    print(f"共 {total_pages} 页，切分为 {len(shards)} 个分片，使用 {worker_count} 个工作进程")
+
+    # 速率控制器只约束所在进程，合计上限按工作进程数平均分摊，对网站的总速率不随进程数增加
+    max_detail_rate = args.max_rate / worker_count
+    max_list_rate = args.max_list_rate / worker_count
+    print(f"每个工作进程的速率上限：详情页 {max_detail_rate:.2f} 请求/秒，列表页 {max_list_rate:.2f} 请求/秒")
+
+    os.makedirs(args.shard_dir, exist_ok=True)
+    options = {
+        'profile': args.profile,
+        'detail_concurrency': args.detail_concurrency,
+        'detail_cache_mode': args.detail_cache,
+        'detail_cache_ttl': args.cache_ttl_days * 86400 if args.cache_ttl_days is not None else None,
+        'max_detail_rate': max_detail_rate,
+        'max_list_rate': max_list_rate,
+    }
+    completed, failed = run_shards(shards, args.shard_dir, args.workers, options,
+                                   with_details=not args.no_details, retries=args.retries)
+
+    if failed:
+        failed_pages = sorted(page for pages in failed.values() for page in pages)
+        print(f"以下页面重试 {args.retries} 次后仍然失败: {failed_pages}")
+
+    jsonl_path = f"{args.output}.jsonl"
+    count, duplicates = merge_shards([completed[shard_id] for shard_id in sorted(completed)], jsonl_path)
+    print(f"合并完成，共{count}条记录，去除重复 {duplicates} 条")
+
+    dead_letter_path = f"{args.output}_dead_letters.jsonl"
+    dead_letters, repeated = merge_dead_letters(args.shard_dir, dead_letter_path, jsonl_path)
+    if dead_letters:
+        print(f"{dead_letters} 篇文章的详情页多次重试仍失败（去除重复 {repeated} 条），已写入 {dead_letter_path}，"
+              f"可用 python playwright_spider.py --replay-dead-letters --dead-letters {dead_letter_path} 重新爬取"
+              f"（补全的记录合并进 ccdi_playwright_reports.jsonl）")
+    else:
+        print("没有详情页失败的文章")
+
+    export_csv(jsonl_path, f"{args.output}.csv")
+    export_json(jsonl_path, f"{args.output}.json")
+    print(f"数据已保存至 {args.output}.jsonl / .csv / .json，总耗时 {time.perf_counter() - start:.1f} 秒")
+
+
+if __name__ == "__main__":
+    main()
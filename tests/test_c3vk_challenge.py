@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+from c3vk_challenge import SharedCookieCache, is_challenge_page, solve_challenge, to_playwright_cookie
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def challenge_page():
+    with open(os.path.join(ROOT, 'debug_page.html'), 'rb') as f:
+        return f.read()
+
+
+def test_solve_committed_challenge_page(challenge_page):
+    assert is_challenge_page(challenge_page)
+    solution = solve_challenge(challenge_page)
+    assert (solution.name, solution.value) == ('C3VK', 'e9cf61')
+    assert (solution.max_age, solution.path) == (300, '/')
+    assert solution.redirect_url.startswith('/was5/web/search?channelid=298814&')
+    # str和bytes得到相同的结果
+    assert solve_challenge(challenge_page.decode('utf-8')).value == 'e9cf61'
+
+
+@pytest.mark.parametrize('name', ['selenium_page_source.html', 'playwright_page_source.html'])
+def test_result_pages_are_not_challenges(name):
+    with open(os.path.join(ROOT, name), 'rb') as f:
+        page = f.read()
+    assert not is_challenge_page(page)
+    assert solve_challenge(page) is None
+
+
+def test_cookie_cache_shared_through_file(tmp_path, challenge_page):
+    path = str(tmp_path / 'c3vk.json')
+    writer, reader = SharedCookieCache(path), SharedCookieCache(path)
+    assert reader.get() is None
+
+    cookie = writer.store(solve_challenge(challenge_page))
+    assert reader.get()['value'] == 'e9cf61'
+    assert to_playwright_cookie(cookie, 'www.ccdi.gov.cn') == {
+        'name': 'C3VK', 'value': 'e9cf61', 'domain': 'www.ccdi.gov.cn', 'path': '/', 'expires': cookie['expires_at'],
+    }
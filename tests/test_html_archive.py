@@ -0,0 +1,53 @@
+from html_archive import HtmlArchive, content_hash, main, migrate_directory
+from page_parser import parse_article_detail
+
+URL = 'https://www.ccdi.gov.cn/yaowenn/202304/t20230418_259205.html'
+GBK_PAGE = (
+    '<html><head><meta http-equiv="Content-Type" content="text/html; charset=gbk"></head>'
+    '<body><div class="TRS_Editor">中央纪委国家监委公开通报违反中央八项规定精神问题</div></body></html>'
+)
+
+
+def test_non_utf8_page_round_trip(tmp_path):
+    data = GBK_PAGE.encode('gbk')
+    archive = HtmlArchive(str(tmp_path / 'archive'))
+    try:
+        key, digest = archive.put(URL, data)
+        assert key == 't20230418_259205'
+        assert archive.get_bytes(digest) == data
+        assert archive.get_by_hash(digest) == GBK_PAGE
+        assert archive.get(URL) == GBK_PAGE
+        assert parse_article_detail(archive.get_bytes(digest))['正文'].startswith('中央纪委国家监委公开通报')
+    finally:
+        archive.close()
+
+
+def test_page_without_charset_declaration(tmp_path):
+    page = '<html><body><div class="TRS_Editor">违规收受礼品礼金</div></body></html>'
+    archive = HtmlArchive(str(tmp_path / 'archive'))
+    try:
+        _, digest = archive.put(URL, page.encode('gb18030'))
+        assert archive.get_by_hash(digest) == page
+        _, digest = archive.put(URL, page)
+        assert archive.get_by_hash(digest) == page
+    finally:
+        archive.close()
+
+
+def test_migrate_and_cat_non_utf8_file(tmp_path, capsysbinary):
+    folder = tmp_path / 'article_details'
+    folder.mkdir()
+    data = GBK_PAGE.encode('gbk')
+    (folder / 't20230418_259205.html').write_bytes(data)
+    (folder / 't20230419_259300.html').write_bytes(data)
+
+    archive = HtmlArchive(str(tmp_path / 'archive'))
+    try:
+        assert migrate_directory(str(folder), archive) == (2, 1)
+        assert archive.has_content(content_hash(data))
+        assert archive.get('t20230419_259300') == GBK_PAGE
+    finally:
+        archive.close()
+
+    assert main(['--archive', str(tmp_path / 'archive'), 'cat', 't20230418_259205']) == 0
+    assert capsysbinary.readouterr().out == data
@@ -0,0 +1,50 @@
+import json
+
+from result_sink import JsonlResultSink, iter_records
+
+
+def record(n):
+    return {'标题': f'文章{n}', '链接': f'http://www.ccdi.gov.cn/a/t{n}.html', '正文': '正文' * n}
+
+
+def test_resume_after_torn_tail(tmp_path):
+    path = tmp_path / 'reports.jsonl'
+    sink = JsonlResultSink(str(path))
+    sink.write(record(1))
+    sink.write(record(2))
+    sink.close()
+
+    # 模拟写第三条记录时崩溃：最后一行只写了一半，没有换行符
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record(3), ensure_ascii=False)[:25])
+
+    sink = JsonlResultSink(str(path), append=True)
+    sink.write(record(3))
+    sink.write(record(4))
+    sink.close()
+
+    assert [r['标题'] for r in iter_records(str(path))] == ['文章1', '文章2', '文章3', '文章4']
+    assert path.read_bytes().endswith(b'\n')
+
+
+def test_resume_keeps_complete_file(tmp_path):
+    path = tmp_path / 'reports.jsonl'
+    sink = JsonlResultSink(str(path))
+    sink.write(record(1))
+    sink.close()
+    before = path.read_bytes()
+
+    sink = JsonlResultSink(str(path), append=True)
+    sink.close()
+    assert path.read_bytes() == before
+
+
+def test_resume_with_only_torn_line(tmp_path):
+    path = tmp_path / 'reports.jsonl'
+    path.write_text('{"标题": "文章', encoding='utf-8')
+
+    sink = JsonlResultSink(str(path), append=True, fsync_every=1)
+    sink.write(record(5))
+    sink.close()
+
+    assert [r['标题'] for r in iter_records(str(path))] == ['文章5']
@@ -0,0 +1,98 @@
+import json
+import os
+
+import pytest
+
+from crawl_metrics import CrawlMetrics
+from retry_queue import RetryQueue, finish_dead_letters, take_dead_letters
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_queue(tmp_path, clock, **kwargs):
+    kwargs.setdefault('max_attempts', 4)
+    return RetryQueue(base_delay=10.0, max_delay=30.0, dead_letter_path=str(tmp_path / 'dead.jsonl'),
+                      metrics=CrawlMetrics(), clock=clock, **kwargs)
+
+
+def test_exponential_backoff_then_dead_letter(tmp_path):
+    clock = FakeClock()
+    queue = make_queue(tmp_path, clock)
+    record = {'标题': '通报', '链接': 'https://www.ccdi.gov.cn/a/t1.html'}
+
+    # 第n次失败后等待 base_delay * 2^(n-1)，不超过max_delay，带±20%抖动
+    for expected in (10.0, 20.0, 30.0):
+        delay = queue.schedule(0, record['链接'], record, error='TimeoutException')
+        assert expected * 0.8 <= delay <= expected * 1.2
+        assert queue.wait_time() == pytest.approx(delay)
+        clock.now += delay * 0.99
+        assert queue.pop_due() == []
+        clock.now += delay * 0.01 + 1e-6
+        assert queue.pop_due() == [(0, record['链接'])]
+        assert len(queue) == 1
+
+    assert queue.schedule(0, record['链接'], record, error='TimeoutException') is None
+    assert len(queue) == 0
+    assert queue.wait_time() is None
+    assert queue.dead_letters == 1
+    assert queue.metrics.counter('detail_retries_total') == 3
+    assert queue.metrics.counter('detail_dead_letters_total') == 1
+
+    with open(tmp_path / 'dead.jsonl', encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f]
+    assert len(lines) == 1
+    assert (lines[0]['link'], lines[0]['attempts'], lines[0]['error']) == (record['链接'], 4, 'TimeoutException')
+    assert lines[0]['record'] == record
+
+
+def test_due_order_and_done(tmp_path):
+    clock = FakeClock()
+    queue = make_queue(tmp_path, clock)
+    queue.restore([
+        {'index': 1, 'link': 'l1', 'record': {}, 'attempts': 1, 'error': None},
+        {'index': 2, 'link': 'l2', 'record': {}, 'attempts': 1, 'error': None},
+    ], delay=5.0)
+    queue.restore([{'index': 3, 'link': 'l3', 'record': {}, 'attempts': 2, 'error': None}], delay=1.0)
+    # 重新安排的条目使堆中的旧位置失效
+    queue.restore([{'index': 1, 'link': 'l1', 'record': {}, 'attempts': 1, 'error': None}], delay=2.0)
+
+    clock.now += 2.0
+    assert queue.pop_due() == [(3, 'l3'), (1, 'l1')]
+    queue.done(3)
+    assert sorted(entry['index'] for entry in queue.pending()) == [1, 2]
+    assert queue.wait_time() == 3.0
+    clock.now += 3.0
+    assert queue.pop_due() == [(2, 'l2')]
+
+
+def test_replay_keeps_leftover_entries(tmp_path):
+    path = str(tmp_path / 'dead.jsonl')
+
+    def write(links, error):
+        with open(path, 'a', encoding='utf-8') as f:
+            for link in links:
+                f.write(json.dumps({'link': link, 'record': {'链接': link}, 'error': error}) + '\n')
+
+    write(['a', 'b', 'c'], 'first')
+    assert [entry['link'] for entry in take_dead_letters(path)] == ['a', 'b', 'c']
+    assert not os.path.exists(path)
+
+    # 重放中途崩溃：b再次失败写回死信文件，之后的爬取又加入d
+    write(['b', 'd'], 'second')
+    entries = take_dead_letters(path)
+    assert sorted(entry['link'] for entry in entries) == ['a', 'b', 'c', 'd']
+    assert {entry['link']: entry['error'] for entry in entries}['b'] == 'second'
+
+    # 原子替换后、删除死信文件前崩溃：两份文件内容重复，再次读取结果相同
+    write(['d'], 'second')
+    assert sorted(entry['link'] for entry in take_dead_letters(path)) == ['a', 'b', 'c', 'd']
+
+    finish_dead_letters(path)
+    assert not os.path.exists(f"{path}.replaying")
+    assert take_dead_letters(path) == []
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from search_index import SearchIndex, decode_postings, encode_postings, tokenize
+
+
+def record(n, body):
+    return {
+        '标题': f'通报{n}',
+        '链接': f'https://www.ccdi.gov.cn/yaowenn/202304/t20230418_{n}.html',
+        '摘要': '无摘要',
+        '正文': body,
+    }
+
+
+@pytest.mark.parametrize('docs, freqs', [
+    ([7], [1]),
+    ([0, 1, 2, 200, 300], [1, 2, 3, 255, 256]),
+    ([5, 70000, 70001, 1 << 33], [1, 65535, 70000, 2]),
+])
+def test_postings_round_trip(docs, freqs):
+    decoded_docs, decoded_freqs = decode_postings(*encode_postings(docs, freqs))
+    assert decoded_docs.tolist() == docs
+    # 词频超过MAX_TERM_FREQ时截断
+    assert decoded_freqs.tolist() == [min(freq, 65535) for freq in freqs]
+    assert decoded_docs.dtype == np.int64
+
+
+def test_tokenize_bigrams():
+    assert tokenize('违反八项规定 ABC2023') == ['违反', '反八', '八项', '项规', '规定', 'abc2023']
+
+
+def test_single_segment_limit(tmp_path):
+    index = SearchIndex(str(tmp_path / 'index.db'), flush_every=3, max_segments=1)
+    for n in range(10):
+        index.add(record(n, '违规收受礼品礼金' if n % 2 else '违规吃喝'))
+    stats = index.stats()
+    assert stats['segments'] == 1
+    assert stats['docs'] == 10
+    assert len(index.search('礼金', limit=20)) == 5
+    assert len(index.search('违规', limit=20)) == 10
+    index.close()
+
+
+def test_max_segments_below_one_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        SearchIndex(str(tmp_path / 'index.db'), max_segments=0)
+
+
+def test_readd_article_then_optimize(tmp_path):
+    path = str(tmp_path / 'index.db')
+    index = SearchIndex(path, flush_every=2, max_segments=8)
+    index.add(record(1, '违规收受礼品礼金'))
+    index.add(record(2, '违规吃喝'))
+    index.add(record(3, '公款旅游'))
+    index.flush()
+    # 同一文章重新写入后旧文档被标记删除，查询只返回新内容
+    index.add(record(1, '违规发放津贴补贴'))
+    index.flush()
+    assert index.stats()['deleted'] == 1
+    assert index.search('礼金') == []
+    assert [hit['文章ID'] for hit in index.search('津贴')] == ['t20230418_1']
+
+    before = index.search('违规', limit=10)
+    assert index.optimize() == 3
+    stats = index.stats()
+    assert (stats['docs'], stats['deleted'], stats['segments']) == (3, 0, 1)
+    assert index.search('违规', limit=10) == before
+    assert index.search('礼金') == []
+    index.close()
+
+    # 重新打开后结果不变
+    reopened = SearchIndex(path)
+    assert reopened.search('违规', limit=10) == before
+    reopened.close()
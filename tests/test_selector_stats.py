@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from crawl_metrics import CrawlMetrics
+from page_parser import CONTENT_SELECTORS
+from selector_stats import SelectorStats
+
+URL = 'https://www.ccdi.gov.cn/yaowenn/202304/t20230418_259205.html'
+PATTERN = 'www.ccdi.gov.cn/yaowenn'
+FIRST, LAST = CONTENT_SELECTORS[0], CONTENT_SELECTORS[-1]
+
+
+def stats(path, **kwargs):
+    kwargs.setdefault('decay', 0.5)
+    return SelectorStats(str(path), metrics=CrawlMetrics(), **kwargs)
+
+
+def saved_entry(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['patterns'][PATTERN]['content']
+
+
+def test_two_instances_merge_decayed_scores(tmp_path):
+    path = tmp_path / 'stats.json'
+    a, b = stats(path), stats(path)
+
+    a.record('content', FIRST, URL)
+    a.record('content', FIRST, URL)
+    b.record('content', LAST, URL)
+    a.save()
+    b.save()
+    # 与按 FIRST, FIRST, LAST 顺序在一个进程中记录的结果相同
+    entry = saved_entry(path)
+    assert entry['scores'] == {FIRST: 0.75, LAST: 1.0}
+    assert entry['hits'] == {FIRST: 2, LAST: 1}
+    assert sorted(entry['recent']) == sorted([FIRST, FIRST, LAST])
+    # 保存后b的排序也用上了a的命中
+    assert b.order('content', URL)[0] == LAST
+
+    a.record('content', LAST, URL)
+    a.save()
+    entry = saved_entry(path)
+    assert entry['scores'] == {FIRST: pytest.approx(0.375), LAST: pytest.approx(1.5)}
+    assert entry['hits'] == {FIRST: 2, LAST: 2}
+
+    # 没有新记录时不写文件
+    b.save()
+    assert saved_entry(path) == entry
+
+
+def test_drift_alert_resets_baseline_in_merged_file(tmp_path):
+    path = tmp_path / 'stats.json'
+    a = stats(path, window=4, min_samples=6)
+    for _ in range(6):
+        a.record('content', FIRST, URL)
+    a.save()
+
+    b = stats(path, window=4, min_samples=6)
+    b.record('content', LAST, URL)
+    b.record('content', LAST, URL)
+    assert b.metrics.counter('selector_drift_alerts_total', field='content') == 0
+    b.record('content', LAST, URL)
+    assert b.metrics.counter('selector_drift_alerts_total', field='content') == 1
+    b.save()
+    # 告警后以最近窗口作为新的基线，合并时不再加回文件中的历史命中
+    assert saved_entry(path)['hits'] == {FIRST: 1, LAST: 3}
+
+    a.record('content', FIRST, URL)
+    a.save()
+    assert saved_entry(path)['hits'] == {FIRST: 2, LAST: 3}
+    assert not (tmp_path / 'stats.json.lock').exists()
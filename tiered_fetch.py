@@ -0,0 +1,103 @@
+"""
+详情页分层抓取
+
+大多数CCDI文章页的正文（.TRS_Editor）是服务端渲染的，不需要浏览器执行脚本。
+TieredDetailFetcher先用带连接池的HTTP会话抓取详情页，用与浏览器相同的
+正文/来源/时间选择器顺序（lxml）提取；只有以下情况才返回None，由爬虫升级到浏览器：
+    - HTTP请求失败；
+    - 求解Cookie后仍然返回C3VK验证页；
+    - 页面过短（疑似错误页或拦截页）；
+    - 正文选择器没有匹配，或匹配到的正文过短。
+HTTP层成功的页面连同ETag/Last-Modified写入归档，供详情页缓存的revalidate模式使用。
+请求耗时、超时、5xx和持续的验证页反馈给速率控制器（设置了rate_controller时）。
+每条记录的 '获取方式' 字段标明由哪一层得到：http / browser / cache。
+"""
+import time
+
+from c3vk_challenge import is_challenge_page
+from crawl_metrics import CrawlMetrics
+from rate_control import CHALLENGE
+from page_parser import parse_article_detail
+from selector_stats import SelectorStats
+
+HTTP_TIER = 'http'
+BROWSER_TIER = 'browser'
+CACHE_TIER = 'cache'
+TIER_FIELD = '获取方式'
+
+# 正常文章页的HTML在12KB以上、正文在数百字以上；验证页不到1KB
+MIN_PAGE_LENGTH = 4096
+MIN_CONTENT_LENGTH = 100
+
+
+class TieredDetailFetcher:
+    def __init__(self, http_backend, archive=None, metrics=None, selector_stats=None,
+                 min_page_length=MIN_PAGE_LENGTH, min_content_length=MIN_CONTENT_LENGTH, rate_controller=None):
+        self.http_backend = http_backend
+        self.archive = archive  # 为None时不保存HTTP层抓取的页面
+        self.metrics = metrics or CrawlMetrics()
+        self.selector_stats = selector_stats or SelectorStats(path=None, metrics=self.metrics)
+        self.min_page_length = min_page_length
+        self.min_content_length = min_content_length
+        self.rate_controller = rate_controller
+
+    def fetch(self, url):
+        """通过HTTP抓取并提取详情，返回带 '获取方式' 字段的详情数据，需要升级到浏览器时返回None"""
+        try:
+            start = time.perf_counter()
+            with self.metrics.stage('detail_http'):
+                _, page_source, etag, last_modified = self.http_backend.fetch_conditional(url)
+            latency = time.perf_counter() - start
+        except Exception as e:
+            print(f"HTTP抓取详情页失败，改用浏览器: {url}: {e}")
+            self.metrics.record_failure('detail_http', e)
+            if self.rate_controller:
+                self.rate_controller.record_error(e)
+            return self._escalate('http_error')
+
+        if is_challenge_page(page_source):
+            # 求解Cookie后仍返回验证页
+            if self.rate_controller:
+                self.rate_controller.record_failure(CHALLENGE)
+            return self._escalate('challenge')
+        if self.rate_controller:
+            self.rate_controller.record_success(latency)
+        if len(page_source) < self.min_page_length:
+            return self._escalate('short_page')
+
+        with self.metrics.stage('detail_http_extract'):
+            orders = self.selector_stats.detail_orders(url)
+            matched = {}
+            detail = parse_article_detail(page_source, orders, matched)
+        self.selector_stats.record_matches(orders, matched, url)
+        detail.pop('标题', None)  # 标题沿用列表页的
+
+        content = detail.get('正文')
+        if not content:
+            return self._escalate('no_content')
+        if len(content) < self.min_content_length:
+            return self._escalate('short_content')
+
+        if self.archive:
+            with self.metrics.stage('archive_write'):
+                self.archive.put(url, page_source, etag, last_modified)
+
+        detail[TIER_FIELD] = HTTP_TIER
+        self.metrics.inc('detail_tier_total', tier=HTTP_TIER)
+        return detail
+
+    def print_summary(self):
+        """打印各层得到的详情数和升级到浏览器的原因"""
+        tiers = {tier: self.metrics.counter('detail_tier_total', tier=tier) for tier in (HTTP_TIER, BROWSER_TIER, CACHE_TIER)}
+        total = sum(tiers.values())
+        if not total:
+            return
+        reasons = self.metrics.summary()['counters'].get('detail_escalations_total', {})
+        reason_text = '、'.join(f"{label.split('=', 1)[1]} {count}" for label, count in reasons.items())
+        print(f"[分层抓取] HTTP {tiers[HTTP_TIER]}，浏览器 {tiers[BROWSER_TIER]}，缓存 {tiers[CACHE_TIER]}"
+              f"（HTTP层占 {tiers[HTTP_TIER] / total:.1%}）{f'；升级原因: {reason_text}' if reason_text else ''}")
+
+    def _escalate(self, reason):
+        """记录升级原因，返回None"""
+        self.metrics.inc('detail_escalations_total', reason=reason)
+        return None